@@ -0,0 +1,63 @@
+# app/achievements.py
+"""
+Массовая выдача достижений.
+
+award_achievement() выдаёт достижение сразу группе пользователей:
+пачкой создаёт UserAchievement и уведомления и одним UPDATE начисляет очки рейтинга.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from .caching import cache, user_tag
+from .models import Achievement, UserAchievement, Notification, Profile
+from .profiles import invalidate_profile_summary
+
+# Размер пачки для IN-списков (MSSQL ограничивает число параметров запроса)
+BATCH_SIZE = 1000
+
+
+def _award_batch(achievement, user_ids):
+    already = set(UserAchievement.objects.filter(
+        achievement=achievement, user_id__in=user_ids
+    ).values_list('user_id', flat=True))
+    new_ids = [user_id for user_id in user_ids if user_id not in already]
+    if not new_ids:
+        return 0
+
+    UserAchievement.objects.bulk_create(
+        [UserAchievement(user_id=user_id, achievement=achievement) for user_id in new_ids]
+    )
+    Profile.objects.filter(user_id__in=new_ids).update(
+        rating_score=F('rating_score') + achievement.rating_points
+    )
+    Notification.objects.bulk_create([
+        Notification(
+            user_id=user_id,
+            title="Новое достижение",
+            message=f"{achievement.icon} Вы получили достижение «{achievement.name}»",
+            notification_type=Notification.NotificationTypes.ACHIEVEMENT,
+            link="/achievements/",
+        )
+        for user_id in new_ids
+    ])
+    # bulk_create и update() не отправляют сигналы — сбрасываем сводки, рейтинг и уведомления явно
+    invalidate_profile_summary(*new_ids)
+    cache.invalidate_tags('profile', 'notification', *[user_tag(user_id, 'notifications') for user_id in new_ids])
+    return len(new_ids)
+
+
+def award_achievement(name, user_ids):
+    """
+    Выдаёт достижение name всем пользователям из user_ids, у которых его ещё нет.
+    Возвращает количество новых награждений.
+    """
+    achievement = Achievement.objects.filter(name=name).first()
+    if achievement is None:
+        return 0
+
+    user_ids = list(user_ids)
+    awarded = 0
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        with transaction.atomic():
+            awarded += _award_batch(achievement, user_ids[start:start + BATCH_SIZE])
+    return awarded
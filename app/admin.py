@@ -1,7 +1,9 @@
 from django.contrib import admin
 from .models import (
     Profile, Publication, Achievement, UserAchievement, EducationalMaterial,
-    MarketOverview, ChatMessage, Notification, UserStatistics
+    MarketOverview, ChatMessage, Notification, UserStatistics, DailyStatistics, RollupWatermark,
+    Recommendation, Broadcast, OutboxMessage, Screenshot, MaterialTypeCount,
+    ViewerSketch, Task, FailedTask
 )
 
 
@@ -16,6 +18,7 @@ class PublicationAdmin(admin.ModelAdmin):
     list_display = ('author', 'created_at', 'status', 'boost_count', 'views')
     search_fields = ('author__username', 'description')
     list_filter = ('status',)
+    raw_id_fields = ('screenshot_image',)
 
 
 @admin.register(Achievement)
@@ -30,13 +33,14 @@ class UserAchievementAdmin(admin.ModelAdmin):
 
 @admin.register(EducationalMaterial)
 class EducationalMaterialAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'material_type', 'created_at')
+    list_display = ('title', 'author', 'material_type', 'reading_time', 'created_at')
     search_fields = ('title',)
 
 
 @admin.register(MarketOverview)
 class MarketOverviewAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'created_at')
+    list_display = ('title', 'author', 'created_at', 'video_provider', 'video_fetched_at')
+    readonly_fields = ('video_title', 'video_duration', 'video_provider', 'video_fetched_at', 'video_refresh_at')
 
 
 @admin.register(ChatMessage)
@@ -55,3 +59,73 @@ class NotificationAdmin(admin.ModelAdmin):
 @admin.register(UserStatistics)
 class UserStatisticsAdmin(admin.ModelAdmin):
     list_display = ('user', 'total_publications', 'successful_predictions', 'total_boosts_received')
+
+
+@admin.register(DailyStatistics)
+class DailyStatisticsAdmin(admin.ModelAdmin):
+    list_display = ('date', 'new_users', 'new_publications', 'new_boosts', 'chat_messages')
+    date_hierarchy = 'date'
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('source', 'last_day', 'updated_at')
+
+
+@admin.register(Recommendation)
+class RecommendationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'kind', 'position', 'author', 'publication', 'score', 'generated_at')
+    list_filter = ('kind',)
+    search_fields = ('user__username',)
+    raw_id_fields = ('user', 'author', 'publication')
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ('audience', 'author', 'publication', 'created_at', 'is_expanded')
+    list_filter = ('audience', 'is_expanded')
+    raw_id_fields = ('author', 'publication')
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('chat_id', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'last_error')
+    list_filter = ('status',)
+    search_fields = ('chat_id',)
+    raw_id_fields = ('broadcast',)
+
+
+@admin.register(Screenshot)
+class ScreenshotAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'width', 'height', 'size', 'created_at')
+    search_fields = ('sha256',)
+
+
+@admin.register(MaterialTypeCount)
+class MaterialTypeCountAdmin(admin.ModelAdmin):
+    list_display = ('material_type', 'count')
+
+
+@admin.register(ViewerSketch)
+class ViewerSketchAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'object_id', 'day')
+    list_filter = ('kind',)
+    exclude = ('registers',)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'attempts', 'next_attempt_at', 'locked_by', 'created_at', 'last_error')
+    list_filter = ('name',)
+
+
+@admin.register(FailedTask)
+class FailedTaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'attempts', 'created_at', 'failed_at')
+    list_filter = ('name',)
+    actions = ['requeue']
+
+    @admin.action(description='Вернуть в очередь')
+    def requeue(self, request, queryset):
+        from .tasks import requeue_failed
+        self.message_user(request, f'Возвращено в очередь: {requeue_failed(queryset)}')
@@ -0,0 +1,109 @@
+# app/analytics.py
+"""
+Дневные агрегаты для страницы статистики.
+
+rollup_daily_statistics() пересчитывает последние ROLLUP_LOOKBACK_DAYS дней до
+прошлого запуска (RollupWatermark) и дни после него, группируя строки по их
+собственной дате, и записывает счётчики DailyStatistics целиком. Пересчёт
+идемпотентен: строки транзакций, зафиксированных позже соседних, попадают в свой
+день при следующем запуске, а не теряются за отметкой.
+
+Строки без даты (бусты до появления PublicationBoost.created_at) пересчитать нельзя:
+дни до RollupWatermark.legacy_day не трогаются, а к счётчику самого legacy_day
+прибавляется учтённая в нём доля таких строк (legacy_count). Обе отметки заполняет
+миграция 0018 из состояния прежнего расчёта.
+Дашборд читает только DailyStatistics: O(дней), без сканирования исходных таблиц.
+"""
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Publication, PublicationBoost, ChatMessage, DailyStatistics, RollupWatermark
+
+# источник -> (модель, поле с датой создания, счётчик в DailyStatistics)
+ROLLUP_SOURCES = {
+    'users': (User, 'date_joined', 'new_users'),
+    'publications': (Publication, 'created_at', 'new_publications'),
+    'boosts': (PublicationBoost, 'created_at', 'new_boosts'),
+    'chat_messages': (ChatMessage, 'timestamp', 'chat_messages'),
+}
+
+# Сколько дней до прошлого запуска пересчитывается заново — запас на долгие транзакции
+ROLLUP_LOOKBACK_DAYS = 2
+
+SERIES_FIELDS = ('new_users', 'new_publications', 'new_boosts', 'chat_messages')
+
+# Максимальный диапазон, который отдаёт API
+MAX_RANGE_DAYS = 366
+
+
+def _set_days(counter_field, start, end, counts):
+    """Записывает {дата: количество} в счётчик counter_field дней [start, end]; дни без строк — 0"""
+    DailyStatistics.objects.bulk_create([DailyStatistics(date=day) for day in counts], ignore_conflicts=True)
+    rows = list(DailyStatistics.objects.filter(date__range=(start, end)))
+    for row in rows:
+        setattr(row, counter_field, counts.get(row.date, 0))
+    DailyStatistics.objects.bulk_update(rows, [counter_field], batch_size=500)
+
+
+def _rollup_source(source):
+    model, date_field, counter_field = ROLLUP_SOURCES[source]
+    today = timezone.localdate()
+
+    with transaction.atomic():
+        RollupWatermark.objects.get_or_create(source=source)
+        # параллельный запуск того же источника ждёт окончания этого
+        watermark = RollupWatermark.objects.select_for_update().get(source=source)
+
+        dated_rows = model.objects.filter(**{f'{date_field}__isnull': False}).order_by()
+        if watermark.last_day is None:
+            # первый запуск — с самой ранней строки
+            first = dated_rows.aggregate(first=Min(date_field))['first']
+            if first is None:
+                return 0
+            start = timezone.localdate(first)
+        else:
+            start = min(watermark.last_day, today) - datetime.timedelta(days=ROLLUP_LOOKBACK_DAYS)
+        if watermark.legacy_day is not None:
+            start = max(start, watermark.legacy_day)
+
+        per_day = (dated_rows.filter(**{f'{date_field}__date__gte': start})
+                   .annotate(day=TruncDate(date_field)).values('day').annotate(n=Count('pk')))
+        counts = {row['day']: row['n'] for row in per_day}
+        if watermark.legacy_day == start:
+            counts[start] = counts.get(start, 0) + watermark.legacy_count
+        _set_days(counter_field, start, max([today, *counts]), counts)
+        watermark.last_day = today
+        watermark.save(update_fields=['last_day', 'updated_at'])
+        return sum(counts.values())
+
+
+def rollup_daily_statistics(sources=None):
+    """
+    Пересчитывает в DailyStatistics последние дни каждого источника.
+    Возвращает {источник: количество строк в пересчитанных днях}.
+    """
+    return {source: _rollup_source(source) for source in (sources or ROLLUP_SOURCES)}
+
+
+def get_daily_series(start, end):
+    """
+    Возвращает ряды по дням в диапазоне [start, end] (включительно) из DailyStatistics.
+    Дни без строки заполняются нулями.
+    """
+    rows = {row.date: row for row in DailyStatistics.objects.filter(date__range=(start, end))}
+    series = {'dates': []}
+    series.update({field: [] for field in SERIES_FIELDS})
+
+    day = start
+    while day <= end:
+        row = rows.get(day)
+        series['dates'].append(day.isoformat())
+        for field in SERIES_FIELDS:
+            series[field].append(getattr(row, field) if row else 0)
+        day += datetime.timedelta(days=1)
+    return series
@@ -0,0 +1,204 @@
+# app/api.py
+"""
+REST API для Telegram WebApp (DRF): компактный JSON вместо HTML-страниц.
+
+Все списки используют курсорную пагинацию, поддерживают ?fields= (только нужные поля)
+и /bulk/?ids=1,2,3 для выборки нескольких объектов одним запросом.
+Счётчики аннотируются подзапросами, связанные объекты подгружаются select_related,
+поэтому число запросов не зависит от размера страницы.
+"""
+from django.db.models import Exists, OuterRef, Q, Value, BooleanField
+from rest_framework import mixins, permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.response import Response
+from rest_framework.routers import DefaultRouter
+
+from .caching import cache, user_tag
+from .models import Publication, Profile, Notification, UserAchievement
+from .profiles import count_subquery
+from .serializers import PublicationSerializer, ProfileSerializer, NotificationSerializer, requested_fields
+
+# Максимум объектов в одном bulk-запросе
+MAX_BULK_IDS = 100
+
+
+class NewestFirstCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class RatingCursorPagination(NewestFirstCursorPagination):
+    """
+    Курсор по паре (rating_score, id): позиция — оба значения строки на границе страницы.
+    CursorPagination из DRF фильтрует только по первому полю ordering и добирает смещением,
+    а рейтинг не уникален и меняется между запросами страниц — строки пропускались бы
+    и повторялись. Здесь равные рейтинги различает id, смещение не нужно.
+    """
+    ordering = ('-rating_score', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = None
+        if self.cursor is not None and self.cursor.position is not None:
+            try:
+                rating_score, pk = map(int, self.cursor.position.split(':'))
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            position = self.cursor.position
+
+        if reverse:
+            queryset = queryset.order_by('rating_score', 'id')
+            if position is not None:
+                queryset = queryset.filter(Q(rating_score__gt=rating_score) | Q(rating_score=rating_score, id__gt=pk))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+            if position is not None:
+                queryset = queryset.filter(Q(rating_score__lt=rating_score) | Q(rating_score=rating_score, id__lt=pk))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_following
+        else:
+            self.has_next, self.has_previous = has_following, position is not None
+        # пустая страница (например, строки удалены) — обе ссылки от текущей позиции
+        self.next_position = self._keyset_position(self.page[-1]) if self.page else position
+        self.previous_position = self._keyset_position(self.page[0]) if self.page else position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    @staticmethod
+    def _keyset_position(profile):
+        return f'{profile.rating_score}:{profile.pk}'
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+
+class BulkFetchMixin:
+    """Действие /bulk/?ids=1,2,3 — объекты в порядке переданных идентификаторов"""
+    bulk_lookup_field = 'pk'
+
+    @action(detail=False, methods=['get'])
+    def bulk(self, request):
+        try:
+            ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            raise ValidationError({'ids': 'Ожидается список целых чисел через запятую.'})
+        if len(ids) > MAX_BULK_IDS:
+            raise ValidationError({'ids': f'Не более {MAX_BULK_IDS} идентификаторов за запрос.'})
+
+        objects = self.get_queryset().filter(**{f'{self.bulk_lookup_field}__in': ids})
+        by_id = {getattr(obj, self.bulk_lookup_field): obj for obj in objects}
+        found = [by_id[pk] for pk in dict.fromkeys(ids) if pk in by_id]
+        return Response({'results': self.get_serializer(found, many=True).data})
+
+
+def wants_field(request, field):
+    """True, если поле field попадёт в ответ (учитывает ?fields=) — иначе аннотацию можно не считать"""
+    requested = requested_fields(request)
+    return requested is None or field in requested
+
+
+class PublicationViewSet(BulkFetchMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Публикации. Фильтры: ?status=ACTIVE, ?author=<username>.
+    """
+    serializer_class = PublicationSerializer
+    pagination_class = NewestFirstCursorPagination
+    permission_classes = [permissions.AllowAny]
+
+    def get_queryset(self):
+        queryset = Publication.objects.select_related('author', 'screenshot_image')
+
+        status = self.request.query_params.get('status')
+        if status:
+            queryset = queryset.filter(status=status)
+        author = self.request.query_params.get('author')
+        if author:
+            queryset = queryset.filter(author__username=author)
+
+        if wants_field(self.request, 'boost_count'):
+            queryset = queryset.annotate(boost_count=count_subquery(Publication.boosts.through, 'publication'))
+        if wants_field(self.request, 'is_boosted'):
+            user = self.request.user
+            if user.is_authenticated:
+                boosted = Publication.boosts.through.objects.filter(publication_id=OuterRef('pk'), user_id=user.pk)
+                queryset = queryset.annotate(is_boosted=Exists(boosted))
+            else:
+                queryset = queryset.annotate(is_boosted=Value(False, output_field=BooleanField()))
+        return queryset
+
+
+class ProfileViewSet(BulkFetchMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Профили, по умолчанию отсортированные по рейтингу.
+    Детальный просмотр — /profiles/<username>/, bulk — по id пользователей.
+    Скрытые профили видны только владельцу.
+    """
+    serializer_class = ProfileSerializer
+    pagination_class = RatingCursorPagination
+    lookup_field = 'user__username'
+    lookup_url_kwarg = 'username'
+    lookup_value_regex = '[^/]+'
+    bulk_lookup_field = 'user_id'
+
+    def get_queryset(self):
+        queryset = Profile.objects.select_related('user').filter(
+            Q(is_private=False) | Q(user_id=self.request.user.pk)
+        )
+        if wants_field(self.request, 'publications_count'):
+            queryset = queryset.annotate(publications_count=count_subquery(Publication, 'author', 'user_id'))
+        if wants_field(self.request, 'achievements_count'):
+            queryset = queryset.annotate(achievements_count=count_subquery(UserAchievement, 'user', 'user_id'))
+        return queryset
+
+
+class NotificationViewSet(BulkFetchMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                          viewsets.GenericViewSet):
+    """
+    Уведомления текущего пользователя. Фильтр: ?unread=1.
+    """
+    serializer_class = NotificationSerializer
+    pagination_class = NewestFirstCursorPagination
+
+    def get_queryset(self):
+        queryset = Notification.objects.filter(user=self.request.user)
+        if self.request.query_params.get('unread'):
+            queryset = queryset.filter(is_read=False)
+        return queryset
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        updated = self.get_queryset().filter(pk=pk).update(is_read=True)
+        if not updated:
+            return Response({'status': 'error', 'message': 'Not found'}, status=404)
+        # update() не отправляет сигналы
+        cache.invalidate_tags(user_tag(request.user.pk, 'notifications'))
+        return Response({'status': 'ok'})
+
+
+router = DefaultRouter()
+router.register('publications', PublicationViewSet, basename='api-publication')
+router.register('profiles', ProfileViewSet, basename='api-profile')
+router.register('notifications', NotificationViewSet, basename='api-notification')
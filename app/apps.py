@@ -1,5 +1,6 @@
 # app/apps.py
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AppConfig(AppConfig):
@@ -7,28 +8,10 @@ class AppConfig(AppConfig):
     name = 'app'
 
     def ready(self):
-        # Создание групп после полной инициализации Django
-        import django
-        if django.VERSION >= (3, 2):
-            from django.db import connection
-            try:
-                # Проверяем, что таблицы существуют
-                with connection.cursor() as cursor:
-                    cursor.execute("SELECT COUNT(*) FROM auth_group")
+        # Учёт запросов к БД (app/instrumentation.py) подключается до первых запросов.
+        # К БД при запуске не обращаемся: роли создаёт миграция 0016_seed_roles
+        # (и manage.py seed_initial_data), иначе каждый воркер ходил бы в базу при старте.
+        from . import instrumentation  # noqa: F401
+        from .roles import forget_role_groups
 
-                # Если дошли сюда - таблицы есть, можно создавать группы
-                from django.contrib.auth.models import Group
-                Group.objects.get_or_create(name='Trader')
-                Group.objects.get_or_create(name='Moderator')
-                Group.objects.get_or_create(name='Admin')
-            except:
-                # Таблицы еще не созданы, пропускаем
-                pass
-
-        # ЗАКОММЕНТИРОВАННЫЙ КОД - раскомментируйте после успешных миграций:
-        # from django.contrib.auth.models import Group
-        #
-        # # Создание групп пользователей при запуске приложения
-        # Group.objects.get_or_create(name='Trader')
-        # Group.objects.get_or_create(name='Moderator')
-        # Group.objects.get_or_create(name='Admin')
\ No newline at end of file
+        post_migrate.connect(forget_role_groups, sender=self)
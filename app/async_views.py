@@ -0,0 +1,108 @@
+# app/async_views.py
+"""
+Асинхронные версии частых JSON-API для развёртывания под Daphne.
+
+Синхронное представление под ASGI целиком выполняется в пуле потоков; эти — в цикле
+событий: пользователь берётся через request.auser() (сессия читается асинхронно),
+запросы — асинхронным ORM. Сигналы моделей (постановка уведомлений о бустах в очередь,
+сброс кэша) остаются синхронными и срабатывают из aadd/aremove/asave. Синхронные версии
+в views.py сохранены для WSGI и для сравнения (manage.py benchmark_async_views).
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+
+from .conditional import conditional
+from .follows import toggle_follow
+from .instrumentation import query_budget
+from .models import Notification, Profile, Publication
+
+
+async def _auser(request):
+    """Пользователь запроса без синхронного обращения к сессии"""
+    user = await request.auser()
+    # у request.user свой кэш: без подмены синхронный код ниже по цепочке загрузил бы пользователя снова
+    request.user = user
+    return user
+
+
+def _invalid_method():
+    return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
+
+
+@login_required
+async def toggle_boost_view(request, pk):
+    """
+    Ожидает POST. Переключает буст текущего пользователя для публикации pk.
+    Возвращает JSON с новым количеством бустов и состоянием.
+    """
+    if request.method != 'POST':
+        return _invalid_method()
+
+    user = await _auser(request)
+    publication = await aget_object_or_404(Publication, pk=pk)
+    if await publication.boosts.filter(pk=user.pk).aexists():
+        await publication.boosts.aremove(user)
+        boosted = False
+    else:
+        await publication.boosts.aadd(user)
+        boosted = True
+    return JsonResponse({'status': 'ok', 'boost_count': await publication.boosts.acount(), 'boosted': boosted})
+
+
+@login_required
+@conditional(user_sections=('notifications',))
+@query_budget(4)
+async def get_notifications_api(request):
+    """API для получения непрочитанных уведомлений"""
+    user = await _auser(request)
+    data = [
+        {
+            "id": n.id,
+            "title": n.title,
+            "message": n.message,
+            "link": n.link,
+            "type": n.notification_type,
+            "created_at": n.created_at.strftime("%Y-%m-%d %H:%M"),
+        }
+        async for n in Notification.objects.filter(user_id=user.pk, is_read=False)
+    ]
+    # в выборке все непрочитанные — отдельный COUNT не нужен
+    return JsonResponse({"notifications": data, "unread_count": len(data)})
+
+
+@login_required
+@query_budget(3)
+async def api_unread_notifications_count(request):
+    """API для количества непрочитанных уведомлений"""
+    user = await _auser(request)
+    count = await Notification.objects.filter(user_id=user.pk, is_read=False).acount()
+    return JsonResponse({"unread_count": count})
+
+
+@login_required
+async def mark_notification_as_read_api(request, pk):
+    if request.method != 'POST':
+        return _invalid_method()
+    user = await _auser(request)
+    notif = await aget_object_or_404(Notification, pk=pk, user_id=user.pk)
+    notif.is_read = True
+    await notif.asave(update_fields=['is_read'])
+    return JsonResponse({'status': 'ok'})
+
+
+@login_required
+async def toggle_follow_view(request, username):
+    if request.method != 'POST':
+        return _invalid_method()
+    user = await _auser(request)
+    target_user_id = await aget_object_or_404(User.objects.values_list('pk', flat=True), username=username)
+    if target_user_id == user.pk:
+        return JsonResponse({'status': 'error', 'message': 'Cannot follow yourself'}, status=400)
+    profile = await Profile.objects.only('pk', 'user_id').aget(user_id=user.pk)
+    # подписка и счётчики меняются в одной транзакции — она синхронная
+    following = await sync_to_async(toggle_follow)(profile, target_user_id)
+    followers_count = await Profile.objects.values_list('followers_count', flat=True).aget(user_id=target_user_id)
+    return JsonResponse({'status': 'ok', 'following': following, 'followers_count': followers_count})
@@ -0,0 +1,341 @@
+# app/benchmarks.py
+"""
+Замеры горячих представлений и чата (manage.py run_benchmarks).
+
+Каждый сценарий выполняется warmup раз вхолостую и iterations раз с замером:
+задержка — по часам вокруг запроса тестового клиента (или обмена сообщениями
+с ChatConsumer), число запросов к БД — из замера QueryInstrumentationMiddleware
+(app/instrumentation.py). Результат — JSON с процентилями, который удобно хранить
+и сравнивать между запусками. Рассчитано на базу SQLite с данными generate_dataset
+(настройки telegram_trader_project.settings_benchmark).
+
+compare_async_views() (manage.py benchmark_async_views) сравнивает синхронные и асинхронные
+версии частых JSON-API под ASGIHandler при заданном числе одновременных запросов.
+
+measure_startup() (manage.py benchmark_startup) в отдельных процессах замеряет холодный старт:
+django.setup(), импорт ASGI-приложения с URLconf и первый запрос — и проверяет, что до
+первого запроса процесс не подключался к БД.
+"""
+import asyncio
+import datetime
+import json
+import platform
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import AsyncClient, Client, override_settings
+from django.urls import path, reverse
+
+from .instrumentation import _percentile, report
+from .models import ChatMessage, Notification, Publication
+
+PERCENTILES = (50, 90, 95, 99)
+CHAT_RECEIVE_KEY = 'ws:ChatConsumer.websocket.receive'
+
+
+def _summary(latencies, queries):
+    latencies = sorted(latency * 1000 for latency in latencies)
+    result = {f'p{percent}_ms': round(_percentile(latencies, percent), 3) for percent in PERCENTILES}
+    result.update({
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'min_ms': round(latencies[0], 3),
+        'max_ms': round(latencies[-1], 3),
+        'queries_min': min(queries),
+        'queries_max': max(queries),
+        'queries_mean': round(statistics.fmean(queries), 2),
+    })
+    return result
+
+
+def _pick_users():
+    """(пользователь с наибольшим числом непрочитанных уведомлений, самый популярный автор)"""
+    viewer = User.objects.annotate(
+        unread=Count('notifications', filter=Q(notifications__is_read=False))
+    ).order_by('-unread', 'pk').first()
+    author = User.objects.filter(pk__in=Publication.objects.values('author_id')).order_by(
+        '-profile__followers_count', 'pk').first()
+    return viewer, author or viewer
+
+
+def http_scenarios(author):
+    """{имя сценария: (путь, авторизован ли клиент)}"""
+    return {
+        'home': (reverse('home'), False),
+        'publications_recent': (reverse('publications'), True),
+        'publications_trending': (reverse('publications') + '?filter=trending', True),
+        'profile': (reverse('user_profile', args=[author.username]), True),
+        'leaderboard': (reverse('leaderboard'), True),
+        'notifications_api': (reverse('get_notifications_api'), True),
+        'notifications_unread_count_api': (reverse('api_unread_notifications_count'), True),
+    }
+
+
+def _bench_http(client, path, iterations, warmup):
+    for _ in range(warmup):
+        client.get(path)
+    latencies, queries = [], []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = client.get(path)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path}: HTTP {response.status_code}')
+        queries.append(response.wsgi_request.query_sample.queries)
+    return _summary(latencies, queries)
+
+
+async def _chat_round_trips(user, count):
+    """Задержки и число запросов на сообщение: отправка → сохранение → рассылка группе → получение"""
+    from channels.testing import WebsocketCommunicator
+
+    from .consumers import ChatConsumer
+
+    communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), '/ws/chat/')
+    communicator.scope['user'] = user
+    connected, _ = await communicator.connect()
+    if not connected:
+        raise RuntimeError('ChatConsumer не принял подключение')
+    latencies = []
+    try:
+        for index in range(count):
+            start = time.perf_counter()
+            await communicator.send_json_to({'message': f'benchmark {index}'})
+            await communicator.receive_json_from(timeout=5)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        await communicator.disconnect()
+    # консьюмер работает в своей задаче — запросы берём из его замеров (InstrumentedConsumerMixin)
+    queries = [sample[0] for sample in report.samples(CHAT_RECEIVE_KEY)[-count:]] if count else []
+    return latencies, queries
+
+
+def _bench_chat(user, iterations, warmup):
+    last_pk = ChatMessage.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    try:
+        asyncio.run(_chat_round_trips(user, warmup))
+        latencies, queries = asyncio.run(_chat_round_trips(user, iterations))
+    finally:
+        # сообщения замера не должны менять набор данных для следующих запусков
+        ChatMessage.objects.filter(pk__gt=last_pk, author=user).delete()
+    return _summary(latencies, queries)
+
+
+def run_benchmarks(iterations=50, warmup=5, only=None):
+    """Выполняет сценарии (only — множество имён) и возвращает результат для json.dumps"""
+    viewer, author = _pick_users()
+    if viewer is None:
+        raise RuntimeError('В базе нет пользователей: сначала выполните manage.py generate_dataset')
+
+    anonymous, logged_in = Client(), Client()
+    logged_in.force_login(viewer)
+    results = {}
+    for name, (path, authenticated) in http_scenarios(author).items():
+        if only and name not in only:
+            continue
+        results[name] = _bench_http(logged_in if authenticated else anonymous, path, iterations, warmup)
+    if not only or 'chat_consumer' in only:
+        if getattr(settings, 'CHANNEL_LAYERS', None):
+            results['chat_consumer'] = _bench_chat(viewer, iterations, warmup)
+        else:
+            results['chat_consumer'] = {'skipped': 'CHANNEL_LAYERS не настроены'}
+
+    return {
+        'meta': {
+            'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'iterations': iterations,
+            'warmup': warmup,
+            'dataset': {
+                'users': User.objects.count(),
+                'publications': Publication.objects.count(),
+                'boosts': Publication.boosts.through.objects.count(),
+                'notifications': Notification.objects.count(),
+                'chat_messages': ChatMessage.objects.count(),
+            },
+        },
+        'results': results,
+    }
+
+
+def _comparison_urlconf():
+    """Одни и те же API в двух вариантах: /sync/... (views.py) и /async/... (async_views.py)"""
+    from . import async_views, views
+
+    urlpatterns = []
+    for variant, module in (('sync', views), ('async', async_views)):
+        urlpatterns += [
+            path(f'{variant}/notifications/', module.get_notifications_api),
+            path(f'{variant}/notifications/unread-count/', module.api_unread_notifications_count),
+            path(f'{variant}/notifications/<int:pk>/read/', module.mark_notification_as_read_api),
+            path(f'{variant}/boost/<int:pk>/', module.toggle_boost_view),
+            path(f'{variant}/follow/<str:username>/', module.toggle_follow_view),
+        ]
+    # urlconf должен быть хешируемым (get_resolver кэширует по нему) — подходит класс
+    return type('ComparisonUrls', (), {'urlpatterns': urlpatterns})
+
+
+def async_view_scenarios(viewer, author):
+    """{имя сценария: (метод, путь без префикса варианта)}"""
+    notification_id = Notification.objects.filter(user=viewer).values_list('pk', flat=True).first()
+    publication_id = Publication.objects.exclude(author=viewer).values_list('pk', flat=True).first()
+    scenarios = {
+        'notifications_api': ('GET', 'notifications/'),
+        'notifications_unread_count_api': ('GET', 'notifications/unread-count/'),
+    }
+    if notification_id is not None:
+        scenarios['mark_notification_read_api'] = ('POST', f'notifications/{notification_id}/read/')
+    if publication_id is not None:
+        scenarios['toggle_boost'] = ('POST', f'boost/{publication_id}/')
+    if author.pk != viewer.pk:
+        scenarios['toggle_follow'] = ('POST', f'follow/{author.username}/')
+    return scenarios
+
+
+async def _drive(client, method, path, requests, concurrency):
+    """requests запросов, не больше concurrency одновременно; сводка с пропускной способностью"""
+    semaphore = asyncio.Semaphore(concurrency)
+    send = client.post if method == 'POST' else client.get
+    latencies, queries = [], []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send(path)
+            latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path}: HTTP {response.status_code}')
+        queries.append(response.asgi_request.query_sample.queries)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {'requests_per_second': round(requests / elapsed, 1), **_summary(latencies, queries)}
+
+
+async def _compare(viewer, scenarios, requests, concurrency, warmup):
+    client = AsyncClient()
+    await client.aforce_login(viewer)
+    results = {}
+    for name, (method, suffix) in scenarios.items():
+        results[name] = {}
+        for variant in ('sync', 'async'):
+            path = f'/{variant}/{suffix}'
+            if warmup:
+                await _drive(client, method, path, warmup, concurrency)
+            results[name][variant] = await _drive(client, method, path, requests, concurrency)
+        results[name]['speedup'] = round(
+            results[name]['async']['requests_per_second'] / results[name]['sync']['requests_per_second'], 2)
+    return results
+
+
+def compare_async_views(requests=500, concurrency=50, warmup=20):
+    """Пропускная способность и задержки синхронных и асинхронных JSON-API; результат для json.dumps"""
+    viewer, author = _pick_users()
+    if viewer is None:
+        raise RuntimeError('В базе нет пользователей: сначала выполните manage.py generate_dataset')
+    scenarios = async_view_scenarios(viewer, author)
+    with override_settings(ROOT_URLCONF=_comparison_urlconf()):
+        results = asyncio.run(_compare(viewer, scenarios, requests, concurrency, warmup))
+    return {
+        'meta': {
+            'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'requests': requests,
+            'concurrency': concurrency,
+            'warmup': warmup,
+        },
+        'results': results,
+    }
+
+
+STARTUP_BUDGET_MS = 1500
+# Модули, загрузку которых стоит откладывать до первого использования
+HEAVY_MODULES = ('telegram', 'requests', 'markdown', 'nh3', 'PIL', 'numpy', 'scipy', 'django.test')
+
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+from django.utils.module_loading import import_string
+import_string(settings.ASGI_APPLICATION)
+# URLconf импортирует представления — подключение при их импорте тоже считается
+get_resolver().url_patterns
+application_done = time.perf_counter()
+connected = [c.alias for c in connections.all(initialized_only=True) if c.connection is not None]
+heavy = sorted(name for name in json.loads(sys.argv[2]) if name in sys.modules)
+from django.test import Client
+request_start = time.perf_counter()
+status = Client().get(sys.argv[1]).status_code
+done = time.perf_counter()
+print(json.dumps({
+    'setup_ms': (setup_done - start) * 1000,
+    'asgi_import_ms': (application_done - setup_done) * 1000,
+    'first_request_ms': (done - request_start) * 1000,
+    'total_ms': (application_done - start + done - request_start) * 1000,
+    'status': status,
+    'db_connected_at_startup': connected,
+    'heavy_modules_at_startup': heavy,
+}))
+"""
+
+
+def _startup_run(path):
+    completed = subprocess.run(
+        [sys.executable, '-c', _STARTUP_SCRIPT, path, json.dumps(HEAVY_MODULES)],
+        cwd=settings.BASE_DIR, env=os.environ.copy(), capture_output=True, text=True, check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f'Процесс замера старта завершился с ошибкой:\n{completed.stderr[-2000:]}')
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure_startup(runs=5, path='/', budget_ms=STARTUP_BUDGET_MS):
+    """
+    Холодный старт в runs новых процессах (до первого ответа на path).
+    Возвращает результат для json.dumps; ключ 'violations' — нарушения бюджета.
+    """
+    samples = [_startup_run(path) for _ in range(runs)]
+    result = {
+        key: round(statistics.median(sample[key] for sample in samples), 1)
+        for key in ('setup_ms', 'asgi_import_ms', 'first_request_ms', 'total_ms')
+    }
+    connected = sorted({alias for sample in samples for alias in sample['db_connected_at_startup']})
+    violations = []
+    if result['total_ms'] > budget_ms:
+        violations.append(f"старт {result['total_ms']} мс при бюджете {budget_ms} мс")
+    if connected:
+        violations.append(f"подключение к БД до первого запроса: {', '.join(connected)}")
+    if any(sample['status'] >= 500 for sample in samples):
+        violations.append(f'первый запрос {path} завершился ошибкой')
+    return {
+        'meta': {
+            'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'runs': runs,
+            'path': path,
+            'budget_ms': budget_ms,
+        },
+        'median': result,
+        'max_total_ms': round(max(sample['total_ms'] for sample in samples), 1),
+        'db_connected_at_startup': connected,
+        'heavy_modules_at_startup': samples[-1]['heavy_modules_at_startup'],
+        'violations': violations,
+    }
@@ -0,0 +1,326 @@
+# app/broadcast.py
+"""
+Рассылки в Telegram: новые публикации — подписчикам автора, исходы TP/SL — бустившим,
+дайджесты — всем пользователям с привязанным Telegram.
+
+Событие пишет одну строку Broadcast, поэтому запрос пользователя не зависит от числа
+получателей. Отправщик (python bot.py broadcast) разворачивает рассылки в OutboxMessage
+пачками по EXPAND_BATCH_SIZE профилей и отправляет сообщения пулом asyncio-задач:
+- не более rate сообщений в секунду на бота и одного сообщения в чат за PER_CHAT_INTERVAL;
+- сообщения одному чату склеиваются в одно (до MAX_MESSAGE_LENGTH символов);
+- ответ 429 приостанавливает все отправки на retry_after, и сообщение повторяется;
+- прочие временные ошибки повторяются с экспоненциальной задержкой, до MAX_ATTEMPTS попыток.
+
+Отправщиков может быть несколько: каждый захватывает сообщения арендой, как TaskWorker
+(app/tasks.py) — next_attempt_at сдвигается на LEASE_SECONDS вперёд, locked_by — id
+отправщика. Итог записывается только в сообщения, аренда которых ещё за ним, а сообщения
+упавшего отправщика по окончании аренды заберёт другой. Ограничения rate и
+PER_CHAT_INTERVAL действуют в пределах одного отправщика.
+
+Адрес Bot API передаётся в BroadcastSender, так что отправщик можно проверить
+на локальной заглушке HTTP-сервера.
+"""
+import asyncio
+import logging
+import uuid
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Broadcast, OutboxMessage, Profile, Publication
+
+logger = logging.getLogger(__name__)
+
+PER_CHAT_INTERVAL = 1.0     # секунд между сообщениями в один чат
+CONCURRENCY = 50            # одновременных HTTP-запросов
+REQUEST_TIMEOUT = 10.0
+FETCH_BATCH_SIZE = 1000     # сообщений за один проход
+EXPAND_BATCH_SIZE = 1000    # получателей за один шаг разворачивания
+EXPAND_BROADCASTS = 10      # рассылок, разворачиваемых за один проход
+MAX_MESSAGE_LENGTH = 4096
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 5            # секунд; задержка перед n-й повторной попыткой — BACKOFF_BASE * 2**(n-1)
+MAX_FLOOD_RETRIES = 3       # повторов после 429 внутри одного прохода
+IDLE_INTERVAL = 2.0
+LEASE_SECONDS = 300         # аренда захваченных сообщений; больше времени одного прохода
+DESCRIPTION_PREVIEW = 300
+DIGEST_SIZE = 5
+
+OUTCOME_TITLES = {
+    Publication.StatusChoices.TARGET_HIT: '✅ Цель достигнута',
+    Publication.StatusChoices.STOP_HIT: '🛑 Сработал стоп-лосс',
+}
+
+
+def _publication_link(publication_id):
+    return f"{settings.SITE_URL.rstrip('/')}/publication/{publication_id}/"
+
+
+def enqueue_publication_broadcast(publication):
+    """Рассылка подписчикам автора о новой публикации"""
+    text = (
+        f'🚀 Новая идея от @{publication.author.username}\n\n'
+        f'{publication.description[:DESCRIPTION_PREVIEW]}\n\n'
+        f'🎯 {publication.target_1} · 🛑 {publication.stop_loss}\n'
+        f'{_publication_link(publication.pk)}'
+    )
+    return Broadcast.objects.create(
+        audience=Broadcast.Audiences.SUBSCRIBERS, author_id=publication.author_id,
+        publication=publication, text=text,
+    )
+
+
+def enqueue_outcome_broadcast(publication):
+    """Рассылка бустившим публикацию о её исходе (TP/SL)"""
+    text = (
+        f'{OUTCOME_TITLES[publication.status]}: идея @{publication.author.username} '
+        f'от {publication.created_at.strftime("%d.%m.%Y")}\n'
+        f'{_publication_link(publication.pk)}'
+    )
+    return Broadcast.objects.create(
+        audience=Broadcast.Audiences.BOOSTERS, author_id=publication.author_id,
+        publication=publication, text=text,
+    )
+
+
+def enqueue_digest(since=None):
+    """Рассылка всем пользователям: самые бустуемые публикации с момента since (по умолчанию — за сутки)"""
+    since = since or timezone.now() - timezone.timedelta(days=1)
+    top = list(
+        Publication.objects.filter(created_at__gte=since).select_related('author')
+        .annotate(boost_total=Count('boosts')).order_by('-boost_total', '-created_at')[:DIGEST_SIZE]
+    )
+    if not top:
+        return None
+    lines = ['📊 Лучшие идеи за сутки']
+    for position, publication in enumerate(top, 1):
+        lines.append(
+            f'{position}. @{publication.author.username} — 🚀 {publication.boost_total}\n'
+            f'{_publication_link(publication.pk)}'
+        )
+    return Broadcast.objects.create(audience=Broadcast.Audiences.ALL, text='\n\n'.join(lines))
+
+
+def _recipients(broadcast):
+    profiles = Profile.objects.filter(telegram_id__isnull=False)
+    if broadcast.audience == Broadcast.Audiences.SUBSCRIBERS:
+        profiles = profiles.filter(subscribed_to=broadcast.author_id)
+    elif broadcast.audience == Broadcast.Audiences.BOOSTERS:
+        profiles = profiles.filter(user__boosted_publications=broadcast.publication_id)
+    if broadcast.author_id:
+        profiles = profiles.exclude(user_id=broadcast.author_id)
+    return profiles
+
+
+def expand_broadcasts():
+    """Создаёт сообщения для очередной пачки получателей незавершённых рассылок; возвращает их число"""
+    created = 0
+    pending = Broadcast.objects.filter(is_expanded=False).order_by('pk').values_list('pk', flat=True)
+    for broadcast_id in list(pending[:EXPAND_BROADCASTS]):
+        with transaction.atomic():
+            broadcast = Broadcast.objects.select_for_update().filter(pk=broadcast_id, is_expanded=False).first()
+            if broadcast is None:
+                continue
+            recipients = list(
+                _recipients(broadcast).filter(pk__gt=broadcast.expanded_up_to)
+                .order_by('pk').values_list('pk', 'telegram_id')[:EXPAND_BATCH_SIZE]
+            )
+            OutboxMessage.objects.bulk_create([
+                OutboxMessage(broadcast=broadcast, chat_id=telegram_id, text=broadcast.text)
+                for _, telegram_id in recipients
+            ], batch_size=EXPAND_BATCH_SIZE)
+            if recipients:
+                broadcast.expanded_up_to = recipients[-1][0]
+            broadcast.is_expanded = len(recipients) < EXPAND_BATCH_SIZE
+            broadcast.save(update_fields=['expanded_up_to', 'is_expanded'])
+        created += len(recipients)
+    return created
+
+
+def claim_due_messages(sender_id, limit=FETCH_BATCH_SIZE):
+    """Захватывает сообщения, которые пора отправить; возвращает их в порядке постановки в очередь"""
+    now = timezone.now()
+    due = OutboxMessage.objects.filter(status=OutboxMessage.Statuses.PENDING, next_attempt_at__lte=now)
+    due_ids = list(due.order_by('pk').values_list('pk', flat=True)[:limit])
+    if not due_ids:
+        return []
+    # условие повторяется: сообщение мог захватить другой отправщик
+    due.filter(pk__in=due_ids).update(
+        next_attempt_at=now + timezone.timedelta(seconds=LEASE_SECONDS), locked_by=sender_id,
+    )
+    return list(
+        OutboxMessage.objects.filter(pk__in=due_ids, locked_by=sender_id)
+        .order_by('pk').values('pk', 'chat_id', 'text', 'attempts')
+    )
+
+
+class ChatBatch:
+    """Одно или несколько сообщений очереди, отправляемых в чат одним запросом"""
+    SENT, RETRY, FAILED = 'sent', 'retry', 'failed'
+
+    def __init__(self, chat_id, message):
+        self.chat_id = chat_id
+        self.ids = [message['pk']]
+        self.text = message['text'][:MAX_MESSAGE_LENGTH]
+        self.attempts = message['attempts']
+        self.outcome = None
+        self.error = ''
+
+    def try_append(self, message):
+        text = f"{self.text}\n\n{message['text']}"
+        if len(text) > MAX_MESSAGE_LENGTH:
+            return False
+        self.ids.append(message['pk'])
+        self.text = text
+        self.attempts = max(self.attempts, message['attempts'])
+        return True
+
+    def finish(self, outcome, error=''):
+        self.outcome = outcome
+        self.error = error[:255]
+
+
+def group_by_chat(messages):
+    """Склеивает сообщения одного чата в пакеты не длиннее MAX_MESSAGE_LENGTH, сохраняя порядок"""
+    batches, open_batches = [], {}
+    for message in messages:
+        chat_id = message['chat_id']
+        batch = open_batches.get(chat_id)
+        if batch is None or not batch.try_append(message):
+            batch = ChatBatch(chat_id, message)
+            open_batches[chat_id] = batch
+            batches.append(batch)
+    return batches
+
+
+def save_results(batches, sender_id):
+    """
+    Записывает итоги отправки: отправленные — одним UPDATE на пачку id, ошибки — по пакетам.
+    Сообщения, аренда которых перешла к другому отправщику, не меняются.
+    """
+    now = timezone.now()
+    claimed = OutboxMessage.objects.filter(locked_by=sender_id)
+    sent_ids = [pk for batch in batches if batch.outcome == ChatBatch.SENT for pk in batch.ids]
+    for start in range(0, len(sent_ids), FETCH_BATCH_SIZE):
+        claimed.filter(pk__in=sent_ids[start:start + FETCH_BATCH_SIZE]).update(
+            status=OutboxMessage.Statuses.SENT, sent_at=now, attempts=F('attempts') + 1, last_error='',
+            locked_by='',
+        )
+
+    for batch in batches:
+        if batch.outcome == ChatBatch.SENT:
+            continue
+        messages = claimed.filter(pk__in=batch.ids)
+        attempts = batch.attempts + 1
+        if batch.outcome == ChatBatch.FAILED or attempts >= MAX_ATTEMPTS:
+            messages.update(status=OutboxMessage.Statuses.FAILED, attempts=F('attempts') + 1,
+                            last_error=batch.error, locked_by='')
+        else:
+            delay = timezone.timedelta(seconds=BACKOFF_BASE * 2 ** (attempts - 1))
+            messages.update(attempts=F('attempts') + 1, next_attempt_at=now + delay, last_error=batch.error,
+                            locked_by='')
+
+
+class RateLimiter:
+    """Равномерно пропускает не более rate вызовов в секунду; pause() задерживает все следующие вызовы"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+
+    async def wait(self):
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next)
+        self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def pause(self, seconds):
+        self._next = max(self._next, asyncio.get_running_loop().time() + seconds)
+
+
+class BroadcastSender:
+    """Отправщик очереди OutboxMessage через Bot API"""
+
+    def __init__(self, token, api_url=None, rate=None, concurrency=CONCURRENCY):
+        api_url = (api_url or settings.TELEGRAM_API_URL).rstrip('/')
+        self.url = f'{api_url}/bot{token}/sendMessage'
+        self.limiter = RateLimiter(rate or settings.TELEGRAM_BROADCAST_RATE)
+        self.concurrency = concurrency
+        self.client = None
+        self.sender_id = uuid.uuid4().hex
+        self._chat_next = {}
+
+    async def _wait_chat(self, chat_id):
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._chat_next.get(chat_id, 0.0))
+        self._chat_next[chat_id] = start + PER_CHAT_INTERVAL
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def send(self, batch):
+        """Отправляет пакет и записывает итог в batch.outcome"""
+        for _ in range(MAX_FLOOD_RETRIES + 1):
+            await self._wait_chat(batch.chat_id)
+            await self.limiter.wait()
+            try:
+                response = await self.client.post(self.url, json={
+                    'chat_id': batch.chat_id, 'text': batch.text, 'disable_web_page_preview': True,
+                })
+            except httpx.HTTPError as exc:
+                return batch.finish(ChatBatch.RETRY, f'{type(exc).__name__}: {exc}')
+
+            if response.status_code == 200:
+                return batch.finish(ChatBatch.SENT)
+            try:
+                data = response.json()
+            except ValueError:
+                data = {}
+            error = f"{response.status_code}: {data.get('description', '')}"
+            if response.status_code == 429:
+                retry_after = data.get('parameters', {}).get('retry_after', 1)
+                logger.warning('Telegram flood limit, пауза %s с', retry_after)
+                self.limiter.pause(retry_after)
+                continue
+            if response.status_code >= 500:
+                return batch.finish(ChatBatch.RETRY, error)
+            # 400/403: чат не найден, бот заблокирован и т. п. — повтор не поможет
+            return batch.finish(ChatBatch.FAILED, error)
+        return batch.finish(ChatBatch.RETRY, error)
+
+    async def run_once(self):
+        """Один проход: разворачивание рассылок и отправка пачки сообщений; возвращает число сообщений"""
+        await sync_to_async(expand_broadcasts)()
+        messages = await sync_to_async(claim_due_messages)(self.sender_id)
+        if not messages:
+            return 0
+
+        now = asyncio.get_running_loop().time()
+        self._chat_next = {chat_id: at for chat_id, at in self._chat_next.items() if at > now}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def worker(batch):
+            async with semaphore:
+                await self.send(batch)
+
+        batches = group_by_chat(messages)
+        await asyncio.gather(*(worker(batch) for batch in batches))
+        await sync_to_async(save_results)(batches, self.sender_id)
+        return len(messages)
+
+    async def run(self, until_idle=False):
+        """Обрабатывает очередь; при until_idle=True завершается, когда отправлять нечего"""
+        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
+            self.client = client
+            while True:
+                processed = await self.run_once()
+                if processed:
+                    logger.info('Обработано сообщений: %s', processed)
+                    continue
+                if until_idle:
+                    return
+                await asyncio.sleep(IDLE_INTERVAL)
@@ -0,0 +1,369 @@
+# app/caching.py
+"""
+Двухуровневый кэш с тегами.
+
+Перед общим бэкендом (settings.CACHES['default'], в бою — Redis) стоит LRU в памяти
+процесса на CACHE_LOCAL_MAX_ENTRIES записей: повторное чтение горячего ключа не ходит в сеть.
+Записи помечаются тегами ('publication:42', 'user:7:notifications'), и invalidate_tags()
+делает устаревшими все записи с тегом:
+  - в общем бэкенде у тега есть версия (ключ cache_tag:<тег>); запись хранит версии своих
+    тегов на момент чтения данных и при расхождении считается промахом;
+  - локальный уровень этого процесса чистится сразу, остальных процессов — по рассылке
+    через channel layer (группа INVALIDATION_GROUP, её слушает фоновый поток процесса).
+Без общего channel layer (InMemoryChannelLayer при разработке) рассылки нет: локальная
+запись живёт не дольше CACHE_LOCAL_TIMEOUT секунд — это и предел расхождения процессов,
+если сообщение о сбросе потерялось.
+
+Теги объектов моделей выдаёт instance_tags(); сигналы в models.py сбрасывают их
+при сохранении, удалении и изменении связей many-to-many у моделей, чьи данные
+кэшируются. Массовые update()/delete()/bulk_create сигналов не отправляют — после
+них теги сбрасываются одним явным вызовом invalidate_tags() на операцию.
+"""
+import asyncio
+import logging
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection, transaction
+
+from .models import Notification, Profile, Publication, UserAchievement, UserStatistics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_LOCAL_MAX_ENTRIES = 5000
+DEFAULT_LOCAL_TIMEOUT = 60
+INVALIDATION_GROUP = 'cache_invalidation'
+TAG_KEY_PREFIX = 'cache_tag:'
+# Членство в группе channels_redis истекает — слушатель периодически вступает заново
+REJOIN_INTERVAL = 60 * 60
+RECONNECT_DELAY = 5
+
+# Разделы пользователя, которые меняет объект модели: {модель: (атрибут с id пользователя, разделы)}
+USER_SECTIONS = {
+    User: ('pk', ('profile',)),
+    Profile: ('user_id', ('profile',)),
+    UserStatistics: ('user_id', ('profile',)),
+    UserAchievement: ('user_id', ('profile',)),
+    Publication: ('author_id', ('profile', 'publications')),
+    Notification: ('user_id', ('notifications',)),
+}
+
+_PROCESS_ID = uuid.uuid4().hex
+_MISSING = object()
+
+
+def object_tag(model, pk):
+    """Тег одного объекта: 'publication:42'"""
+    return f'{model._meta.model_name}:{pk}'
+
+
+def user_tag(user_id, section):
+    """Тег раздела пользователя: 'user:7:notifications'"""
+    return f'user:{user_id}:{section}'
+
+
+def instance_tags(instance):
+    """Теги, которые устаревают при изменении объекта: весь список модели, сам объект и разделы владельца"""
+    model = type(instance)
+    tags = [model._meta.model_name, object_tag(model, instance.pk)]
+    owner = USER_SECTIONS.get(model)
+    if owner is not None:
+        field, sections = owner
+        user_id = getattr(instance, field)
+        tags.extend(user_tag(user_id, section) for section in sections)
+    return tags
+
+
+def _tag_key(tag):
+    return f'{TAG_KEY_PREFIX}{tag}'
+
+
+class LocalLRU:
+    """LRU в памяти процесса: ключ -> (pickle значения, момент истечения, теги)"""
+
+    def __init__(self, max_entries=DEFAULT_LOCAL_MAX_ENTRIES, timeout=DEFAULT_LOCAL_TIMEOUT):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._by_tag = {}
+        # растёт при каждом сбросе: значение, прочитанное до сброса, не попадёт в локальный уровень
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[1] < time.monotonic():
+                self._remove(key)
+                return _MISSING
+            self._entries.move_to_end(key)
+        # копия на каждое чтение, как у бэкендов Django: вызывающий может менять значение
+        return pickle.loads(entry[0])
+
+    def set(self, key, value, timeout, tags, generation=None):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._remove(key)
+            self._entries[key] = (data, time.monotonic() + timeout, tuple(tags))
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._remove(key)
+
+    def invalidate(self, tags):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._by_tag.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_tag.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+
+class TaggedCache:
+    """Локальный LRU перед общим бэкендом; записи с тегами"""
+
+    def __init__(self, alias='default', local=None):
+        self.alias = alias
+        self.local = local if local is not None else LocalLRU()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _tag_versions(self, tags, found):
+        """{тег: версия}; found — уже прочитанные ключи. Отсутствующие версии создаются"""
+        versions = {tag: found.get(_tag_key(tag)) for tag in tags}
+        missing = [tag for tag, version in versions.items() if version is None]
+        if missing:
+            # версия ещё не создана или вытеснена: новое уникальное значение, чтобы записи,
+            # сохранённые под прежними версиями, не прочитались
+            for tag in missing:
+                self.shared.add(_tag_key(tag), time.time_ns(), None)
+            fresh = self.shared.get_many([_tag_key(tag) for tag in missing])
+            versions.update((tag, fresh.get(_tag_key(tag))) for tag in missing)
+        return versions
+
+    def tag_versions(self, *tags):
+        """{тег: версия}: версия меняется при каждом invalidate_tags() (валидаторы app/conditional.py)"""
+        return self._tag_versions(tags, self.shared.get_many([_tag_key(tag) for tag in tags]))
+
+    def get(self, key, default=None):
+        _ensure_listener()
+        value = self.local.get(key)
+        if value is not _MISSING:
+            return value
+        generation = self.local.generation
+        entry = self.shared.get(key)
+        if entry is None:
+            return default
+        value, versions = entry
+        if versions and self._tag_versions(versions, self.shared.get_many(
+                [_tag_key(tag) for tag in versions])) != versions:
+            return default
+        self.local.set(key, value, None, versions, generation)
+        return value
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, tags=()):
+        """
+        Значение ключа или default (вызывается, если это функция), сохранённое с тегами.
+        Запись и версии её тегов читаются из общего бэкенда одним запросом.
+        """
+        _ensure_listener()
+        value = self.local.get(key)
+        if value is not _MISSING:
+            return value
+        generation = self.local.generation
+        found = self.shared.get_many([key, *(_tag_key(tag) for tag in tags)])
+        # версии берутся до вычисления значения: сброс во время вычисления его не потеряет
+        versions = self._tag_versions(tags, found)
+        entry = found.get(key)
+        if entry is not None and entry[1] == versions:
+            value = entry[0]
+        else:
+            value = default() if callable(default) else default
+            self.shared.set(key, (value, versions), timeout)
+        self.local.set(key, value, timeout, tags, generation)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, tags=()):
+        _ensure_listener()
+        generation = self.local.generation
+        found = self.shared.get_many([_tag_key(tag) for tag in tags]) if tags else {}
+        self.shared.set(key, (value, self._tag_versions(tags, found)), timeout)
+        self.local.set(key, value, timeout, tags, generation)
+
+    def get_many(self, keys):
+        """{ключ: значение} для найденных ключей без тегов; промахи локального уровня — одним запросом"""
+        _ensure_listener()
+        found, missing = {}, []
+        for key in keys:
+            value = self.local.get(key)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            generation = self.local.generation
+            for key, (value, versions) in self.shared.get_many(missing).items():
+                if versions:
+                    # записи с тегами требуют проверки версий — их читает get()
+                    continue
+                found[key] = value
+                self.local.set(key, value, None, (), generation)
+        return found
+
+    def set_many(self, mapping, timeout=DEFAULT_TIMEOUT):
+        """Сохраняет значения без тегов одним запросом к общему бэкенду"""
+        _ensure_listener()
+        generation = self.local.generation
+        self.shared.set_many({key: (value, {}) for key, value in mapping.items()}, timeout)
+        for key, value in mapping.items():
+            self.local.set(key, value, timeout, (), generation)
+
+    def delete(self, *keys):
+        self.shared.delete_many(keys)
+        self.local.delete(keys)
+        _publish({'keys': list(keys)})
+
+    def invalidate_tags(self, *tags):
+        """Делает устаревшими записи с любым из тегов во всех процессах"""
+        tags = list(dict.fromkeys(tags))
+        if not tags:
+            return
+        self._invalidate(tags)
+        if connection.in_atomic_block:
+            # до фиксации другие транзакции читают старые данные и могут снова положить их в кэш
+            transaction.on_commit(lambda: self._invalidate(tags), robust=True)
+
+    def _invalidate(self, tags):
+        self.local.invalidate(tags)
+        version = time.time_ns()
+        self.shared.set_many({_tag_key(tag): version for tag in tags}, None)
+        _publish({'tags': tags})
+
+
+cache = TaggedCache(local=LocalLRU(
+    getattr(settings, 'CACHE_LOCAL_MAX_ENTRIES', DEFAULT_LOCAL_MAX_ENTRIES),
+    getattr(settings, 'CACHE_LOCAL_TIMEOUT', DEFAULT_LOCAL_TIMEOUT),
+))
+
+
+# Согласование локальных уровней процессов через channel layer
+
+_listener_lock = threading.Lock()
+_listener_started = False
+
+
+def _remote_layer():
+    """Общий для процессов channel layer или None (нет слоя или он в памяти процесса)"""
+    from channels.layers import InMemoryChannelLayer, get_channel_layer
+
+    layer = get_channel_layer()
+    if layer is None or isinstance(layer, InMemoryChannelLayer):
+        return None
+    return layer
+
+
+def _publish(payload):
+    layer = _remote_layer()
+    if layer is None:
+        return
+    try:
+        async_to_sync(layer.group_send)(INVALIDATION_GROUP, {
+            'type': 'cache.invalidate', 'origin': _PROCESS_ID, **payload})
+    except Exception:
+        # записи других процессов устареют не позже чем через CACHE_LOCAL_TIMEOUT
+        logger.exception('Не удалось разослать сброс кэша %s', payload)
+
+
+def _apply(message):
+    if message.get('origin') == _PROCESS_ID:
+        return
+    if message.get('tags'):
+        cache.local.invalidate(message['tags'])
+    if message.get('keys'):
+        cache.local.delete(message['keys'])
+
+
+async def _listen(layer):
+    while True:
+        try:
+            channel = await layer.new_channel()
+            await layer.group_add(INVALIDATION_GROUP, channel)
+            rejoin_at = time.monotonic() + REJOIN_INTERVAL
+            while True:
+                if time.monotonic() >= rejoin_at:
+                    await layer.group_add(INVALIDATION_GROUP, channel)
+                    rejoin_at = time.monotonic() + REJOIN_INTERVAL
+                try:
+                    message = await asyncio.wait_for(layer.receive(channel), REJOIN_INTERVAL)
+                except asyncio.TimeoutError:
+                    continue
+                _apply(message)
+        except Exception:
+            logger.exception('Слушатель сброса кэша отключился, повтор через %s с', RECONNECT_DELAY)
+        # сообщения, пришедшие без слушателя, потеряны — локальному уровню нельзя доверять
+        cache.local.clear()
+        await asyncio.sleep(RECONNECT_DELAY)
+
+
+def _ensure_listener():
+    """Запускает слушателя рассылки при первом обращении к кэшу в процессе"""
+    global _listener_started
+    if _listener_started:
+        return
+    with _listener_lock:
+        if _listener_started:
+            return
+        _listener_started = True
+        layer = _remote_layer()
+        if layer is not None:
+            threading.Thread(target=asyncio.run, args=(_listen(layer),),
+                             name='cache-invalidation', daemon=True).start()
+
+
+def invalidate_instance(instance):
+    """Сбрасывает теги объекта модели (см. instance_tags)"""
+    cache.invalidate_tags(*instance_tags(instance))
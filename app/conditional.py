@@ -0,0 +1,97 @@
+# app/conditional.py
+"""
+Условные GET-запросы (ETag / Last-Modified) для часто обновляемых страниц и API.
+
+Валидаторы строятся из версий тегов кэша (app/caching.py): версия тега меняется при каждом
+invalidate_tags(), а теги сбрасывают сигналы моделей и явные вызовы после update()/bulk_create.
+Проверка If-None-Match / If-Modified-Since стоит одного чтения из кэша и не трогает БД —
+при совпадении представление не выполняется и клиент получает 304.
+
+В ETag также входят путь с параметрами, пользователь и CSRF-cookie (они есть в HTML), а для
+ответов, которые меняются и без записи (счётчики просмотров, окно «за неделю»), — номер
+интервала window секунд. Ответ помечается Cache-Control: private, no-cache: браузер хранит
+его, но перед показом всегда переспрашивает сервер.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .caching import cache, user_tag
+
+# Разделы пользователя, которые видны на любой HTML-странице: шапка (профиль) и проверки ролей
+PAGE_USER_SECTIONS = ('profile', 'roles')
+
+
+def _validators(request, tags, user_sections, window):
+    """(ETag, Last-Modified в секундах) или None, если ответ нельзя отдавать из кэша клиента"""
+    if hasattr(request, '_messages') and len(get_messages(request)):
+        # 304 не покажет ожидающие сообщения
+        return None
+    user_id = request.user.pk if request.user.is_authenticated else None
+    tags = [*tags, *(user_tag(user_id, section) for section in user_sections if user_id is not None)]
+    versions = cache.tag_versions(*tags)
+    parts = [request.get_full_path(), str(user_id), request.META.get('CSRF_COOKIE') or '']
+    parts.extend(f'{tag}={versions[tag]}' for tag in sorted(versions))
+    # версии тегов — time_ns() момента сброса
+    last_modified = max(versions.values(), default=0) // 10 ** 9
+    if window:
+        bucket = int(time.time() // window)
+        parts.append(f'window={bucket}')
+        last_modified = max(last_modified, bucket * window)
+    etag = '"%s"' % hashlib.md5('\n'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    return etag, last_modified or None
+
+
+def _not_modified(request, validators):
+    if validators is None:
+        return None
+    etag, last_modified = validators
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def _finish(response, validators):
+    if validators is None or response.status_code not in (200, 304):
+        return response
+    etag, last_modified = validators
+    response.headers.setdefault('ETag', etag)
+    if last_modified and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def conditional(*tags, user_sections=PAGE_USER_SECTIONS, window=None):
+    """
+    Отвечает 304 на GET/HEAD, если не изменился ни один тег ресурса.
+
+    tags — теги данных ответа (см. caching.instance_tags); user_sections — разделы текущего
+    пользователя, от которых зависит ответ; window — не дольше скольких секунд валидаторы
+    остаются прежними без записи. Для класса представления — method_decorator(..., name='get').
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view(request, *args, **kwargs)
+                # пользователь загружается асинхронно; request.user дальше берёт его из кэша
+                request.user = await request.auser()
+                validators = await sync_to_async(_validators)(request, tags, user_sections, window)
+                response = _not_modified(request, validators) or await view(request, *args, **kwargs)
+                return _finish(response, validators)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return view(request, *args, **kwargs)
+                validators = _validators(request, tags, user_sections, window)
+                response = _not_modified(request, validators) or view(request, *args, **kwargs)
+                return _finish(response, validators)
+        return wrapper
+    return decorator
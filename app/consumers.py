@@ -2,11 +2,15 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from .instrumentation import InstrumentedConsumerMixin
 from .models import ChatMessage
 from django.contrib.auth.models import User
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(InstrumentedConsumerMixin, AsyncWebsocketConsumer):
+    # одно сообщение чата — одна вставка
+    query_budgets = {'websocket.receive': 1}
+
     async def connect(self):
         self.room_name = 'general_chat'
         self.room_group_name = f'chat_{self.room_name}'
@@ -0,0 +1,12 @@
+# app/context_processors.py
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_roles
+
+
+def roles(request):
+    """
+    Добавляет в контекст шаблонов user_roles (группы и права текущего пользователя).
+    Загружается лениво: страницы, которые не проверяют роли, ничего не платят.
+    """
+    return {'user_roles': SimpleLazyObject(lambda: get_roles(request.user))}
@@ -0,0 +1,182 @@
+# app/education.py
+"""
+Обучающие материалы: предварительный рендеринг Markdown и каталог.
+
+Содержимое (Markdown) превращается в HTML при сохранении материала (сигнал в models.py),
+а не при каждом просмотре: HTML очищается от опасной разметки (nh3), рядом сохраняются
+оглавление и оценка времени чтения. RENDERER_VERSION увеличивается при любом изменении
+рендеринга; материалы со старой версией перерисовывает manage.py render_materials.
+
+Каталог листается keyset-пагинацией по (created_at, id) — по индексу, без OFFSET —
+и не читает тексты материалов. Рекомендуемые (is_featured) закрепляются над первой
+страницей. Число материалов каждого типа хранится в MaterialTypeCount и меняется
+сигналами при создании, смене типа и удалении материала.
+"""
+import base64
+import html
+import math
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.utils.dateparse import parse_datetime
+
+from .caching import cache
+from .models import EducationalMaterial, MaterialTypeCount
+
+RENDERER_VERSION = 1
+WORDS_PER_MINUTE = 200
+RENDER_BATCH_SIZE = 200
+CATALOGUE_PAGE_SIZE = 12
+FEATURED_LIMIT = 4
+# Крупные колонки, которые не нужны в списках
+LIST_DEFERRED_FIELDS = ('content', 'content_html', 'toc')
+
+MARKDOWN_EXTENSIONS = ['toc', 'fenced_code', 'tables', 'sane_lists']
+ALLOWED_TAGS = {
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'br', 'hr', 'blockquote', 'pre', 'code',
+    'strong', 'em', 'del', 'ul', 'ol', 'li', 'a', 'img',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td',
+}
+ALLOWED_ATTRIBUTES = {
+    **{heading: {'id'} for heading in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')},
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title'},
+    'th': {'align'},
+    'td': {'align'},
+    'code': {'class'},
+}
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def _flatten_toc(tokens):
+    """Вложенные toc_tokens Python-Markdown → плоский список {'level', 'id', 'title'}"""
+    flat = []
+    for token in tokens:
+        flat.append({'level': token['level'], 'id': token['id'], 'title': html.unescape(token['name'])})
+        flat.extend(_flatten_toc(token['children']))
+    return flat
+
+
+def render_markdown(text):
+    """Возвращает (очищенный HTML, оглавление, время чтения в минутах)"""
+    # рендеринг нужен только при сохранении материала — не каждому процессу, импортирующему каталог
+    import markdown
+    import nh3
+    from markdown.extensions.toc import slugify_unicode
+
+    renderer = markdown.Markdown(
+        extensions=MARKDOWN_EXTENSIONS,
+        extension_configs={'toc': {'slugify': slugify_unicode}},
+    )
+    content_html = nh3.clean(renderer.convert(text), tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
+    reading_time = max(1, math.ceil(len(_WORD_RE.findall(text)) / WORDS_PER_MINUTE))
+    return content_html, _flatten_toc(renderer.toc_tokens), reading_time
+
+
+def render_material(material):
+    """Заполняет поля рендеринга материала (без сохранения)"""
+    material.content_html, material.toc, material.reading_time = render_markdown(material.content)
+    material.renderer_version = RENDERER_VERSION
+
+
+def rerender_materials(force=False):
+    """
+    Перерисовывает материалы, отрисованные прежней версией рендерера (force — все).
+    Пишет пачками через bulk_update, минуя сигналы; возвращает число материалов.
+    """
+    materials = EducationalMaterial.objects.only('pk', 'content').order_by('pk')
+    if not force:
+        materials = materials.filter(renderer_version__lt=RENDERER_VERSION)
+
+    rendered, batch = 0, []
+    for material in materials.iterator(chunk_size=RENDER_BATCH_SIZE):
+        render_material(material)
+        batch.append(material)
+        if len(batch) >= RENDER_BATCH_SIZE:
+            EducationalMaterial.objects.bulk_update(
+                batch, ['content_html', 'toc', 'reading_time', 'renderer_version'])
+            rendered += len(batch)
+            batch = []
+    if batch:
+        EducationalMaterial.objects.bulk_update(batch, ['content_html', 'toc', 'reading_time', 'renderer_version'])
+        rendered += len(batch)
+    if rendered:
+        # bulk_update не отправляет сигналы: время чтения видно в каталоге
+        cache.invalidate_tags('educationalmaterial')
+    return rendered
+
+
+def shift_material_type_count(material_type, delta):
+    """Меняет счётчик материалов типа material_type на delta (строка создаётся при первом материале)"""
+    updated = MaterialTypeCount.objects.filter(material_type=material_type).update(count=F('count') + delta)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            MaterialTypeCount.objects.create(material_type=material_type, count=delta)
+    except IntegrityError:
+        # строку одновременно создал параллельный запрос
+        MaterialTypeCount.objects.filter(material_type=material_type).update(count=F('count') + delta)
+
+
+def recount_material_type_counts():
+    """Пересчитывает счётчики по таблице материалов (после массовых правок в обход сигналов)"""
+    counts = dict.fromkeys(EducationalMaterial.MaterialTypes.values, 0)
+    counts.update(
+        EducationalMaterial.objects.order_by().values('material_type')
+        .annotate(total=Count('pk')).values_list('material_type', 'total')
+    )
+    with transaction.atomic():
+        for material_type, count in counts.items():
+            MaterialTypeCount.objects.update_or_create(material_type=material_type, defaults={'count': count})
+
+
+def get_facet_counts():
+    """[{'value', 'label', 'count'}] для каждого типа в порядке MaterialTypes и общее число"""
+    counts = dict(MaterialTypeCount.objects.values_list('material_type', 'count'))
+    facets = [
+        {'value': value, 'label': label, 'count': counts.get(value, 0)}
+        for value, label in EducationalMaterial.MaterialTypes.choices
+    ]
+    return facets, sum(facet['count'] for facet in facets)
+
+
+def encode_cursor(material):
+    raw = f'{material.created_at.isoformat()}|{material.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(created_at, id) из курсора; ValueError, если курсор повреждён"""
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Некорректный курсор')
+    if created_at is None:
+        raise ValueError('Некорректный курсор')
+    return created_at, pk
+
+
+def get_catalogue_page(material_type=None, cursor=None, page_size=CATALOGUE_PAGE_SIZE):
+    """
+    Страница каталога: {'featured', 'materials', 'next_cursor'}.
+    Закреплённые материалы возвращаются только для первой страницы и не повторяются в ленте.
+    """
+    materials = EducationalMaterial.objects.defer(*LIST_DEFERRED_FIELDS).select_related('author')
+    if material_type:
+        materials = materials.filter(material_type=material_type)
+
+    featured = list(materials.filter(is_featured=True).order_by('-created_at', '-id')[:FEATURED_LIMIT])
+    stream = materials.exclude(pk__in=[material.pk for material in featured]).order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        stream = stream.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        featured = []
+
+    page = list(stream[:page_size + 1])
+    next_cursor = encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+    return {'featured': featured, 'materials': page[:page_size], 'next_cursor': next_cursor}
@@ -0,0 +1,84 @@
+# app/follows.py
+"""
+Граф подписок (Profile.subscribed_to).
+
+Переключение подписки работает через промежуточную таблицу по уникальному индексу
+(profile_id, user_id) и не загружает список подписок. Счётчики подписчиков и подписок
+хранятся в Profile и меняются одним UPDATE; изменения через обычный m2m-менеджер
+(например, из админки) пересчитываются сигналом (см. models.py).
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Profile
+from .profiles import count_subquery, invalidate_profile_summary
+
+Follow = Profile.subscribed_to.through
+
+# Сколько id передавать в один IN-запрос
+BATCH_SIZE = 1000
+
+
+def _shift_counters(profile_id, follower_user_id, target_user_id, delta):
+    Profile.objects.filter(pk=profile_id).update(following_count=F('following_count') + delta)
+    Profile.objects.filter(user_id=target_user_id).update(followers_count=F('followers_count') + delta)
+    invalidate_profile_summary(follower_user_id, target_user_id)
+
+
+def toggle_follow(profile, target_user_id):
+    """
+    Подписывает профиль на пользователя или отписывает, если подписка уже есть.
+    Возвращает True, если после вызова профиль подписан.
+    """
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(profile_id=profile.pk, user_id=target_user_id).delete()
+        if deleted:
+            _shift_counters(profile.pk, profile.user_id, target_user_id, -1)
+            return False
+
+        try:
+            with transaction.atomic():
+                Follow.objects.create(profile_id=profile.pk, user_id=target_user_id)
+        except IntegrityError:
+            # параллельный запрос уже создал подписку
+            return True
+        _shift_counters(profile.pk, profile.user_id, target_user_id, 1)
+        return True
+
+
+def get_followed_ids(user, user_ids):
+    """Множество id из user_ids, на которых подписан user (один запрос на пачку)"""
+    if not user.is_authenticated:
+        return set()
+    user_ids = list(set(user_ids))
+    followed = set()
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        followed.update(Follow.objects.filter(
+            profile__user_id=user.pk, user_id__in=user_ids[start:start + BATCH_SIZE]
+        ).values_list('user_id', flat=True))
+    return followed
+
+
+def get_mutual_follow_ids(user_id, limit=100):
+    """id пользователей, с которыми user_id подписан взаимно"""
+    followers = Follow.objects.filter(user_id=user_id).values('profile__user_id')
+    return list(Follow.objects.filter(
+        profile__user_id=user_id, user_id__in=followers
+    ).order_by('user_id').values_list('user_id', flat=True)[:limit])
+
+
+def recount_follow_counters(profile_ids=(), user_ids=()):
+    """Пересчитывает счётчики по промежуточной таблице для указанных профилей/пользователей"""
+    queryset = Profile.objects.none()
+    if profile_ids:
+        queryset = Profile.objects.filter(pk__in=list(profile_ids))
+    if user_ids:
+        queryset = queryset | Profile.objects.filter(user_id__in=list(user_ids))
+    affected = list(queryset.values_list('pk', 'user_id'))
+    if not affected:
+        return
+    Profile.objects.filter(pk__in=[pk for pk, _ in affected]).update(
+        following_count=count_subquery(Follow, 'profile'),
+        followers_count=count_subquery(Follow, 'user', 'user_id'),
+    )
+    invalidate_profile_summary(*[user_id for _, user_id in affected])
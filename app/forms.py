@@ -5,12 +5,8 @@ from django.contrib.auth.models import User
 from .models import Publication, Profile
 
 class CustomUserCreationForm(UserCreationForm):
-    # ... (код остается как у вас, он хороший)
-    telegram_id = forms.IntegerField(
-        required=False,
-        label="Telegram ID",
-        help_text="Введите ваш Telegram ID (число). Необязательно.",
-    )
+    # Telegram привязывается только входом из WebApp (app/telegram_auth.py): введённому вручную
+    # telegram_id верить нельзя
 
     class Meta(UserCreationForm.Meta):
         model = User
@@ -18,7 +14,6 @@ class CustomUserCreationForm(UserCreationForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['telegram_id'] = forms.IntegerField(required=False, label="Telegram ID")
         for field in self.fields:
             self.fields[field].widget.attrs.update({'class': 'form-input'})
 
@@ -0,0 +1,94 @@
+# app/fragments.py
+"""
+Кэш отрисованных фрагментов шаблонов: карточек публикаций и строк лидерборда.
+
+Ключ фрагмента содержит версию всего, что в нём показано (updated_at, число бустов и
+просмотров, имя автора, рейтинг), поэтому сбрасывать его не нужно: изменившийся объект
+получает новый ключ, а старая запись вытесняется по таймауту. Фрагменты страницы читаются
+из кэша одним get_many, недостающие отрисовываются и сохраняются одним set_many.
+
+Фрагмент не должен зависеть от текущего пользователя сверх того, что есть в ключе
+(например, состояние кнопки подписки входит в ключ карточки).
+"""
+import hashlib
+
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .caching import cache
+
+FRAGMENT_TIMEOUT = 60 * 60
+# Меняется при изменении шаблонов фрагментов — старые записи перестают читаться
+FRAGMENT_VERSION = 1
+
+PUBLICATION_CARD_TEMPLATE = 'app/fragments/publication_card.html'
+HOME_PUBLICATION_CARD_TEMPLATE = 'app/fragments/home_publication_card.html'
+LEADERBOARD_ROW_TEMPLATE = 'app/fragments/leaderboard_row.html'
+
+FOLLOW_NONE = ''
+FOLLOW_OFFER = 'follow'
+FOLLOW_ACTIVE = 'following'
+
+
+def fragment_key(template_name, parts):
+    digest = hashlib.md5(
+        '\n'.join(map(str, (FRAGMENT_VERSION, template_name, *parts))).encode(), usedforsecurity=False
+    ).hexdigest()
+    return f'fragment:{digest}'
+
+
+def render_fragments(template_name, contexts, key_parts, timeout=FRAGMENT_TIMEOUT):
+    """
+    Отрисованные фрагменты (SafeString) для каждого контекста из contexts, по порядку.
+    key_parts(context) — значения, от которых зависит фрагмент.
+    """
+    contexts = list(contexts)
+    keys = [fragment_key(template_name, key_parts(context)) for context in contexts]
+    found = cache.get_many(keys)
+    missing = {}
+    template = None
+    for key, context in zip(keys, contexts):
+        if key in found or key in missing:
+            continue
+        if template is None:
+            template = get_template(template_name)
+        missing[key] = str(template.render(context))
+    if missing:
+        cache.set_many(missing, timeout)
+        found.update(missing)
+    return [mark_safe(found[key]) for key in keys]
+
+
+def _publication_parts(context):
+    pub = context['pub']
+    return (pub.pk, pub.updated_at.isoformat(), getattr(pub, 'boost_total', None), pub.views, pub.status,
+            pub.screenshot_image_id, pub.author.username, context.get('follow_state', FOLLOW_NONE))
+
+
+def publication_cards(publications, user, followed_author_ids=()):
+    """Карточки ленты; кнопка подписки зависит от пользователя и входит в ключ"""
+    def follow_state(pub):
+        if not user.is_authenticated or pub.author_id == user.pk:
+            return FOLLOW_NONE
+        return FOLLOW_ACTIVE if pub.author_id in followed_author_ids else FOLLOW_OFFER
+
+    return render_fragments(PUBLICATION_CARD_TEMPLATE,
+                            [{'pub': pub, 'follow_state': follow_state(pub)} for pub in publications],
+                            _publication_parts)
+
+
+def home_publication_cards(publications):
+    """Карточки главной: без бустов и просмотров"""
+    return render_fragments(
+        HOME_PUBLICATION_CARD_TEMPLATE, [{'pub': pub} for pub in publications],
+        lambda context: (context['pub'].pk, context['pub'].updated_at.isoformat(),
+                         context['pub'].screenshot_image_id, context['pub'].author.username),
+    )
+
+
+def leaderboard_rows(profiles):
+    """Строки лидерборда без номера места — он зависит от страницы"""
+    return render_fragments(
+        LEADERBOARD_ROW_TEMPLATE, [{'profile': profile} for profile in profiles],
+        lambda context: (context['profile'].pk, context['profile'].rating_score, context['profile'].user.username),
+    )
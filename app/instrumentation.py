@@ -0,0 +1,281 @@
+# app/instrumentation.py
+"""
+Число запросов к БД, их суммарное время и задержка по каждому представлению
+и обработчику WebSocket.
+
+Каждое соединение с БД получает execute_wrapper (при подключении, сигнал connection_created),
+который учитывает запрос в текущем замере — он хранится в ContextVar, поэтому
+запросы из database_sync_to_async и sync_to_async попадают в замер вызвавшего их кода.
+Замеры открывают QueryInstrumentationMiddleware (HTTP) и InstrumentedConsumerMixin (Channels).
+
+Бюджет запросов объявляется декоратором @query_budget(n) на представлении (или классе
+представления), для консьюмеров — словарём query_budgets {тип сообщения: n}.
+Превышение пишется в лог и в отчёт; при QUERY_BUDGET_STRICT (тесты) — QueryBudgetExceeded.
+Скользящий отчёт (последние INSTRUMENTATION_WINDOW замеров на ключ) — страница
+performance_report_view для модераторов и администраторов.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 500
+UNRESOLVED_KEY = '(маршрут не найден)'
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Представление выполнило больше запросов, чем разрешает его бюджет"""
+
+
+def query_budget(max_queries):
+    """Объявляет бюджет запросов к БД для функции-представления или класса представления"""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def get_view_budget(view_func):
+    """Бюджет из @query_budget: у функции, класса Django (view_class) или DRF (cls)"""
+    for target in (view_func, getattr(view_func, 'view_class', None), getattr(view_func, 'cls', None)):
+        budget = getattr(target, 'query_budget', None)
+        if budget is not None:
+            return budget
+    return None
+
+
+class Sample:
+    """Замер одного запроса или сообщения WebSocket"""
+
+    __slots__ = ('queries', 'db_time', 'latency')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.latency = 0.0
+
+
+_current = contextvars.ContextVar('instrumentation_sample', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    sample = _current.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries += 1
+        sample.db_time += time.perf_counter() - start
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    # execute_wrappers живёт на объекте соединения дольше одного подключения — добавляем один раз
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install_query_recorder, dispatch_uid='app.instrumentation')
+for _connection in connections.all(initialized_only=True):
+    install_query_recorder(connection=_connection)
+
+
+class Report:
+    """Скользящие замеры по ключам (имя представления или обработчика)"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._budgets = {}
+        self._violations = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, sample, budget=None):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append((sample.queries, sample.db_time, sample.latency))
+            self._budgets[key] = budget
+            if budget is not None and sample.queries > budget:
+                self._violations[key] = self._violations.get(key, 0) + 1
+
+    def samples(self, key):
+        """Замеры ключа от старых к новым: [(запросов, время в БД, задержка)]"""
+        with self._lock:
+            return list(self._samples.get(key, ()))
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._budgets.clear()
+            self._violations.clear()
+
+    def rows(self):
+        """Сводка по ключам, самые медленные (p95) первыми"""
+        with self._lock:
+            snapshot = {key: list(samples) for key, samples in self._samples.items()}
+            budgets = dict(self._budgets)
+            violations = dict(self._violations)
+
+        rows = []
+        for key, samples in snapshot.items():
+            queries = [sample[0] for sample in samples]
+            latencies = sorted(sample[2] for sample in samples)
+            rows.append({
+                'key': key,
+                'calls': len(samples),
+                'p50_ms': _percentile(latencies, 50) * 1000,
+                'p95_ms': _percentile(latencies, 95) * 1000,
+                'max_ms': latencies[-1] * 1000,
+                'avg_queries': sum(queries) / len(queries),
+                'max_queries': max(queries),
+                'avg_db_ms': sum(sample[1] for sample in samples) / len(samples) * 1000,
+                'budget': budgets.get(key),
+                'violations': violations.get(key, 0),
+            })
+        rows.sort(key=lambda row: row['p95_ms'], reverse=True)
+        return rows
+
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+report = Report(getattr(settings, 'INSTRUMENTATION_WINDOW', DEFAULT_WINDOW))
+
+
+def _finish(key, sample, budget):
+    """Записывает замер в отчёт и проверяет бюджет"""
+    report.add(key, sample, budget)
+    if budget is not None and sample.queries > budget:
+        message = f'{key}: {sample.queries} запросов к БД при бюджете {budget}'
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+@contextmanager
+def measure(key, budget=None):
+    """Замер блока кода: запросы к БД, их время и задержка попадают в отчёт под ключом key"""
+    sample = Sample()
+    token = _current.set(sample)
+    start = time.perf_counter()
+    try:
+        yield sample
+    finally:
+        sample.latency = time.perf_counter() - start
+        _current.reset(token)
+    _finish(key, sample, budget)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Замеряет каждый HTTP-запрос под именем URL-маршрута (ненайденные адреса — под общим ключом).
+    Поддерживает и синхронную, и асинхронную цепочку: под Daphne асинхронные представления
+    не уходят из-за неё в пул потоков.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sample, token, start = self._begin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self._end(sample, token, start)
+        self._record(request, sample)
+        return response
+
+    async def __acall__(self, request):
+        sample, token, start = self._begin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._end(sample, token, start)
+        self._record(request, sample)
+        return response
+
+    @staticmethod
+    def _begin(request):
+        request._instrumentation = {'key': None, 'budget': None}
+        sample = Sample()
+        return sample, _current.set(sample), time.perf_counter()
+
+    @staticmethod
+    def _end(sample, token, start):
+        sample.latency = time.perf_counter() - start
+        _current.reset(token)
+
+    @staticmethod
+    def _record(request, sample):
+        request.query_sample = sample
+        # ключ и бюджет известны после разрешения URL; не путь: иначе сканеры
+        # несуществующих адресов раздули бы отчёт
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            request._instrumentation['key'] = match.view_name
+            request._instrumentation['budget'] = get_view_budget(match.func)
+        key = request._instrumentation['key'] or UNRESOLVED_KEY
+        _finish(key, sample, request._instrumentation['budget'])
+
+
+class InstrumentedConsumerMixin:
+    """
+    Для консьюмеров Channels: замеряет обработку каждого сообщения.
+    Ключ — 'ws:<Класс>.<тип сообщения>', бюджеты — query_budgets = {'websocket.receive': n}.
+    """
+    query_budgets = {}
+
+    async def dispatch(self, message):
+        key = f"ws:{type(self).__name__}.{message['type']}"
+        with measure(key, self.query_budgets.get(message['type'])):
+            await super().dispatch(message)
+
+
+class QueryBudgetTestMixin:
+    """Помощники для django.test.TestCase"""
+
+    def assertWithinQueryBudget(self, response, budget=None):
+        """
+        Запрос тестового клиента уложился в бюджет представления (или в явно заданный budget).
+        Подходят ответы и Client, и AsyncClient.
+        """
+        request = getattr(response, 'wsgi_request', None) or response.asgi_request
+        sample = request.query_sample
+        if budget is None:
+            budget = request._instrumentation['budget']
+        if budget is None:
+            self.fail(f'У представления {request._instrumentation["key"]} не объявлен бюджет запросов')
+        if sample.queries > budget:
+            raise QueryBudgetExceeded(
+                f'{request._instrumentation["key"]}: {sample.queries} запросов к БД при бюджете {budget}')
+
+    @contextmanager
+    def assertMaxNumQueries(self, budget, using='default'):
+        """Как assertNumQueries, но допускает и меньше запросов"""
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connections[using]) as captured:
+            yield captured
+        if len(captured) > budget:
+            queries = '\n'.join(query['sql'] for query in captured.captured_queries)
+            raise QueryBudgetExceeded(f'{len(captured)} запросов к БД при бюджете {budget}:\n{queries}')
@@ -0,0 +1,33 @@
+# app/management/commands/benchmark_async_views.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmarks import compare_async_views
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность синхронных и асинхронных JSON-API '
+            'при множестве одновременных запросов; результат — JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Запросов на сценарий и вариант')
+        parser.add_argument('--concurrency', type=int, default=50, help='Одновременных запросов')
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--output', help='Файл для JSON (по умолчанию — вывод в консоль)')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests и --concurrency должны быть положительными')
+        try:
+            result = compare_async_views(options['requests'], options['concurrency'], options['warmup'])
+        except RuntimeError as error:
+            raise CommandError(error)
+
+        data = json.dumps(result, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(data + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {options["output"]}'))
+        else:
+            self.stdout.write(data)
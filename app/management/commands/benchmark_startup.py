@@ -0,0 +1,36 @@
+# app/management/commands/benchmark_startup.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmarks import STARTUP_BUDGET_MS, measure_startup
+
+
+class Command(BaseCommand):
+    help = ('Замеряет холодный старт процесса (django.setup, импорт ASGI-приложения, первый запрос) '
+            'и завершается ошибкой при превышении бюджета или обращении к БД при запуске')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--path', default='/', help='Адрес первого запроса (по умолчанию /)')
+        parser.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS,
+                            help=f'Бюджет на медиану старта, мс (по умолчанию {STARTUP_BUDGET_MS})')
+        parser.add_argument('--output', help='Файл для JSON (по умолчанию — вывод в консоль)')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs должно быть положительным')
+        try:
+            result = measure_startup(options['runs'], options['path'], options['budget_ms'])
+        except RuntimeError as error:
+            raise CommandError(error)
+
+        data = json.dumps(result, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(data + '\n')
+        else:
+            self.stdout.write(data)
+        if result['violations']:
+            raise CommandError('; '.join(result['violations']))
+        self.stdout.write(self.style.SUCCESS(f"Старт за {result['median']['total_ms']} мс — в пределах бюджета."))
@@ -0,0 +1,13 @@
+# app/management/commands/build_recommendations.py
+from django.core.management.base import BaseCommand
+
+from app.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации авторов и публикаций (требует numpy и scipy)'
+
+    def handle(self, *args, **options):
+        for kind, users in build_recommendations().items():
+            self.stdout.write(f'{kind}: {users}')
+        self.stdout.write(self.style.SUCCESS('Рекомендации обновлены.'))
@@ -0,0 +1,15 @@
+# app/management/commands/enqueue_digest.py
+from django.core.management.base import BaseCommand
+
+from app.broadcast import enqueue_digest
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь рассылку-дайджест лучших публикаций за сутки (отправляет python bot.py broadcast)'
+
+    def handle(self, *args, **options):
+        broadcast = enqueue_digest()
+        if broadcast is None:
+            self.stdout.write('За сутки публикаций не было, дайджест не создан.')
+            return
+        self.stdout.write(self.style.SUCCESS(f'Дайджест поставлен в очередь (рассылка #{broadcast.pk}).'))
@@ -0,0 +1,13 @@
+# app/management/commands/fetch_video_metadata.py
+from django.core.management.base import BaseCommand
+
+from app.videos import refresh_video_metadata
+
+
+class Command(BaseCommand):
+    help = 'Запрашивает название, длительность и превью видео обзоров рынка (oEmbed) с истёкшим сроком'
+
+    def handle(self, *args, **options):
+        updated, failed = refresh_video_metadata()
+        self.stdout.write(f'Обновлено: {updated}, не удалось: {failed}')
+        self.stdout.write(self.style.SUCCESS('Метаданные видео обновлены.'))
@@ -0,0 +1,37 @@
+# app/management/commands/generate_dataset.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.synthetic import CHUNK_SIZE, generate_dataset
+
+
+class Command(BaseCommand):
+    help = ('Генерирует синтетических пользователей, подписки, публикации, бусты, уведомления и сообщения чата '
+            'для нагрузочных замеров (не запускать на боевой базе)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--publications', type=int, default=5000)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--boosts-per-publication', type=int, default=10)
+        parser.add_argument('--notifications-per-user', type=int, default=20)
+        parser.add_argument('--chat-messages', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None, help='Зерно генератора для воспроизводимых наборов')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help=f'Строк в одном bulk_create (по умолчанию {CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counts = generate_dataset(
+                users=options['users'],
+                publications=options['publications'],
+                follows_per_user=options['follows_per_user'],
+                boosts_per_publication=options['boosts_per_publication'],
+                notifications_per_user=options['notifications_per_user'],
+                chat_messages=options['chat_messages'],
+                seed=options['seed'],
+                chunk_size=options['chunk_size'],
+            )
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS('Набор данных создан.'))
@@ -0,0 +1,26 @@
+# app/management/commands/process_login_streaks.py
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from app.streaks import process_login_streaks
+
+
+class Command(BaseCommand):
+    help = 'Ночная обработка серий входов: продление/сброс login_streak и выдача достижения «Активист»'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Обрабатываемый день в формате YYYY-MM-DD (по умолчанию — вчера)')
+
+    def handle(self, *args, **options):
+        day = None
+        if options['date']:
+            day = parse_date(options['date'])
+            if day is None:
+                raise CommandError('Дата должна быть в формате YYYY-MM-DD')
+
+        result = process_login_streaks(day)
+        self.stdout.write(
+            f"Продлено: {result['extended']}, начато: {result['started']}, "
+            f"сброшено: {result['reset']}, выдано достижений: {result['awarded']}"
+        )
+        self.stdout.write(self.style.SUCCESS('Серии входов обновлены.'))
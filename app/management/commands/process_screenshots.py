@@ -0,0 +1,17 @@
+# app/management/commands/process_screenshots.py
+from django.core.management.base import BaseCommand
+
+from app.screenshots import ingest_screenshots
+
+
+class Command(BaseCommand):
+    help = 'Загружает скриншоты новых публикаций и строит их WebP-миниатюры'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Число процессов для миниатюр (по умолчанию — по числу ядер)')
+
+    def handle(self, *args, **options):
+        linked, failed = ingest_screenshots(processes=options['processes'])
+        self.stdout.write(f'Привязано: {linked}, не удалось загрузить: {failed}')
+        self.stdout.write(self.style.SUCCESS('Скриншоты обработаны.'))
@@ -0,0 +1,17 @@
+# app/management/commands/prune_viewer_sketches.py
+from django.core.management.base import BaseCommand
+
+from app.reach import DAILY_SKETCH_RETENTION_DAYS, prune_daily_sketches
+
+
+class Command(BaseCommand):
+    help = 'Удаляет старые дневные скетчи уникальных зрителей (скетчи за всё время сохраняются)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=DAILY_SKETCH_RETENTION_DAYS,
+                            help=f'Сколько дней хранить (по умолчанию {DAILY_SKETCH_RETENTION_DAYS})')
+
+    def handle(self, *args, **options):
+        deleted = prune_daily_sketches(options['keep_days'])
+        self.stdout.write(f'Удалено скетчей: {deleted}')
+        self.stdout.write(self.style.SUCCESS('Очистка завершена.'))
@@ -0,0 +1,15 @@
+# app/management/commands/recount_materials.py
+from django.core.management.base import BaseCommand
+
+from app.education import get_facet_counts, recount_material_type_counts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает число обучающих материалов каждого типа (после правок в обход сигналов)'
+
+    def handle(self, *args, **options):
+        recount_material_type_counts()
+        facets, total = get_facet_counts()
+        for facet in facets:
+            self.stdout.write(f"{facet['label']}: {facet['count']}")
+        self.stdout.write(self.style.SUCCESS(f'Счётчики пересчитаны, всего материалов: {total}.'))
@@ -0,0 +1,16 @@
+# app/management/commands/render_materials.py
+from django.core.management.base import BaseCommand
+
+from app.education import RENDERER_VERSION, rerender_materials
+
+
+class Command(BaseCommand):
+    help = 'Перерисовывает Markdown обучающих материалов, отрисованных прежней версией рендерера'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Перерисовать все материалы')
+
+    def handle(self, *args, **options):
+        rendered = rerender_materials(force=options['all'])
+        self.stdout.write(f'Перерисовано материалов: {rendered} (версия рендерера {RENDERER_VERSION})')
+        self.stdout.write(self.style.SUCCESS('Рендеринг завершён.'))
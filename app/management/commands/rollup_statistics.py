@@ -0,0 +1,20 @@
+# app/management/commands/rollup_statistics.py
+from django.core.management.base import BaseCommand
+
+from app.analytics import ROLLUP_SOURCES, rollup_daily_statistics
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневные агрегаты статистики за дни с прошлого запуска'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', action='append', choices=sorted(ROLLUP_SOURCES),
+            help='Обработать только указанный источник (можно повторять)',
+        )
+
+    def handle(self, *args, **options):
+        processed = rollup_daily_statistics(options['source'])
+        for source, count in processed.items():
+            self.stdout.write(f'{source}: {count}')
+        self.stdout.write(self.style.SUCCESS('Дневные агрегаты обновлены.'))
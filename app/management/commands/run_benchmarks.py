@@ -0,0 +1,33 @@
+# app/management/commands/run_benchmarks.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmarks import run_benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку (перцентили) и число запросов к БД горячих страниц, API уведомлений и чата; '
+            'результат — JSON для сравнения запусков')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', nargs='+', help='Имена сценариев (например, home leaderboard chat_consumer)')
+        parser.add_argument('--output', help='Файл для JSON (по умолчанию — вывод в консоль)')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должно быть положительным')
+        try:
+            result = run_benchmarks(options['iterations'], options['warmup'], set(options['only'] or ()))
+        except RuntimeError as error:
+            raise CommandError(error)
+
+        data = json.dumps(result, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(data + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {options["output"]}'))
+        else:
+            self.stdout.write(data)
@@ -0,0 +1,17 @@
+# app/management/commands/run_tasks.py
+from django.core.management.base import BaseCommand
+
+from app.tasks import TaskWorker
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из очереди (app/tasks.py); '
+            'для параллельной обработки запустите несколько процессов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until-idle', action='store_true',
+                            help='Завершиться, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        TaskWorker().run(until_idle=options['until_idle'])
+        self.stdout.write(self.style.SUCCESS('Очередь задач обработана.'))
@@ -0,0 +1,12 @@
+# app/management/commands/seed_initial_data.py
+from django.core.management.base import BaseCommand
+
+from app.models import setup_initial_data
+
+
+class Command(BaseCommand):
+    help = 'Создаёт роли (Trader, Moderator, Admin) и достижения, если их ещё нет; повторный запуск безопасен'
+
+    def handle(self, *args, **options):
+        setup_initial_data()
+        self.stdout.write(self.style.SUCCESS('Начальные данные на месте.'))
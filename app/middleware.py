@@ -0,0 +1,36 @@
+# app/middleware.py
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .streaks import amark_seen, mark_seen
+
+
+class LoginStreakMiddleware:
+    """
+    Отмечает активность авторизованного пользователя для серий входов.
+    В БД пишется только первый за день запрос пользователя в процессе (app/streaks.py).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            mark_seen(user.pk)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if hasattr(request, 'auser'):
+            # request.user в асинхронном коде обратился бы к сессии синхронно
+            user = await request.auser()
+            if user.is_authenticated:
+                await amark_seen(user.pk)
+        return response
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_alter_achievement_options_alter_chatmessage_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('new_users', models.PositiveIntegerField(default=0, verbose_name='Новых пользователей')),
+                ('new_publications', models.PositiveIntegerField(default=0, verbose_name='Новых публикаций')),
+                ('new_boosts', models.PositiveIntegerField(default=0, verbose_name='Новых бустов')),
+                ('chat_messages', models.PositiveIntegerField(default=0, verbose_name='Сообщений в чате')),
+            ],
+            options={
+                'verbose_name': 'Дневная статистика',
+                'verbose_name_plural': 'Дневная статистика',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, unique=True, verbose_name='Источник')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Последний обработанный ID')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Отметка агрегации',
+                'verbose_name_plural': 'Отметки агрегации',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_dailystatistics_rollupwatermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='last_seen_on',
+            field=models.DateField(blank=True, db_index=True, null=True, verbose_name='Последний день активности'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='previous_seen_on',
+            field=models.DateField(blank=True, null=True, verbose_name='Предыдущий день активности'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:43
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_follow_counters(apps, schema_editor):
+    Profile = apps.get_model('app', 'Profile')
+    Follow = Profile.subscribed_to.through
+
+    def count(field, outer):
+        counts = Follow.objects.filter(**{field: OuterRef(outer)}).order_by().values(field).annotate(n=Count('pk'))
+        return Coalesce(Subquery(counts.values('n')[:1], output_field=IntegerField()), 0)
+
+    Profile.objects.update(
+        following_count=count('profile', 'pk'),
+        followers_count=count('user', 'user_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_profile_last_seen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Подписок'),
+        ),
+        migrations.RunPython(fill_follow_counters, migrations.RunPython.noop),
+    ]
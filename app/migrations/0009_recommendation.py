@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_profile_follow_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('AUTHOR', 'Автор'), ('PUBLICATION', 'Публикация')], max_length=20, verbose_name='Тип')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+                ('position', models.PositiveSmallIntegerField(verbose_name='Позиция')),
+                ('generated_at', models.DateTimeField(verbose_name='Дата расчёта')),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Рекомендуемый автор')),
+                ('publication', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.publication', verbose_name='Рекомендуемая публикация')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Рекомендация',
+                'verbose_name_plural': 'Рекомендации',
+                'ordering': ['position'],
+                'indexes': [models.Index(fields=['user', 'kind', 'position'], name='app_recomme_user_id_819bc4_idx')],
+            },
+        ),
+    ]
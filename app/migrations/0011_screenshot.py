@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_broadcast_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Screenshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+                ('size', models.PositiveIntegerField(verbose_name='Размер, байт')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата загрузки')),
+            ],
+            options={
+                'verbose_name': 'Скриншот',
+                'verbose_name_plural': 'Скриншоты',
+            },
+        ),
+        migrations.AddField(
+            model_name='publication',
+            name='screenshot_failed',
+            field=models.BooleanField(default=False, verbose_name='Скриншот не загружен'),
+        ),
+        migrations.AddField(
+            model_name='publication',
+            name='screenshot_image',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app.screenshot', verbose_name='Скриншот'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_screenshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='educationalmaterial',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='HTML содержания'),
+        ),
+        migrations.AddField(
+            model_name='educationalmaterial',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Время чтения, мин'),
+        ),
+        migrations.AddField(
+            model_name='educationalmaterial',
+            name='renderer_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Версия рендерера'),
+        ),
+        migrations.AddField(
+            model_name='educationalmaterial',
+            name='toc',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Оглавление'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_material_type_counts(apps, schema_editor):
+    EducationalMaterial = apps.get_model('app', 'EducationalMaterial')
+    MaterialTypeCount = apps.get_model('app', 'MaterialTypeCount')
+    counts = EducationalMaterial.objects.order_by().values('material_type').annotate(total=Count('pk'))
+    MaterialTypeCount.objects.bulk_create(
+        MaterialTypeCount(material_type=row['material_type'], count=row['total']) for row in counts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_educationalmaterial_rendering'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialTypeCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('material_type', models.CharField(choices=[('ARTICLE', 'Статья'), ('VIDEO', 'Видео'), ('GUIDE', 'Руководство'), ('TUTORIAL', 'Урок')], max_length=20, unique=True, verbose_name='Тип материала')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество')),
+            ],
+            options={
+                'verbose_name': 'Счётчик типа материалов',
+                'verbose_name_plural': 'Счётчики типов материалов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='educationalmaterial',
+            index=models.Index(fields=['-created_at', '-id'], name='app_educati_created_5738d8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='educationalmaterial',
+            index=models.Index(fields=['material_type', '-created_at', '-id'], name='app_educati_materia_b313e6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='educationalmaterial',
+            index=models.Index(fields=['is_featured', '-created_at'], name='app_educati_is_feat_5f8d4f_idx'),
+        ),
+        migrations.RunPython(fill_material_type_counts, migrations.RunPython.noop),
+    ]
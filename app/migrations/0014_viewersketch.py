@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_materialtypecount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='educationalmaterial',
+            name='unique_viewers',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Уникальные зрители'),
+        ),
+        migrations.AddField(
+            model_name='marketoverview',
+            name='unique_viewers',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Уникальные зрители'),
+        ),
+        migrations.AddField(
+            model_name='publication',
+            name='unique_viewers',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Уникальные зрители'),
+        ),
+        migrations.CreateModel(
+            name='ViewerSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('PUBLICATION', 'Публикация'), ('MATERIAL', 'Обучающий материал'), ('OVERVIEW', 'Обзор рынка'), ('SITE', 'Весь сайт')], max_length=20, verbose_name='Тип объекта')),
+                ('object_id', models.BigIntegerField(default=0, verbose_name='ID объекта')),
+                ('day', models.DateField(blank=True, null=True, verbose_name='День')),
+                ('registers', models.BinaryField(verbose_name='Регистры')),
+            ],
+            options={
+                'verbose_name': 'Скетч уникальных зрителей',
+                'verbose_name_plural': 'Скетчи уникальных зрителей',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id', 'day'), name='viewer_sketch_unique_day'), models.UniqueConstraint(condition=models.Q(('day__isnull', True)), fields=('kind', 'object_id'), name='viewer_sketch_unique_total')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_viewersketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marketoverview',
+            name='video_duration',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Длительность видео, с'),
+        ),
+        migrations.AddField(
+            model_name='marketoverview',
+            name='video_fetched_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Метаданные видео получены'),
+        ),
+        migrations.AddField(
+            model_name='marketoverview',
+            name='video_provider',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Видеохостинг'),
+        ),
+        migrations.AddField(
+            model_name='marketoverview',
+            name='video_refresh_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Следующее обновление метаданных'),
+        ),
+        migrations.AddField(
+            model_name='marketoverview',
+            name='video_thumbnail',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app.screenshot', verbose_name='Превью видео'),
+        ),
+        migrations.AddField(
+            model_name='marketoverview',
+            name='video_title',
+            field=models.CharField(blank=True, editable=False, max_length=300, verbose_name='Название видео'),
+        ),
+    ]
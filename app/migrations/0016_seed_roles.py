@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:40
+
+from django.db import migrations
+
+ROLES = ('Trader', 'Moderator', 'Admin')
+
+
+def create_roles(apps, schema_editor):
+    Group = apps.get_model('auth', 'Group')
+    for name in ROLES:
+        Group.objects.get_or_create(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_marketoverview_video_metadata'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_roles, migrations.RunPython.noop),
+    ]
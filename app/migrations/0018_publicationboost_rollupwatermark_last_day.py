@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_watermarks(apps, schema_editor):
+    # Прежний расчёт хранил last_id, а его отметка обновлялась при каждом запуске —
+    # день запуска становится last_day, и первый пересчёт не сканирует всю историю
+    RollupWatermark = apps.get_model('app', 'RollupWatermark')
+    DailyStatistics = apps.get_model('app', 'DailyStatistics')
+    PublicationBoost = apps.get_model('app', 'PublicationBoost')
+    for watermark in RollupWatermark.objects.all():
+        RollupWatermark.objects.filter(pk=watermark.pk).update(last_day=timezone.localdate(watermark.updated_at))
+
+    # Бусты без даты прежний расчёт относил ко дню запуска: в сегодняшнем счётчике уже есть
+    # их доля, а бусты после last_id ещё не учтены — они тоже относятся к сегодняшнему дню
+    today = timezone.localdate()
+    boosts = RollupWatermark.objects.filter(source='boosts').first()
+    counted = DailyStatistics.objects.filter(date=today).values_list('new_boosts', flat=True).first() or 0
+    uncounted = PublicationBoost.objects.filter(pk__gt=boosts.last_id if boosts else 0).count()
+    if boosts is None and not uncounted:
+        return
+    RollupWatermark.objects.update_or_create(source='boosts', defaults={
+        'last_day': today, 'legacy_day': today, 'legacy_count': counted + uncounted,
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_task_failedtask'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Промежуточная таблица бустов уже существует (app_publication_boosts) — меняется только
+        # состояние моделей, чтобы у неё появилась явная модель
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='PublicationBoost',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False,
+                                                   verbose_name='ID')),
+                        ('publication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                          to='app.publication', verbose_name='Публикация')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                   to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                    ],
+                    options={
+                        'verbose_name': 'Буст',
+                        'verbose_name_plural': 'Бусты',
+                        'db_table': 'app_publication_boosts',
+                        'unique_together': {('publication', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='publication',
+                    name='boosts',
+                    field=models.ManyToManyField(blank=True, related_name='boosted_publications',
+                                                 through='app.PublicationBoost', to=settings.AUTH_USER_MODEL,
+                                                 verbose_name='Бусты'),
+                ),
+            ],
+        ),
+        # существующие бусты остаются без даты: когда они поставлены, неизвестно
+        migrations.AddField(
+            model_name='publicationboost',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, null=True, verbose_name='Дата буста'),
+        ),
+        migrations.AlterField(
+            model_name='publicationboost',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, null=True,
+                                       verbose_name='Дата буста'),
+        ),
+        migrations.AddField(
+            model_name='rollupwatermark',
+            name='last_day',
+            field=models.DateField(blank=True, null=True, verbose_name='Последний агрегированный день'),
+        ),
+        migrations.AddField(
+            model_name='rollupwatermark',
+            name='legacy_day',
+            field=models.DateField(blank=True, null=True, verbose_name='Последний день без дат'),
+        ),
+        migrations.AddField(
+            model_name='rollupwatermark',
+            name='legacy_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Строк без даты в этот день'),
+        ),
+        migrations.RunPython(backfill_watermarks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='rollupwatermark',
+            name='last_id',
+        ),
+    ]
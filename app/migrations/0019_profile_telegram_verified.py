@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:05
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.db import migrations, models
+
+
+def verify_telegram_accounts(apps, schema_editor):
+    # Пользователи, созданные входом из Telegram, не имеют пароля — их telegram_id пришёл из
+    # подписанной initData. У остальных он введён в форме регистрации и не проверялся
+    Profile = apps.get_model('app', 'Profile')
+    Profile.objects.filter(
+        telegram_id__isnull=False, user__password__startswith=UNUSABLE_PASSWORD_PREFIX,
+    ).update(telegram_verified=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_publicationboost_rollupwatermark_last_day'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='telegram_verified',
+            field=models.BooleanField(default=False, verbose_name='Telegram подтверждён'),
+        ),
+        migrations.RunPython(verify_telegram_accounts, migrations.RunPython.noop),
+    ]
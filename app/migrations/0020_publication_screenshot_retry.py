@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:46
+
+from django.db import migrations, models
+
+
+def retry_failed_screenshots(apps, schema_editor):
+    # Раньше screenshot_failed ставился и после сетевых сбоев — даём таким источникам
+    # ещё одну серию попыток; отвергнутые по существу снова отметятся с первой же
+    Publication = apps.get_model('app', 'Publication')
+    Publication.objects.filter(screenshot_failed=True, screenshot_image__isnull=True).update(screenshot_failed=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_profile_telegram_verified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publication',
+            name='screenshot_attempts',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Попытки загрузки скриншота'),
+        ),
+        migrations.AddField(
+            model_name='publication',
+            name='screenshot_retry_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Повторная загрузка скриншота'),
+        ),
+        migrations.RunPython(retry_failed_screenshots, migrations.RunPython.noop),
+    ]
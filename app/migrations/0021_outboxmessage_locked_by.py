@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0020_publication_screenshot_retry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='locked_by',
+            field=models.CharField(blank=True, max_length=32, verbose_name='Отправщик'),
+        ),
+    ]
@@ -1,11 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User, Group
-from django.db.models.signals import post_save, m2m_changed
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
-# Создание ролей при запуске
+# Роли создаёт миграция 0016_seed_roles; функция — для seed_initial_data и на случай удалённых групп
 def create_roles():
     roles = ["Trader", "Moderator", "Admin"]
     for role in roles:
@@ -15,6 +16,8 @@ def create_roles():
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile', verbose_name=_("Пользователь"))
     telegram_id = models.BigIntegerField(unique=True, null=True, blank=True, verbose_name=_("Telegram ID"))
+    # telegram_id привязан по подписанной initData (app/telegram_auth.py) — только по такому разрешён вход
+    telegram_verified = models.BooleanField(default=False, verbose_name=_("Telegram подтверждён"))
     first_name = models.CharField(max_length=100, blank=True, verbose_name=_("Имя"))
     last_name = models.CharField(max_length=100, blank=True, verbose_name=_("Фамилия"))
     age = models.PositiveIntegerField(null=True, blank=True, verbose_name=_("Возраст"))
@@ -22,8 +25,13 @@ class Profile(models.Model):
     rating_score = models.IntegerField(default=0, verbose_name=_("Рейтинг"))
     login_streak = models.IntegerField(default=0, verbose_name=_("Серия входов"))
     last_login_streak_check = models.DateField(null=True, blank=True, verbose_name=_("Последняя проверка серии входов"))
+    last_seen_on = models.DateField(null=True, blank=True, db_index=True, verbose_name=_("Последний день активности"))
+    previous_seen_on = models.DateField(null=True, blank=True, verbose_name=_("Предыдущий день активности"))
     browser_notifications_enabled = models.BooleanField(default=False, verbose_name=_("Push-уведомления"))
     subscribed_to = models.ManyToManyField(User, related_name='subscribers', blank=True, verbose_name=_("Подписки"))
+    # Денормализованные счётчики подписок (поддерживаются app/follows.py)
+    followers_count = models.PositiveIntegerField(default=0, verbose_name=_("Подписчиков"))
+    following_count = models.PositiveIntegerField(default=0, verbose_name=_("Подписок"))
 
     def __str__(self):
         return f'Профиль @{self.user.username}'
@@ -36,22 +44,118 @@ class Profile(models.Model):
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
     if created:
+        from .roles import TRADER, role_group_id
+
         Profile.objects.create(user=instance)
-        # Присваиваем роль "Trader" по умолчанию
-        try:
-            trader_group = Group.objects.get(name='Trader')
-            instance.groups.add(trader_group)
-        except Group.DoesNotExist:
-            # Создаем группы если они не существуют
-            create_roles()
-            trader_group = Group.objects.get(name='Trader')
-            instance.groups.add(trader_group)
+        # Роль "Trader" по умолчанию — сразу: пользователь сможет публиковать с первого запроса
+        instance.groups.add(role_group_id(TRADER))
     else:
         # Обновляем профиль для существующих пользователей
         if hasattr(instance, 'profile'):
             instance.profile.save()
 
 
+# Сигнал — пересчёт счётчиков подписок при изменениях через m2m-менеджер (app/follows.py)
+@receiver(m2m_changed, sender=Profile.subscribed_to.through)
+def recount_follow_counters_on_change(sender, instance, action, reverse, pk_set, **kwargs):
+    from .follows import recount_follow_counters
+
+    if action == 'pre_clear':
+        # после очистки затронутые связи уже не найти — запоминаем их
+        if reverse:
+            instance._follow_clear_ids = list(instance.subscribers.values_list('pk', flat=True))
+        else:
+            instance._follow_clear_ids = list(instance.subscribed_to.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    related_ids = pk_set if action != 'post_clear' else getattr(instance, '_follow_clear_ids', [])
+    if reverse:
+        # instance — пользователь, related_ids — id профилей-подписчиков
+        recount_follow_counters(profile_ids=related_ids, user_ids=[instance.pk])
+    else:
+        # instance — профиль, related_ids — id пользователей, на которых он подписан
+        recount_follow_counters(profile_ids=[instance.pk], user_ids=related_ids)
+
+
+# Сигналы — сброс кэша ролей и прав (app/roles.py)
+def _invalidate_roles_of_groups(group_ids):
+    from .roles import invalidate_roles
+    invalidate_roles(*User.objects.filter(groups__in=list(group_ids)).values_list('pk', flat=True).distinct())
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_roles_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    from .roles import invalidate_roles
+
+    if not reverse:
+        # instance — пользователь
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_roles(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        # instance — группа или право, pk_set — id пользователей
+        invalidate_roles(*pk_set)
+    elif action == 'pre_clear':
+        # после очистки связей пользователей уже не найти
+        invalidate_roles(*instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_roles_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        _invalidate_roles_of_groups(pk_set if reverse else [instance.pk])
+    elif action == 'pre_clear':
+        _invalidate_roles_of_groups(instance.group_set.values_list('pk', flat=True) if reverse else [instance.pk])
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_changed_group_roles_cache(sender, instance, created=False, **kwargs):
+    if not created:
+        from .caching import cache
+
+        _invalidate_roles_of_groups([instance.pk])
+        # id групп ролей (roles.role_group_id)
+        cache.invalidate_tags('group')
+
+
+class Screenshot(models.Model):
+    """Изображение в контентно-адресуемом хранилище с WebP-миниатюрами (app/screenshots.py)"""
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name=_("SHA-256"))
+    width = models.PositiveIntegerField(verbose_name=_("Ширина"))
+    height = models.PositiveIntegerField(verbose_name=_("Высота"))
+    size = models.PositiveIntegerField(verbose_name=_("Размер, байт"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Дата загрузки"))
+
+    def thumbnail_url(self, width):
+        from django.urls import reverse
+        return reverse('screenshot_thumbnail', args=[self.sha256, width])
+
+    @property
+    def feed_url(self):
+        from .screenshots import FEED_WIDTH
+        return self.thumbnail_url(FEED_WIDTH)
+
+    @property
+    def detail_url(self):
+        from .screenshots import DETAIL_WIDTH
+        return self.thumbnail_url(DETAIL_WIDTH)
+
+    @property
+    def srcset(self):
+        from .screenshots import THUMBNAIL_WIDTHS
+        return ', '.join(f'{self.thumbnail_url(width)} {width}w' for width in THUMBNAIL_WIDTHS)
+
+    def __str__(self):
+        return self.sha256
+
+    class Meta:
+        verbose_name = _("Скриншот")
+        verbose_name_plural = _("Скриншоты")
+
+
 class Publication(models.Model):
     class StatusChoices(models.TextChoices):
         ACTIVE = 'ACTIVE', _('Активна')
@@ -62,6 +166,15 @@ class Publication(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='publications', verbose_name=_("Автор"))
     description = models.TextField(verbose_name=_("Описание идеи"))
     screenshot_id = models.CharField(max_length=255, verbose_name=_("ID скриншота или URL"), blank=True)
+    # Загруженный скриншот и признак неудачной загрузки (заполняются manage.py process_screenshots)
+    screenshot_image = models.ForeignKey(Screenshot, on_delete=models.SET_NULL, null=True, blank=True,
+                                         related_name='+', verbose_name=_("Скриншот"))
+    screenshot_failed = models.BooleanField(default=False, verbose_name=_("Скриншот не загружен"))
+    # неудачные попытки загрузки и время следующей (экспоненциальная задержка)
+    screenshot_attempts = models.PositiveSmallIntegerField(default=0, editable=False,
+                                                           verbose_name=_("Попытки загрузки скриншота"))
+    screenshot_retry_at = models.DateTimeField(null=True, blank=True, editable=False,
+                                               verbose_name=_("Повторная загрузка скриншота"))
     target_1 = models.CharField(max_length=100, verbose_name=_("Цель 1"))
     target_2 = models.CharField(max_length=100, blank=True, null=True, verbose_name=_("Цель 2"))
     target_3 = models.CharField(max_length=100, blank=True, null=True, verbose_name=_("Цель 3"))
@@ -70,8 +183,19 @@ class Publication(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Дата обновления"))
     status = models.CharField(max_length=10, choices=StatusChoices.choices, default=StatusChoices.ACTIVE,
                               verbose_name=_("Статус"))
-    boosts = models.ManyToManyField(User, related_name='boosted_publications', blank=True, verbose_name=_("Бусты"))
+    boosts = models.ManyToManyField(User, through='PublicationBoost', related_name='boosted_publications', blank=True,
+                                    verbose_name=_("Бусты"))
     views = models.PositiveIntegerField(default=0, verbose_name=_("Просмотры"))
+    # оценка HyperLogLog, обновляется пачками (app/reach.py)
+    unique_viewers = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Уникальные зрители"))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # значения на момент загрузки — чтобы сигналы отличали их смену от прочих сохранений
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_screenshot_id = instance.__dict__.get('screenshot_id')
+        return instance
 
     def boost_count(self):
         """Возвращает количество бустов"""
@@ -94,6 +218,23 @@ class Publication(models.Model):
         ]
 
 
+class PublicationBoost(models.Model):
+    """Буст публикации (промежуточная таблица Publication.boosts) с датой — для дневных агрегатов"""
+    publication = models.ForeignKey(Publication, on_delete=models.CASCADE, verbose_name=_("Публикация"))
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_("Пользователь"))
+    # у бустов, поставленных до появления поля, даты нет
+    created_at = models.DateTimeField(null=True, default=timezone.now, db_index=True, verbose_name=_("Дата буста"))
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.publication_id}'
+
+    class Meta:
+        db_table = 'app_publication_boosts'
+        unique_together = ('publication', 'user')
+        verbose_name = _("Буст")
+        verbose_name_plural = _("Бусты")
+
+
 class Achievement(models.Model):
     name = models.CharField(max_length=100, unique=True, verbose_name=_("Название"))
     description = models.TextField(verbose_name=_("Описание"))
@@ -167,18 +308,53 @@ class EducationalMaterial(models.Model):
                                      verbose_name=_("Тип материала"))
     is_featured = models.BooleanField(default=False, verbose_name=_("Рекомендуемый"))
     views = models.PositiveIntegerField(default=0, verbose_name=_("Просмотры"))
+    unique_viewers = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Уникальные зрители"))
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Дата создания"))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Дата обновления"))
+    # Результат рендеринга content (app/education.py), обновляется при сохранении
+    content_html = models.TextField(blank=True, editable=False, verbose_name=_("HTML содержания"))
+    toc = models.JSONField(default=list, blank=True, editable=False, verbose_name=_("Оглавление"))
+    reading_time = models.PositiveSmallIntegerField(default=0, editable=False,
+                                                    verbose_name=_("Время чтения, мин"))
+    renderer_version = models.PositiveSmallIntegerField(default=0, editable=False,
+                                                        verbose_name=_("Версия рендерера"))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # тип на момент загрузки — для счётчиков каталога при смене типа
+        instance._loaded_material_type = instance.__dict__.get('material_type')
+        return instance
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-created_at']
+        # ключи keyset-пагинации каталога (app/education.py)
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['material_type', '-created_at', '-id']),
+            models.Index(fields=['is_featured', '-created_at']),
+        ]
         verbose_name = _("Обучающий материал")
         verbose_name_plural = _("Обучающие материалы")
 
 
+class MaterialTypeCount(models.Model):
+    """Число обучающих материалов каждого типа (счётчики фасетов каталога, см. app/education.py)"""
+    material_type = models.CharField(max_length=20, unique=True, choices=EducationalMaterial.MaterialTypes.choices,
+                                     verbose_name=_("Тип материала"))
+    count = models.IntegerField(default=0, verbose_name=_("Количество"))
+
+    def __str__(self):
+        return f'{self.get_material_type_display()}: {self.count}'
+
+    class Meta:
+        verbose_name = _("Счётчик типа материалов")
+        verbose_name_plural = _("Счётчики типов материалов")
+
+
 class MarketOverview(models.Model):
     author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='market_overviews',
                                verbose_name=_("Автор"))
@@ -187,8 +363,36 @@ class MarketOverview(models.Model):
     content = models.TextField(verbose_name=_("Содержание"))
     is_featured = models.BooleanField(default=False, verbose_name=_("Рекомендуемый"))
     views = models.PositiveIntegerField(default=0, verbose_name=_("Просмотры"))
+    unique_viewers = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Уникальные зрители"))
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Дата создания"))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Дата обновления"))
+    # Метаданные video_url из oEmbed провайдера, заполняются фоновой задачей (app/videos.py)
+    video_title = models.CharField(max_length=300, blank=True, editable=False, verbose_name=_("Название видео"))
+    video_duration = models.PositiveIntegerField(null=True, blank=True, editable=False,
+                                                 verbose_name=_("Длительность видео, с"))
+    video_provider = models.CharField(max_length=100, blank=True, editable=False, verbose_name=_("Видеохостинг"))
+    video_thumbnail = models.ForeignKey(Screenshot, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                        related_name='+', verbose_name=_("Превью видео"))
+    video_fetched_at = models.DateTimeField(null=True, blank=True, editable=False,
+                                            verbose_name=_("Метаданные видео получены"))
+    video_refresh_at = models.DateTimeField(null=True, blank=True, editable=False,
+                                            verbose_name=_("Следующее обновление метаданных"))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # ссылка на момент загрузки — чтобы сбросить метаданные при её смене
+        instance._loaded_video_url = instance.__dict__.get('video_url')
+        return instance
+
+    @property
+    def video_duration_display(self):
+        """Длительность видео в виде Ч:ММ:СС или М:СС"""
+        if not self.video_duration:
+            return ''
+        minutes, seconds = divmod(self.video_duration, 60)
+        hours, minutes = divmod(minutes, 60)
+        return f'{hours}:{minutes:02}:{seconds:02}' if hours else f'{minutes}:{seconds:02}'
 
     def __str__(self):
         return self.title
@@ -247,44 +451,330 @@ def create_user_statistics(sender, instance, created, **kwargs):
         UserStatistics.objects.get_or_create(user=instance)
 
 
-# Сигналы для обновления статистики
+# Сигналы для обновления статистики — пересчёт в фоновой очереди (app/tasks.py). Задача пишется
+# в транзакции вызывающего кода: создание публикации должно идти в atomic(), иначе сбой между
+# INSERT публикации и задачи оставит счётчик автора без +1
 @receiver(post_save, sender=Publication)
 def update_publication_stats(sender, instance, created, **kwargs):
     """Обновляет статистику при создании публикации"""
     if created:
-        stats, _ = UserStatistics.objects.get_or_create(user=instance.author)
-        stats.total_publications += 1
-        stats.save()
+        from .tasks import enqueue
+        enqueue('count_publication', user_id=instance.author_id)
 
 
-# Сигнал — уведомление при добавлении буста (m2m)
+# Сигнал — уведомление при добавлении буста (m2m); создаётся в фоновой очереди (app/tasks.py)
 @receiver(m2m_changed, sender=Publication.boosts.through)
-def publication_boosted(sender, instance, action, pk_set, **kwargs):
+def publication_boosted(sender, instance, action, reverse, pk_set, **kwargs):
     """
     Создаем уведомление автору публикации, когда другие пользователи ставят буст.
     action == 'post_add' — после добавления записей в m2m.
     """
-    from django.contrib.auth import get_user_model
-    from django.shortcuts import reverse
-    UserModel = get_user_model()
-
-    if action == 'post_add' and pk_set:
+    if action != 'post_add' or not pk_set:
+        return
+    from .tasks import enqueue
+
+    if reverse:
+        # instance — пользователь, pk_set — id публикаций
+        for publication_pk in pk_set:
+            enqueue('notify_boost', publication_id=publication_pk, user_id=instance.pk)
+    else:
         # pk_set — множество id пользователей, которые поставили буст
         for user_pk in pk_set:
-            try:
-                boosting_user = UserModel.objects.get(pk=user_pk)
-            except UserModel.DoesNotExist:
-                continue
-            # не уведомляем, если автор сам себя бустит
-            if boosting_user == instance.author:
-                continue
-            Notification.objects.create(
-                user=instance.author,
-                title="Ваша публикация получила буст",
-                message=f"@{boosting_user.username} поддержал(а) вашу публикацию",
-                notification_type=Notification.NotificationTypes.BOOST,
-                link=f"/publication/{instance.pk}/"
-            )
+            enqueue('notify_boost', publication_id=instance.pk, user_id=user_pk)
+
+
+# Сигнал — новый источник скриншота загружается заново (app/screenshots.py)
+@receiver(pre_save, sender=Publication)
+def reset_publication_screenshot(sender, instance, **kwargs):
+    loaded_screenshot_id = getattr(instance, '_loaded_screenshot_id', None)
+    if loaded_screenshot_id is not None and loaded_screenshot_id != instance.screenshot_id:
+        instance.screenshot_image = None
+        instance.screenshot_failed = False
+        instance.screenshot_attempts = 0
+        instance.screenshot_retry_at = None
+        instance._loaded_screenshot_id = instance.screenshot_id
+
+
+# Сигнал — метаданные новой ссылки на видео запрашиваются заново (app/videos.py)
+@receiver(pre_save, sender=MarketOverview)
+def reset_overview_video_metadata(sender, instance, **kwargs):
+    # без ссылки метаданных не было, сбрасывать нечего
+    loaded_video_url = getattr(instance, '_loaded_video_url', None)
+    if loaded_video_url is not None and loaded_video_url != instance.video_url:
+        instance.video_title = ''
+        instance.video_duration = None
+        instance.video_provider = ''
+        instance.video_thumbnail = None
+        instance.video_fetched_at = None
+        instance.video_refresh_at = None
+        instance._loaded_video_url = instance.video_url
+
+
+# Сигнал — рендеринг Markdown обучающего материала при сохранении (app/education.py)
+@receiver(pre_save, sender=EducationalMaterial)
+def render_educational_material(sender, instance, update_fields=None, **kwargs):
+    from .education import render_material
+
+    # save(update_fields=...) не может дописать поля рендеринга — рендерим только при полном сохранении
+    if update_fields is None:
+        render_material(instance)
+
+
+# Сигналы — счётчики типов обучающих материалов (app/education.py)
+@receiver(post_save, sender=EducationalMaterial)
+def count_saved_material(sender, instance, created, **kwargs):
+    from .education import shift_material_type_count
+
+    loaded_type = getattr(instance, '_loaded_material_type', None)
+    if created:
+        shift_material_type_count(instance.material_type, 1)
+    elif loaded_type is not None and loaded_type != instance.material_type:
+        shift_material_type_count(loaded_type, -1)
+        shift_material_type_count(instance.material_type, 1)
+    instance._loaded_material_type = instance.material_type
+
+
+@receiver(post_delete, sender=EducationalMaterial)
+def count_deleted_material(sender, instance, **kwargs):
+    from .education import shift_material_type_count
+
+    shift_material_type_count(instance.material_type, -1)
+
+
+# Сигнал — рассылки в Telegram о новой публикации и об исходе TP/SL (app/broadcast.py)
+@receiver(post_save, sender=Publication)
+def enqueue_publication_broadcasts(sender, instance, created, **kwargs):
+    from .broadcast import enqueue_publication_broadcast, enqueue_outcome_broadcast
+
+    if created:
+        enqueue_publication_broadcast(instance)
+    elif instance.status in (Publication.StatusChoices.TARGET_HIT, Publication.StatusChoices.STOP_HIT):
+        loaded_status = getattr(instance, '_loaded_status', None)
+        if loaded_status is not None and loaded_status != instance.status:
+            enqueue_outcome_broadcast(instance)
+    instance._loaded_status = instance.status
+
+
+# Сигналы — сброс тегов кэша (app/caching.py) для моделей, данные которых кэшируются: сводки
+# профилей, роли, списки страниц. Только с явным sender: слушатель post_delete отключает быстрое
+# удаление (QuerySet.delete() без загрузки строк) у модели и всех, кто на неё ссылается каскадом
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Profile)
+@receiver([post_save, post_delete], sender=UserStatistics)
+@receiver([post_save, post_delete], sender=UserAchievement)
+@receiver([post_save, post_delete], sender=Publication)
+@receiver([post_save, post_delete], sender=Notification)
+@receiver([post_save, post_delete], sender=EducationalMaterial)
+@receiver([post_save, post_delete], sender=MarketOverview)
+def invalidate_instance_cache_tags(sender, instance, **kwargs):
+    from .caching import invalidate_instance
+    invalidate_instance(instance)
+
+
+@receiver(m2m_changed, sender=Publication.boosts.through)
+@receiver(m2m_changed, sender=Profile.subscribed_to.through)
+def invalidate_related_cache_tags(sender, instance, action, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    from .caching import cache, instance_tags, object_tag
+    # обратная сторона связи (user.boosted_publications.add(...)) меняет и списки модели model
+    cache.invalidate_tags(*instance_tags(instance), model._meta.model_name,
+                          *[object_tag(model, pk) for pk in pk_set or ()])
+
+
+class DailyStatistics(models.Model):
+    """Дневные агрегаты активности платформы (заполняются инкрементальной задачей)"""
+    date = models.DateField(unique=True, verbose_name=_("Дата"))
+    new_users = models.PositiveIntegerField(default=0, verbose_name=_("Новых пользователей"))
+    new_publications = models.PositiveIntegerField(default=0, verbose_name=_("Новых публикаций"))
+    new_boosts = models.PositiveIntegerField(default=0, verbose_name=_("Новых бустов"))
+    chat_messages = models.PositiveIntegerField(default=0, verbose_name=_("Сообщений в чате"))
+
+    def __str__(self):
+        return f'Статистика за {self.date.strftime("%d.%m.%Y")}'
+
+    class Meta:
+        ordering = ['date']
+        verbose_name = _("Дневная статистика")
+        verbose_name_plural = _("Дневная статистика")
+
+
+class RollupWatermark(models.Model):
+    """День последнего запуска агрегации для каждого источника дневных агрегатов"""
+    source = models.CharField(max_length=50, unique=True, verbose_name=_("Источник"))
+    last_day = models.DateField(null=True, blank=True, verbose_name=_("Последний агрегированный день"))
+    # строки без даты (бусты до появления PublicationBoost.created_at) уже учтены в днях до
+    # legacy_day включительно; legacy_count — их доля в счётчике legacy_day
+    legacy_day = models.DateField(null=True, blank=True, verbose_name=_("Последний день без дат"))
+    legacy_count = models.PositiveIntegerField(default=0, verbose_name=_("Строк без даты в этот день"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Дата обновления"))
+
+    def __str__(self):
+        return f'{self.source}: {self.last_day}'
+
+    class Meta:
+        verbose_name = _("Отметка агрегации")
+        verbose_name_plural = _("Отметки агрегации")
+
+
+class Recommendation(models.Model):
+    """Предрассчитанные рекомендации (top-K на пользователя, см. app/recommendations.py)"""
+    class Kinds(models.TextChoices):
+        AUTHOR = 'AUTHOR', _('Автор')
+        PUBLICATION = 'PUBLICATION', _('Публикация')
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recommendations',
+                             verbose_name=_("Пользователь"))
+    kind = models.CharField(max_length=20, choices=Kinds.choices, verbose_name=_("Тип"))
+    author = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+                               verbose_name=_("Рекомендуемый автор"))
+    publication = models.ForeignKey(Publication, on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+                                    verbose_name=_("Рекомендуемая публикация"))
+    score = models.FloatField(verbose_name=_("Оценка"))
+    position = models.PositiveSmallIntegerField(verbose_name=_("Позиция"))
+    generated_at = models.DateTimeField(verbose_name=_("Дата расчёта"))
+
+    def __str__(self):
+        return f'{self.user.username}: {self.get_kind_display()} #{self.position}'
+
+    class Meta:
+        ordering = ['position']
+        indexes = [models.Index(fields=['user', 'kind', 'position'])]
+        verbose_name = _("Рекомендация")
+        verbose_name_plural = _("Рекомендации")
+
+
+class Broadcast(models.Model):
+    """Рассылка в Telegram; отправщик разворачивает её в OutboxMessage пачками получателей (app/broadcast.py)"""
+    class Audiences(models.TextChoices):
+        SUBSCRIBERS = 'SUBSCRIBERS', _('Подписчики автора')
+        BOOSTERS = 'BOOSTERS', _('Бустившие публикацию')
+        ALL = 'ALL', _('Все пользователи')
+
+    audience = models.CharField(max_length=20, choices=Audiences.choices, verbose_name=_("Получатели"))
+    author = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+                               verbose_name=_("Автор"))
+    publication = models.ForeignKey(Publication, on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+                                    verbose_name=_("Публикация"))
+    text = models.TextField(verbose_name=_("Текст"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Дата создания"))
+    # id последнего профиля, для которого уже созданы сообщения
+    expanded_up_to = models.BigIntegerField(default=0, verbose_name=_("Развёрнуто до профиля"))
+    is_expanded = models.BooleanField(default=False, db_index=True, verbose_name=_("Получатели развёрнуты"))
+
+    def __str__(self):
+        return f'{self.get_audience_display()} от {self.created_at.strftime("%d.%m.%Y %H:%M")}'
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = _("Рассылка")
+        verbose_name_plural = _("Рассылки")
+
+
+class OutboxMessage(models.Model):
+    """Исходящее сообщение в чат Telegram (очередь отправщика рассылок)"""
+    class Statuses(models.TextChoices):
+        PENDING = 'PENDING', _('Ожидает отправки')
+        SENT = 'SENT', _('Отправлено')
+        FAILED = 'FAILED', _('Не доставлено')
+
+    broadcast = models.ForeignKey(Broadcast, on_delete=models.CASCADE, null=True, blank=True,
+                                  related_name='messages', verbose_name=_("Рассылка"))
+    chat_id = models.BigIntegerField(verbose_name=_("Чат Telegram"))
+    text = models.TextField(verbose_name=_("Текст"))
+    status = models.CharField(max_length=10, choices=Statuses.choices, default=Statuses.PENDING,
+                              verbose_name=_("Статус"))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_("Попыток"))
+    # у захваченного сообщения — конец аренды отправщиком locked_by
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name=_("Следующая попытка"))
+    locked_by = models.CharField(max_length=32, blank=True, verbose_name=_("Отправщик"))
+    last_error = models.CharField(max_length=255, blank=True, verbose_name=_("Последняя ошибка"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Дата создания"))
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Дата отправки"))
+
+    def __str__(self):
+        return f'{self.chat_id}: {self.get_status_display()}'
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+        verbose_name = _("Исходящее сообщение")
+        verbose_name_plural = _("Исходящие сообщения")
+
+
+class Task(models.Model):
+    """Задача фоновой очереди (app/tasks.py); выполненная удаляется, исчерпавшая попытки — в FailedTask"""
+    name = models.CharField(max_length=100, verbose_name=_("Задача"))
+    payload = models.JSONField(default=dict, verbose_name=_("Параметры"))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_("Попыток"))
+    # у захваченной задачи — конец аренды обработчиком locked_by
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name=_("Следующая попытка"))
+    locked_by = models.CharField(max_length=32, blank=True, verbose_name=_("Обработчик"))
+    last_error = models.CharField(max_length=255, blank=True, verbose_name=_("Последняя ошибка"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Дата создания"))
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+    class Meta:
+        indexes = [models.Index(fields=['next_attempt_at'])]
+        verbose_name = _("Фоновая задача")
+        verbose_name_plural = _("Фоновые задачи")
+
+
+class FailedTask(models.Model):
+    """Задача, не выполненная за MAX_ATTEMPTS попыток (app/tasks.py) или без обработчика — очередь недоставленных"""
+    name = models.CharField(max_length=100, verbose_name=_("Задача"))
+    payload = models.JSONField(default=dict, verbose_name=_("Параметры"))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_("Попыток"))
+    last_error = models.TextField(blank=True, verbose_name=_("Последняя ошибка"))
+    created_at = models.DateTimeField(verbose_name=_("Дата постановки"))
+    failed_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Дата отказа"))
+
+    def __str__(self):
+        return f'{self.name}: {self.failed_at.strftime("%d.%m.%Y %H:%M")}'
+
+    class Meta:
+        ordering = ['-failed_at']
+        verbose_name = _("Невыполненная задача")
+        verbose_name_plural = _("Невыполненные задачи")
+
+
+class ViewerSketch(models.Model):
+    """
+    HyperLogLog-скетч уникальных зрителей объекта за день; строка с day=None — за всё время.
+    См. app/reach.py.
+    """
+    class Kinds(models.TextChoices):
+        PUBLICATION = 'PUBLICATION', _('Публикация')
+        MATERIAL = 'MATERIAL', _('Обучающий материал')
+        OVERVIEW = 'OVERVIEW', _('Обзор рынка')
+        SITE = 'SITE', _('Весь сайт')
+
+    kind = models.CharField(max_length=20, choices=Kinds.choices, verbose_name=_("Тип объекта"))
+    object_id = models.BigIntegerField(default=0, verbose_name=_("ID объекта"))
+    day = models.DateField(null=True, blank=True, verbose_name=_("День"))
+    registers = models.BinaryField(verbose_name=_("Регистры"))
+
+    def __str__(self):
+        return f'{self.kind} #{self.object_id} за {self.day or "всё время"}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id', 'day'], name='viewer_sketch_unique_day'),
+            models.UniqueConstraint(fields=['kind', 'object_id'], condition=models.Q(day__isnull=True),
+                                    name='viewer_sketch_unique_total'),
+        ]
+        verbose_name = _("Скетч уникальных зрителей")
+        verbose_name_plural = _("Скетчи уникальных зрителей")
+
+
+@receiver(post_delete, sender=Publication)
+@receiver(post_delete, sender=EducationalMaterial)
+@receiver(post_delete, sender=MarketOverview)
+def delete_viewer_sketches(sender, instance, **kwargs):
+    from .reach import KIND_BY_MODEL
+
+    ViewerSketch.objects.filter(kind=KIND_BY_MODEL[sender], object_id=instance.pk).delete()
 
 
 # Функция для создания ролей и начальных данных (вызвать из миграции или shell при необходимости)
@@ -0,0 +1,103 @@
+# app/profiles.py
+"""
+Сводка профиля пользователя.
+
+get_profile_summary() собирает профиль, статистику, счётчики, последние публикации
+и достижения за три запроса и кэширует результат на пользователя с тегом
+user:<id>:profile (app/caching.py) — его сбрасывают сигналы моделей профиля.
+"""
+from django.contrib.auth.models import User
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .caching import cache, user_tag
+from .models import Publication, UserAchievement, UserStatistics
+
+PROFILE_SUMMARY_TTL = 300
+PROFILE_PUBLICATIONS_PER_PAGE = 10
+
+PUBLICATION_FIELDS = ('id', 'description', 'status', 'created_at')
+
+
+def _profile_summary_key(user_id):
+    return f'profile_summary:{user_id}'
+
+
+def count_subquery(model, field, outer='pk'):
+    """COUNT связанных строк коррелированным подзапросом (без размножения JOIN-ов)"""
+    counts = model.objects.filter(**{field: OuterRef(outer)}).order_by().values(field).annotate(n=Count('pk'))
+    return Coalesce(Subquery(counts.values('n')[:1], output_field=IntegerField()), 0)
+
+
+def get_user_publications_page(user_id, page):
+    """Страница публикаций пользователя (словари с полями PUBLICATION_FIELDS)"""
+    offset = (page - 1) * PROFILE_PUBLICATIONS_PER_PAGE
+    queryset = Publication.objects.filter(author_id=user_id).order_by('-created_at').values(*PUBLICATION_FIELDS)
+    return list(queryset[offset:offset + PROFILE_PUBLICATIONS_PER_PAGE])
+
+
+def _build_profile_summary(user_id):
+    user = User.objects.select_related('profile', 'statistics').annotate(
+        publications_count=count_subquery(Publication, 'author'),
+        achievements_count=count_subquery(UserAchievement, 'user'),
+    ).get(pk=user_id)
+    profile = user.profile
+
+    try:
+        stats = user.statistics
+    except UserStatistics.DoesNotExist:
+        stats = UserStatistics(user=user)
+
+    achievements = UserAchievement.objects.filter(user_id=user_id).select_related('achievement')
+
+    return {
+        'user': {
+            'id': user.pk,
+            'username': user.username,
+            'date_joined': user.date_joined,
+        },
+        'profile': {
+            'first_name': profile.first_name,
+            'last_name': profile.last_name,
+            'age': profile.age,
+            'is_private': profile.is_private,
+            'rating_score': profile.rating_score,
+            'login_streak': profile.login_streak,
+            'followers_count': profile.followers_count,
+            'following_count': profile.following_count,
+        },
+        'statistics': {
+            'total_publications': stats.total_publications,
+            'successful_predictions': stats.successful_predictions,
+            'total_boosts_received': stats.total_boosts_received,
+            'total_boosts_given': stats.total_boosts_given,
+            'profile_views': stats.profile_views,
+            'success_rate': stats.success_rate(),
+        },
+        'publications_count': user.publications_count,
+        'achievements_count': user.achievements_count,
+        'recent_publications': get_user_publications_page(user_id, 1),
+        'achievements': [
+            {
+                'name': ua.achievement.name,
+                'icon': ua.achievement.icon,
+                'description': ua.achievement.description,
+                'awarded_at': ua.awarded_at,
+            }
+            for ua in achievements
+        ],
+    }
+
+
+def get_profile_summary(user_id):
+    """
+    Возвращает сводку профиля из кэша или строит её (3 запроса).
+    Бросает User.DoesNotExist, если пользователя нет.
+    """
+    return cache.get_or_set(_profile_summary_key(user_id), lambda: _build_profile_summary(user_id),
+                            PROFILE_SUMMARY_TTL, tags=[user_tag(user_id, 'profile')])
+
+
+def invalidate_profile_summary(*user_ids):
+    """Сбрасывает кэшированные сводки указанных пользователей"""
+    cache.invalidate_tags(*[user_tag(user_id, 'profile') for user_id in user_ids])
@@ -0,0 +1,251 @@
+# app/reach.py
+"""
+Уникальные зрители публикаций, обучающих материалов и обзоров рынка.
+
+Точная таблица «кто что смотрел» для нашего трафика слишком велика, поэтому охват
+оценивается HyperLogLog: у каждого объекта — скетч фиксированного размера
+(HLL_REGISTERS байт, погрешность около 1.6%) за каждый день и за всё время.
+Скетчи объединяются поэлементным максимумом, так что охват за неделю или месяц —
+это объединение дневных скетчей (ViewerSketch.Kinds.SITE — весь сайт).
+
+record_view() только обновляет регистры в памяти процесса и в БД не ходит. Фоновый поток
+процесса (запускается первым просмотром) раз в FLUSH_INTERVAL секунд, а при MAX_PENDING
+объектах — сразу, вливает их в ViewerSketch пачками и записывает оценку за всё время
+в поле unique_viewers объекта; при завершении процесса регистры вливаются через atexit.
+Если запись не удалась, регистры возвращаются в память и вливаются следующим проходом.
+Повторные просмотры регистры не меняют и в БД не пишутся.
+"""
+import atexit
+import datetime
+import hashlib
+import logging
+import math
+import threading
+
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .achievements import BATCH_SIZE
+from .models import EducationalMaterial, MarketOverview, Publication, ViewerSketch
+
+logger = logging.getLogger(__name__)
+
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+_HASH_BITS = 64
+_RANK_BITS = _HASH_BITS - HLL_PRECISION
+_ALPHA = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+_POWERS = [2.0 ** -rank for rank in range(_RANK_BITS + 2)]
+
+# Как часто (в секундах) процесс вливает накопленные регистры в БД
+FLUSH_INTERVAL = 60
+# Сколько объектов можно накопить до внеочередного сброса
+MAX_PENDING = 5000
+# Сколько дней хранятся дневные скетчи (скетчи за всё время не удаляются)
+DAILY_SKETCH_RETENTION_DAYS = 90
+
+MODEL_BY_KIND = {
+    ViewerSketch.Kinds.PUBLICATION: Publication,
+    ViewerSketch.Kinds.MATERIAL: EducationalMaterial,
+    ViewerSketch.Kinds.OVERVIEW: MarketOverview,
+}
+KIND_BY_MODEL = {model: kind for kind, model in MODEL_BY_KIND.items()}
+
+
+class HyperLogLog:
+    """Скетч HyperLogLog: HLL_REGISTERS однобайтовых регистров"""
+
+    __slots__ = ('registers',)
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers) if registers else bytearray(HLL_REGISTERS)
+
+    @staticmethod
+    def position(value):
+        """(номер регистра, ранг) для строки value"""
+        digest = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+        index = digest >> _RANK_BITS
+        rest = digest & ((1 << _RANK_BITS) - 1)
+        return index, _RANK_BITS - rest.bit_length() + 1
+
+    def update(self, index, rank):
+        """Поднимает регистр до rank; True, если скетч изменился"""
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def add(self, value):
+        return self.update(*self.position(value))
+
+    def merge(self, other):
+        """Объединяет с другим скетчем; True, если этот скетч изменился"""
+        changed = False
+        for index, rank in enumerate(other.registers):
+            if rank > self.registers[index]:
+                self.registers[index] = rank
+                changed = True
+        return changed
+
+    def count(self):
+        """Оценка числа различных добавленных значений"""
+        estimate = _ALPHA * HLL_REGISTERS * HLL_REGISTERS / sum(_POWERS[rank] for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * HLL_REGISTERS and zeros:
+            # малые мощности: линейный подсчёт точнее
+            estimate = HLL_REGISTERS * math.log(HLL_REGISTERS / zeros)
+        return round(estimate)
+
+    def __bytes__(self):
+        return bytes(self.registers)
+
+
+_lock = threading.Lock()
+_pending = {}       # (kind, object_id, day) -> {номер регистра: ранг}
+_flusher_started = False
+_flush_soon = threading.Event()
+
+
+def visitor_key(request):
+    """Идентификатор зрителя: пользователь или, для анонимов, IP и User-Agent"""
+    if request.user.is_authenticated:
+        return f'u:{request.user.pk}'
+    return f"a:{request.META.get('REMOTE_ADDR', '')}|{request.headers.get('User-Agent', '')}"
+
+
+def _merge_pending(pending):
+    """Добавляет регистры к накопленным (вызывается под _lock)"""
+    for key, updates in pending.items():
+        registers = _pending.setdefault(key, {})
+        for index, rank in updates.items():
+            if rank > registers.get(index, 0):
+                registers[index] = rank
+
+
+def record_view(request, obj):
+    """Учитывает просмотр объекта (Publication, EducationalMaterial или MarketOverview)"""
+    kind = KIND_BY_MODEL[type(obj)]
+    index, rank = HyperLogLog.position(visitor_key(request))
+    day = timezone.localdate()
+    _ensure_flusher()
+    with _lock:
+        _merge_pending({key: {index: rank} for key in ((kind, obj.pk, day), (kind, obj.pk, None),
+                                                       (ViewerSketch.Kinds.SITE, 0, day),
+                                                       (ViewerSketch.Kinds.SITE, 0, None))})
+        if len(_pending) >= MAX_PENDING:
+            _flush_soon.set()
+
+
+def flush_viewers():
+    """Немедленно вливает накопленные регистры текущего процесса; возвращает число записанных объектов"""
+    global _pending
+    with _lock:
+        pending, _pending = _pending, {}
+    failed = _write_pending(pending)
+    if failed:
+        with _lock:
+            _merge_pending(failed)
+    return len(pending) - len(failed)
+
+
+def _flush_periodically():
+    while True:
+        _flush_soon.wait(FLUSH_INTERVAL)
+        _flush_soon.clear()
+        close_old_connections()
+        try:
+            flush_viewers()
+        except Exception:
+            logger.exception('Не удалось влить скетчи зрителей')
+        finally:
+            close_old_connections()
+
+
+def _ensure_flusher():
+    """Запускает фоновый сброс регистров при первом просмотре в процессе"""
+    global _flusher_started
+    if _flusher_started:
+        return
+    with _lock:
+        if _flusher_started:
+            return
+        _flusher_started = True
+        atexit.register(flush_viewers)
+        threading.Thread(target=_flush_periodically, name='viewer-sketch-flush', daemon=True).start()
+
+
+def _lock_sketches(kind, day, object_ids):
+    """Блокирует скетчи объектов за день; недостающие создаёт пустыми. Возвращает {object_id: строка}"""
+    sketches = ViewerSketch.objects.select_for_update().filter(kind=kind, object_id__in=object_ids)
+    sketches = sketches.filter(day=day) if day else sketches.filter(day__isnull=True)
+    rows = {row.object_id: row for row in sketches}
+    for object_id in set(object_ids) - set(rows):
+        try:
+            with transaction.atomic():
+                rows[object_id] = ViewerSketch.objects.create(
+                    kind=kind, object_id=object_id, day=day, registers=bytes(HLL_REGISTERS))
+        except IntegrityError:
+            # скетч одновременно создал другой процесс
+            rows[object_id] = ViewerSketch.objects.select_for_update().get(kind=kind, object_id=object_id, day=day)
+    return rows
+
+
+def _write_pending(pending):
+    """Вливает регистры в ViewerSketch; возвращает регистры пачек, которые записать не удалось"""
+    by_group = {}
+    for (kind, object_id, day), registers in pending.items():
+        by_group.setdefault((kind, day), {})[object_id] = registers
+
+    failed = {}
+    for (kind, day), updates in by_group.items():
+        object_ids = list(updates)
+        for start in range(0, len(object_ids), BATCH_SIZE):
+            batch = object_ids[start:start + BATCH_SIZE]
+            try:
+                _write_batch(kind, day, batch, updates)
+            except DatabaseError:
+                logger.exception('Скетчи зрителей (%s, %s) не записаны, повтор при следующем сбросе', kind, day)
+                failed.update(((kind, object_id, day), updates[object_id]) for object_id in batch)
+    return failed
+
+
+def _write_batch(kind, day, batch, updates):
+    with transaction.atomic():
+        rows = _lock_sketches(kind, day, batch)
+        changed = []
+        for object_id in batch:
+            row = rows[object_id]
+            sketch = HyperLogLog(row.registers)
+            if any([sketch.update(index, rank) for index, rank in updates[object_id].items()]):
+                row.registers = bytes(sketch)
+                changed.append((row, sketch))
+        ViewerSketch.objects.bulk_update([row for row, _ in changed], ['registers'])
+
+        model = MODEL_BY_KIND.get(kind)
+        if day is None and model is not None and changed:
+            model.objects.bulk_update(
+                [model(pk=row.object_id, unique_viewers=sketch.count()) for row, sketch in changed],
+                ['unique_viewers'],
+            )
+
+
+def merged_sketch(kind, object_id, start, end):
+    """Объединённый скетч объекта за дни [start, end]"""
+    sketch = HyperLogLog()
+    days = ViewerSketch.objects.filter(kind=kind, object_id=object_id, day__range=(start, end))
+    for registers in days.values_list('registers', flat=True):
+        sketch.merge(HyperLogLog(registers))
+    return sketch
+
+
+def count_site_viewers(days):
+    """Уникальные зрители материалов сайта за последние days дней (включая сегодня)"""
+    today = timezone.localdate()
+    return merged_sketch(ViewerSketch.Kinds.SITE, 0, today - datetime.timedelta(days=days - 1), today).count()
+
+
+def prune_daily_sketches(keep_days=DAILY_SKETCH_RETENTION_DAYS):
+    """Удаляет дневные скетчи старше keep_days дней; возвращает число удалённых"""
+    cutoff = timezone.localdate() - datetime.timedelta(days=keep_days)
+    deleted, _ = ViewerSketch.objects.filter(day__lt=cutoff).delete()
+    return deleted
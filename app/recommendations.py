@@ -0,0 +1,226 @@
+# app/recommendations.py
+"""
+Рекомендации «на кого подписаться» и «идеи, которые могут понравиться».
+
+Офлайн-задача build_recommendations() строит разреженные матрицы взаимодействий
+(пользователь × автор по бустам и подпискам, пользователь × публикация по бустам),
+считает item-item косинусную близость блоками по CHUNK_SIZE объектов, оставляя
+у каждого объекта NEIGHBOURS ближайших соседей, и сохраняет top-K на пользователя
+в Recommendation. Память — O(взаимодействий + объектов × NEIGHBOURS), а не O(объектов²).
+
+NumPy/SciPy нужны только задаче и импортируются внутри функций.
+"""
+import itertools
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .follows import Follow
+from .models import Publication, Recommendation
+
+TOP_K = 20
+NEIGHBOURS = 50
+CHUNK_SIZE = 500            # объектов в одном блоке расчёта близости
+USER_CHUNK_SIZE = 5000      # пользователей в одном блоке расчёта оценок
+BOOST_WEIGHT = 1.0
+FOLLOW_WEIGHT = 3.0
+PUBLICATION_WINDOW_DAYS = 90
+ITERATOR_CHUNK_SIZE = 10000
+WRITE_BATCH_SIZE = 1000
+
+
+def _load_pairs(queryset):
+    """Потоково читает пары values_list(a, b) в массив numpy формы (n, 2)"""
+    import numpy as np
+
+    rows = queryset.order_by().iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    return np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64).reshape(-1, 2)
+
+
+def _to_matrix(pairs, weight, user_ids, item_ids):
+    """CSR-матрица users × items по парам (user_id, item_id); повторы суммируются"""
+    import numpy as np
+    from scipy import sparse
+
+    rows = np.searchsorted(user_ids, pairs[:, 0])
+    cols = np.searchsorted(item_ids, pairs[:, 1])
+    data = np.full(len(pairs), weight, dtype=np.float32)
+    return sparse.csr_matrix((data, (rows, cols)), shape=(len(user_ids), len(item_ids)))
+
+
+def _item_neighbours(matrix):
+    """
+    Матрица items × items, в каждой строке которой не более NEIGHBOURS
+    ближайших по косинусу объектов. Считается блоками по CHUNK_SIZE строк.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+    normalized = (matrix @ sparse.diags(1.0 / norms)).tocsr()
+    items_by_users = normalized.T.tocsr()
+    n_items = matrix.shape[1]
+
+    rows, cols, values = [np.empty(0, np.int64)], [np.empty(0, np.int64)], [np.empty(0, np.float32)]
+    for start in range(0, n_items, CHUNK_SIZE):
+        block = (items_by_users[start:start + CHUNK_SIZE] @ normalized).tocsr()
+        for offset in range(block.shape[0]):
+            lo, hi = block.indptr[offset], block.indptr[offset + 1]
+            neighbour_cols, scores = block.indices[lo:hi], block.data[lo:hi]
+            not_self = neighbour_cols != start + offset
+            neighbour_cols, scores = neighbour_cols[not_self], scores[not_self]
+            if len(scores) > NEIGHBOURS:
+                top = np.argpartition(-scores, NEIGHBOURS)[:NEIGHBOURS]
+                neighbour_cols, scores = neighbour_cols[top], scores[top]
+            rows.append(np.full(len(scores), start + offset, dtype=np.int64))
+            cols.append(neighbour_cols.astype(np.int64))
+            values.append(scores.astype(np.float32))
+
+    return sparse.csr_matrix(
+        (np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))), shape=(n_items, n_items)
+    )
+
+
+def _top_items(matrix, neighbours, known, user_ids, item_owner, allowed=None):
+    """
+    Для каждого пользователя выдаёт (user_id, [item_index], [score]) — TOP_K объектов.
+    Исключаются объекты из known (уже знакомые), объекты самого пользователя
+    (item_owner[item] == user_id) и объекты вне маски allowed.
+    """
+    import numpy as np
+
+    for start in range(0, matrix.shape[0], USER_CHUNK_SIZE):
+        scores = (matrix[start:start + USER_CHUNK_SIZE] @ neighbours).tocsr()
+        known_chunk = known[start:start + USER_CHUNK_SIZE]
+        for offset in range(scores.shape[0]):
+            user_id = user_ids[start + offset]
+            lo, hi = scores.indptr[offset], scores.indptr[offset + 1]
+            candidates, values = scores.indices[lo:hi], scores.data[lo:hi]
+
+            seen = known_chunk.indices[known_chunk.indptr[offset]:known_chunk.indptr[offset + 1]]
+            keep = ~np.isin(candidates, seen) & (item_owner[candidates] != user_id)
+            if allowed is not None:
+                keep &= allowed[candidates]
+            candidates, values = candidates[keep], values[keep]
+            if not len(values):
+                continue
+
+            if len(values) > TOP_K:
+                top = np.argpartition(-values, TOP_K)[:TOP_K]
+                candidates, values = candidates[top], values[top]
+            order = np.argsort(-values)
+            yield int(user_id), candidates[order], values[order]
+
+
+def _store(kind, target_field, item_ids, results, generated_at):
+    """Заменяет рекомендации kind пачками пользователей; возвращает число пользователей"""
+    target_model = User if target_field == 'author_id' else Publication
+    stored = 0
+
+    def flush(batch):
+        user_batch = [user_id for user_id, _, _ in batch]
+        targets = {int(item_ids[i]) for _, items, _ in batch for i in items}
+        # объекты могли быть удалены, пока шёл расчёт
+        existing_users = set(User.objects.filter(pk__in=user_batch).values_list('pk', flat=True))
+        existing_targets = set()
+        target_list = list(targets)
+        for i in range(0, len(target_list), WRITE_BATCH_SIZE):
+            existing_targets.update(target_model.objects.filter(
+                pk__in=target_list[i:i + WRITE_BATCH_SIZE]
+            ).values_list('pk', flat=True))
+
+        rows = []
+        for user_id, items, scores in batch:
+            if user_id not in existing_users:
+                continue
+            position = 0
+            for item, score in zip(items, scores):
+                target_id = int(item_ids[item])
+                if target_id not in existing_targets:
+                    continue
+                position += 1
+                rows.append(Recommendation(
+                    user_id=user_id, kind=kind, score=float(score), position=position,
+                    generated_at=generated_at, **{target_field: target_id}
+                ))
+        with transaction.atomic():
+            Recommendation.objects.filter(kind=kind, user_id__in=user_batch).delete()
+            Recommendation.objects.bulk_create(rows, batch_size=WRITE_BATCH_SIZE)
+
+    batch = []
+    for result in results:
+        batch.append(result)
+        if len(batch) >= WRITE_BATCH_SIZE:
+            flush(batch)
+            stored += len(batch)
+            batch = []
+    if batch:
+        flush(batch)
+        stored += len(batch)
+
+    # у пользователей, выпавших из расчёта, старые рекомендации удаляем
+    Recommendation.objects.filter(kind=kind, generated_at__lt=generated_at).delete()
+    return stored
+
+
+def build_author_recommendations(generated_at):
+    """«На кого подписаться»: близость авторов по бустам и подпискам"""
+    import numpy as np
+
+    boosts = _load_pairs(Publication.boosts.through.objects.values_list('user_id', 'publication__author_id'))
+    follows = _load_pairs(Follow.objects.values_list('profile__user_id', 'user_id'))
+    pairs = np.concatenate([boosts, follows])
+    if not len(pairs):
+        Recommendation.objects.filter(kind=Recommendation.Kinds.AUTHOR).delete()
+        return 0
+
+    user_ids, author_ids = np.unique(pairs[:, 0]), np.unique(pairs[:, 1])
+    matrix = _to_matrix(boosts, BOOST_WEIGHT, user_ids, author_ids) + \
+        _to_matrix(follows, FOLLOW_WEIGHT, user_ids, author_ids)
+    matrix.data = np.log1p(matrix.data)
+    # исключаем только тех, на кого уже подписан: автора, которого бустили, рекомендовать можно
+    known = _to_matrix(follows, 1.0, user_ids, author_ids)
+
+    results = _top_items(matrix, _item_neighbours(matrix), known, user_ids, item_owner=author_ids)
+    return _store(Recommendation.Kinds.AUTHOR, 'author_id', author_ids, results, generated_at)
+
+
+def build_publication_recommendations(generated_at):
+    """«Идеи, которые могут понравиться»: близость публикаций за последние PUBLICATION_WINDOW_DAYS дней"""
+    import numpy as np
+
+    since = generated_at - timezone.timedelta(days=PUBLICATION_WINDOW_DAYS)
+    boosts = _load_pairs(Publication.boosts.through.objects.filter(
+        publication__created_at__gte=since
+    ).values_list('user_id', 'publication_id'))
+    if not len(boosts):
+        Recommendation.objects.filter(kind=Recommendation.Kinds.PUBLICATION).delete()
+        return 0
+
+    user_ids, publication_ids = np.unique(boosts[:, 0]), np.unique(boosts[:, 1])
+    matrix = _to_matrix(boosts, BOOST_WEIGHT, user_ids, publication_ids)
+    matrix.data = np.log1p(matrix.data)
+
+    # автор и статус каждой публикации матрицы
+    authors = np.zeros(len(publication_ids), dtype=np.int64)
+    active = np.zeros(len(publication_ids), dtype=bool)
+    rows = Publication.objects.filter(created_at__gte=since).order_by().values_list('pk', 'author_id', 'status')
+    for pk, author_id, status in rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        index = np.searchsorted(publication_ids, pk)
+        if index < len(publication_ids) and publication_ids[index] == pk:
+            authors[index] = author_id
+            active[index] = status == Publication.StatusChoices.ACTIVE
+
+    results = _top_items(matrix, _item_neighbours(matrix), matrix, user_ids, item_owner=authors, allowed=active)
+    return _store(Recommendation.Kinds.PUBLICATION, 'publication_id', publication_ids, results, generated_at)
+
+
+def build_recommendations():
+    """Пересчитывает все рекомендации; возвращает {тип: число пользователей}"""
+    generated_at = timezone.now()
+    return {
+        Recommendation.Kinds.AUTHOR: build_author_recommendations(generated_at),
+        Recommendation.Kinds.PUBLICATION: build_publication_recommendations(generated_at),
+    }
@@ -0,0 +1,145 @@
+# app/replicas.py
+"""
+Чтение с реплик, запись в основную базу.
+
+ReplicaRouter отправляет запись в основную базу (алиас PRIMARY = 'default'), а чтение —
+в одну из settings.DATABASE_REPLICAS (в пределах HTTP-запроса — всегда в одну и ту же).
+Чтение идёт в основную базу, если:
+  - реплики не настроены;
+  - открыта транзакция основной базы (select_for_update и «прочитать-изменить» внутри atomic);
+  - в этом запросе (или контексте команды) уже была запись — читаем свои изменения;
+  - клиент недавно что-то изменил: ReplicaPinningMiddleware после POST/PUT/PATCH/DELETE
+    с записью ставит cookie на REPLICA_PIN_SECONDS, пока реплики догоняют основную базу;
+  - код явно попросил: use_primary() или queryset.using(PRIMARY).
+"""
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+PIN_COOKIE = 'pin_primary'
+DEFAULT_PIN_SECONDS = 5
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class RoutingState:
+    """Состояние маршрутизации запроса или контекста команды"""
+
+    __slots__ = ('pinned', 'wrote', 'replica')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+_state = contextvars.ContextVar('replica_routing', default=None)
+
+
+def _replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def _current_state():
+    state = _state.get()
+    if state is None:
+        # вне запроса (команды, потоки, консьюмеры) — своё состояние на контекст
+        state = RoutingState()
+        _state.set(state)
+    return state
+
+
+@contextmanager
+def use_primary():
+    """Все чтения внутри блока идут в основную базу"""
+    state = _current_state()
+    pinned = state.pinned
+    state.pinned = True
+    try:
+        yield
+    finally:
+        state.pinned = pinned
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = _replicas()
+        if not replicas:
+            return None
+        state = _current_state()
+        if state.pinned or state.wrote or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # связанные объекты читаются оттуда же, откуда загружен исходный
+            return instance._state.db
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        _current_state().wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схема реплик приходит с репликацией
+        return False if db in _replicas() else None
+
+
+class ReplicaPinningMiddleware:
+    """Состояние маршрутизации на запрос и cookie «читать из основной базы» после изменений"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState(pinned=self._recently_wrote(request))
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(request, response, state)
+
+    async def __acall__(self, request):
+        # состояние общее с потоками sync_to_async: они получают копию контекста с тем же объектом
+        state = RoutingState(pinned=self._recently_wrote(request))
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(request, response, state)
+
+    @staticmethod
+    def _pin(request, response, state):
+        # GET тоже пишет (счётчики просмотров, сессии), но свои изменения пользователь ждёт после форм
+        if state.wrote and request.method not in SAFE_METHODS and _replicas():
+            pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', DEFAULT_PIN_SECONDS)
+            response.set_cookie(PIN_COOKIE, str(time.time() + pin_seconds), max_age=pin_seconds,
+                                httponly=True, samesite='Lax')
+        return response
+
+    @staticmethod
+    def _recently_wrote(request):
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
@@ -0,0 +1,108 @@
+# app/roles.py
+"""
+Роли и права пользователя без запросов к БД на горячем пути.
+
+get_roles() загружает группы и права пользователя один раз за запрос
+(результат запоминается на объекте request.user) и кэширует их между запросами
+с тегом user:<id>:roles (app/caching.py); m2m_changed на группах/правах сбрасывает
+тег (см. invalidate_user_roles_cache в models.py).
+
+role_group_id() — id группы роли (например, Trader для новых пользователей) из кэша с тегом
+group; тег сбрасывается при изменении или удалении группы, а также после migrate и flush.
+"""
+from django.contrib.auth.models import Group, Permission
+from django.db.models import Q
+
+from .caching import cache, user_tag
+from .models import create_roles
+
+ROLES_CACHE_TTL = 60 * 60
+
+TRADER = 'Trader'
+MODERATOR = 'Moderator'
+ADMIN = 'Admin'
+
+
+def _roles_key(user_id):
+    return f'roles:{user_id}'
+
+
+def role_group_id(name):
+    """id группы роли name; группы, удалённые после миграции 0016_seed_roles, создаются заново"""
+    try:
+        return cache.get_or_set(f'role-group:{name}', lambda: Group.objects.get(name=name).pk, ROLES_CACHE_TTL,
+                                tags=['group'])
+    except Group.DoesNotExist:
+        # созданная группа не кэшируется: транзакцию, в которой её создали, могут откатить
+        create_roles()
+        return Group.objects.get(name=name).pk
+
+
+def forget_role_groups(**kwargs):
+    """Обработчик post_migrate: migrate и flush меняют группы без сигналов моделей"""
+    cache.invalidate_tags('group')
+
+
+class UserRoles:
+    """Группы и права конкретного пользователя (флаги is_active/is_staff берутся с самого объекта)"""
+
+    def __init__(self, user, groups=frozenset(), permissions=frozenset()):
+        self.user = user
+        self.groups = groups
+        self.permissions = permissions
+
+    def has_role(self, name):
+        return name in self.groups
+
+    def has_perm(self, perm):
+        if not self.user.is_active:
+            return False
+        return self.user.is_superuser or perm in self.permissions
+
+    @property
+    def is_trader(self):
+        return self.has_role(TRADER)
+
+    @property
+    def is_moderator(self):
+        return self.has_role(MODERATOR)
+
+    @property
+    def is_admin(self):
+        return self.user.is_staff or self.has_role(ADMIN)
+
+
+def _load_roles(user):
+    groups = frozenset(user.groups.values_list('name', flat=True))
+    permissions = frozenset(
+        f'{app_label}.{codename}'
+        for app_label, codename in Permission.objects.filter(
+            Q(user=user) | Q(group__user=user)
+        ).values_list('content_type__app_label', 'codename').distinct()
+    )
+    return groups, permissions
+
+
+def get_roles(user):
+    """Возвращает UserRoles для пользователя (анонимный — пустой набор)"""
+    roles = getattr(user, '_roles', None)
+    if roles is not None:
+        return roles
+
+    if not user.is_authenticated:
+        roles = UserRoles(user)
+    else:
+        cached = cache.get_or_set(_roles_key(user.pk), lambda: _load_roles(user), ROLES_CACHE_TTL,
+                                  tags=[user_tag(user.pk, 'roles')])
+        roles = UserRoles(user, *cached)
+        # ModelBackend хранит права в user._perm_cache: заполняем его,
+        # чтобы user.has_perm() и {{ perms }} в шаблонах тоже не ходили в БД.
+        user._perm_cache = set(roles.permissions)
+
+    user._roles = roles
+    return roles
+
+
+def invalidate_roles(*user_ids):
+    """Делает устаревшими кэшированные роли пользователей"""
+    cache.invalidate_tags(*[user_tag(user_id, 'roles') for user_id in user_ids])
@@ -0,0 +1,351 @@
+# app/screenshots.py
+"""
+Скриншоты публикаций: однократная загрузка, контентно-адресуемое хранилище и WebP-миниатюры.
+
+Publication.screenshot_id — URL изображения или file_id Telegram. Задача
+ingest_screenshots() (manage.py process_screenshots) загружает каждый источник один раз
+(пулом потоков), кладёт оригинал в SCREENSHOT_ROOT под именем SHA-256 содержимого,
+строит миниатюры шириной THUMBNAIL_WIDTHS в пуле процессов и связывает публикацию
+со Screenshot. Одинаковые изображения хранятся один раз.
+
+Сетевые сбои (таймаут, HTTP 5xx, недоступный Bot API) не окончательны: публикация
+получает screenshot_retry_at с экспоненциальной задержкой и загружается снова, а
+screenshot_failed ставится только после SCREENSHOT_MAX_ATTEMPTS попыток или сразу —
+если источник не подойдёт и при повторе (ScreenshotRejected: хост не разрешён, это не
+изображение, оно слишком большое).
+
+Ссылки приходят от пользователей, поэтому по ним загружаются только хосты из
+SCREENSHOT_URL_HOSTS, соединение допускается только с публичным адресом (проверяется
+адрес, к которому реально подключились), перенаправления не выполняются, а размер ответа
+ограничен MAX_DOWNLOAD_SIZE.
+
+Миниатюры отдаются по адресу, содержащему хэш (screenshot_thumbnail_view), поэтому
+их можно кэшировать навсегда: Cache-Control immutable и ETag по хэшу и ширине.
+"""
+import datetime
+import hashlib
+import ipaddress
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import django
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .caching import cache, object_tag
+from .models import Publication, Screenshot
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTHS = (320, 640, 1280)
+FEED_WIDTH = 640
+DETAIL_WIDTH = 1280
+WEBP_QUALITY = 80
+MAX_DOWNLOAD_SIZE = 10 * 1024 * 1024
+DOWNLOAD_TIMEOUT = 15
+DOWNLOAD_WORKERS = 8
+INGEST_BATCH_SIZE = 100
+THUMBNAIL_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+SCREENSHOT_MAX_ATTEMPTS = 5
+SCREENSHOT_RETRY_BASE = datetime.timedelta(minutes=10)
+
+
+class ScreenshotError(Exception):
+    """Скриншот не удалось загрузить или разобрать"""
+
+
+class ScreenshotRejected(ScreenshotError):
+    """Источник не подойдёт и при повторной попытке"""
+
+
+def _root():
+    return Path(settings.SCREENSHOT_ROOT)
+
+
+def original_path(sha256):
+    return _root() / sha256[:2] / sha256
+
+
+def thumbnail_path(sha256, width):
+    return _root() / sha256[:2] / f'{sha256}_{width}.webp'
+
+
+def _write_atomic(path, write):
+    """Пишет файл через временный в том же каталоге, чтобы читатели не видели его недописанным"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            write(tmp)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def _check_public_address(address):
+    """Запрещает соединения с внутренними адресами: частными, loopback, link-local (169.254.169.254) и т. п."""
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    if not ip.is_global or ip.is_multicast:
+        raise ScreenshotRejected(f'Адрес {ip} не публичный')
+
+
+def _check_allowed_host(url, allowed_hosts):
+    parts = urlsplit(url)
+    host = (parts.hostname or '').rstrip('.')
+    if parts.scheme not in ('http', 'https') or not host:
+        raise ScreenshotRejected('Некорректная ссылка')
+    if not any(host == allowed or host.endswith('.' + allowed) for allowed in allowed_hosts):
+        raise ScreenshotRejected(f'Загрузка с {host} не разрешена')
+
+
+def _public_session():
+    """Сессия requests, которая проверяет адрес каждого установленного соединения"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    # адрес проверяется после подключения: DNS не успеет подменить его между проверкой и запросом
+    class PublicHTTPConnection(HTTPConnection):
+        def _new_conn(self):
+            sock = super()._new_conn()
+            try:
+                _check_public_address(sock.getpeername()[0])
+            except ScreenshotError:
+                sock.close()
+                raise
+            return sock
+
+    class PublicHTTPSConnection(PublicHTTPConnection, HTTPSConnection):
+        pass
+
+    class PublicHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = PublicHTTPConnection
+
+    class PublicHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = PublicHTTPSConnection
+
+    class PublicAddressAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': PublicHTTPConnectionPool, 'https': PublicHTTPSConnectionPool,
+            }
+
+    session = requests.Session()
+    # прокси из окружения подменил бы адрес соединения
+    session.trust_env = False
+    adapter = PublicAddressAdapter()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _source(screenshot_id):
+    """(адрес загрузки, разрешённые хосты или None для адреса Bot API)"""
+    if screenshot_id.startswith(('http://', 'https://')):
+        return screenshot_id, settings.SCREENSHOT_URL_HOSTS
+    # иначе это file_id Telegram: путь к файлу выдаёт getFile
+    if not settings.TELEGRAM_BOT_TOKEN:
+        raise ScreenshotRejected('Для file_id Telegram нужен BOT_TOKEN')
+    import requests
+
+    api_url = settings.TELEGRAM_API_URL.rstrip('/')
+    token = settings.TELEGRAM_BOT_TOKEN
+    response = requests.get(f'{api_url}/bot{token}/getFile', params={'file_id': screenshot_id},
+                            timeout=DOWNLOAD_TIMEOUT)
+    if response.status_code != 200:
+        raise ScreenshotError(f'getFile: HTTP {response.status_code}')
+    return f"{api_url}/file/bot{token}/{response.json()['result']['file_path']}", None
+
+
+def download(url, allowed_hosts=None):
+    """
+    Содержимое изображения (не больше MAX_DOWNLOAD_SIZE байт).
+    allowed_hosts — для ссылок из пользовательских данных: хост должен быть в списке или его
+    поддоменом, а соединение — с публичным адресом. Перенаправления не выполняются.
+    """
+    # requests нужен только задачам загрузки — не процессам, которые импортируют модуль ради миниатюр
+    import requests
+
+    if allowed_hosts is None:
+        session = requests.Session()
+    else:
+        _check_allowed_host(url, allowed_hosts)
+        session = _public_session()
+    with session, session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT, allow_redirects=False) as response:
+        if response.status_code != 200:
+            raise ScreenshotError(f'HTTP {response.status_code}')
+        length = response.headers.get('Content-Length', '')
+        if length.isdigit() and int(length) > MAX_DOWNLOAD_SIZE:
+            raise ScreenshotRejected('Изображение слишком большое')
+        chunks, size = [], 0
+        for chunk in response.iter_content(64 * 1024):
+            size += len(chunk)
+            if size > MAX_DOWNLOAD_SIZE:
+                raise ScreenshotRejected('Изображение слишком большое')
+            chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def store_original(data):
+    """Сохраняет оригинал под его SHA-256 (если такого ещё нет); возвращает хэш"""
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = original_path(sha256)
+    if not path.exists():
+        _write_atomic(path, lambda f: f.write(data))
+    return sha256
+
+
+def _fetch(screenshot_id):
+    """(хэш или None, True — если источник отвергнут и повторять загрузку незачем)"""
+    import requests
+
+    try:
+        return store_original(download(*_source(screenshot_id))), False
+    except (requests.RequestException, ScreenshotError, KeyError, ValueError) as error:
+        logger.warning('Скриншот %s не загружен: %s', screenshot_id, error)
+        return None, isinstance(error, ScreenshotRejected)
+
+
+def render_thumbnails(sha256):
+    """
+    Строит недостающие WebP-миниатюры оригинала (выполняется в дочернем процессе).
+    Возвращает (ширина, высота, размер оригинала) или None, если это не изображение.
+    """
+    from PIL import Image
+
+    path = original_path(sha256)
+    try:
+        with Image.open(path) as image:
+            image.load()
+            width, height = image.size
+            has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+    except (OSError, Image.DecompressionBombError) as error:
+        logger.warning('Скриншот %s не разобран: %s', sha256, error)
+        return None
+
+    for target in THUMBNAIL_WIDTHS:
+        thumbnail = thumbnail_path(sha256, target)
+        if thumbnail.exists():
+            continue
+        resized = image
+        if width > target:
+            resized = image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+        _write_atomic(thumbnail, lambda f: resized.save(f, 'WEBP', quality=WEBP_QUALITY, method=4))
+    return width, height, path.stat().st_size
+
+
+def store_image(data):
+    """
+    Сохраняет загруженное изображение и строит миниатюры в текущем процессе.
+    Возвращает Screenshot или None, если это не изображение.
+    """
+    sha256 = store_original(data)
+    screenshot = Screenshot.objects.filter(sha256=sha256).first()
+    if screenshot is not None:
+        return screenshot
+    info = render_thumbnails(sha256)
+    if info is None:
+        original_path(sha256).unlink(missing_ok=True)
+        return None
+    width, height, size = info
+    screenshot, _ = Screenshot.objects.get_or_create(
+        sha256=sha256, defaults={'width': width, 'height': height, 'size': size}
+    )
+    return screenshot
+
+
+def ingest_screenshots(limit=INGEST_BATCH_SIZE, processes=None):
+    """
+    Загружает скриншоты публикаций, у которых их ещё нет, пачками по limit.
+    Возвращает (привязано, не удалось); неудачные загрузки откладываются до screenshot_retry_at.
+    """
+    linked = failed = 0
+    # публикации, отложенные в этом проходе, не выбираются повторно до его конца
+    started_at = timezone.now()
+    # initializer нужен при запуске процессов через spawn (Windows, macOS): там Django не настроен
+    with ThreadPoolExecutor(DOWNLOAD_WORKERS) as threads, \
+            ProcessPoolExecutor(processes, initializer=django.setup) as pool:
+        while True:
+            pending = list(
+                Publication.objects.filter(screenshot_image__isnull=True, screenshot_failed=False)
+                .filter(Q(screenshot_retry_at__isnull=True) | Q(screenshot_retry_at__lte=started_at))
+                .exclude(screenshot_id='').order_by('pk')
+                .values_list('pk', 'screenshot_id', 'screenshot_attempts')[:limit]
+            )
+            if not pending:
+                return linked, failed
+
+            # одинаковые источники загружаются один раз, уже загруженные — не загружаются
+            sources = {source for _, source, _ in pending}
+            known = dict(
+                Publication.objects.filter(screenshot_id__in=sources, screenshot_image__isnull=False)
+                .values_list('screenshot_id', 'screenshot_image_id')
+            )
+            to_fetch = sorted(sources - set(known))
+            hashes, rejected = {}, set()
+            for source, (sha256, is_rejected) in zip(to_fetch, threads.map(_fetch, to_fetch)):
+                hashes[source] = sha256
+                if is_rejected:
+                    rejected.add(source)
+
+            new_hashes = {sha256 for sha256 in hashes.values() if sha256}
+            existing = dict(Screenshot.objects.filter(sha256__in=new_hashes).values_list('sha256', 'pk'))
+            to_render = sorted(new_hashes - set(existing))
+            not_images = set()
+            for sha256, info in zip(to_render, pool.map(render_thumbnails, to_render)):
+                if info is None:
+                    original_path(sha256).unlink(missing_ok=True)
+                    not_images.add(sha256)
+                    continue
+                width, height, size = info
+                screenshot, _ = Screenshot.objects.get_or_create(
+                    sha256=sha256, defaults={'width': width, 'height': height, 'size': size}
+                )
+                existing[sha256] = screenshot.pk
+            for source, sha256 in hashes.items():
+                if sha256 in existing:
+                    known[source] = existing[sha256]
+                elif sha256 in not_images:
+                    rejected.add(source)
+
+            # отвергнутые источники и исчерпавшие попытки — окончательно, остальные — позже
+            by_screenshot, failed_ids, retry_ids = {}, [], {}
+            for pk, source, attempts in pending:
+                if source in known:
+                    by_screenshot.setdefault(known[source], []).append(pk)
+                elif source in rejected or attempts + 1 >= SCREENSHOT_MAX_ATTEMPTS:
+                    failed_ids.append(pk)
+                else:
+                    retry_ids.setdefault(attempts, []).append(pk)
+            now = timezone.now()
+            with transaction.atomic():
+                for screenshot_pk, publication_ids in by_screenshot.items():
+                    Publication.objects.filter(pk__in=publication_ids).update(screenshot_image_id=screenshot_pk)
+                Publication.objects.filter(pk__in=failed_ids).update(
+                    screenshot_failed=True, screenshot_attempts=F('screenshot_attempts') + 1,
+                    screenshot_retry_at=None)
+                for attempts, publication_ids in retry_ids.items():
+                    Publication.objects.filter(pk__in=publication_ids).update(
+                        screenshot_attempts=attempts + 1,
+                        screenshot_retry_at=now + SCREENSHOT_RETRY_BASE * 2 ** attempts)
+            # update() не отправляет сигналы — сбрасываем теги публикаций явно
+            cache.invalidate_tags('publication', *[object_tag(Publication, pk) for pk, _, _ in pending])
+            not_linked = len(failed_ids) + sum(map(len, retry_ids.values()))
+            linked += len(pending) - not_linked
+            failed += not_linked
+
+
+def thumbnail_etag(sha256, width):
+    return f'"{sha256}-{width}"'
@@ -1,35 +1,86 @@
 # app/serializers.py
 from rest_framework import serializers
-from .models import Profile, Publication
+from .models import Profile, Publication, Notification
+from .profiles import get_profile_summary
+from .screenshots import THUMBNAIL_WIDTHS
 from django.contrib.auth.models import User
 
 
+class SparseFieldsetMixin:
+    """
+    Оставляет в ответе только поля из параметра ?fields=a,b,c (если он передан).
+    Неизвестные имена полей игнорируются.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = requested_fields(self.context.get('request'))
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+def requested_fields(request):
+    """Множество полей из ?fields= или None, если параметр не передан"""
+    if request is None:
+        return None
+    param = request.query_params.get('fields')
+    if not param:
+        return None
+    return {name.strip() for name in param.split(',') if name.strip()}
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['username']
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer()
+    user_id = serializers.ReadOnlyField()
     achievements_count = serializers.SerializerMethodField()
     publications_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Profile
-        fields = ['first_name', 'last_name', 'age', 'is_private', 'star_rating', 'user', 'achievements_count',
-                  'publications_count']
+        fields = ['user_id', 'first_name', 'last_name', 'age', 'is_private', 'rating_score', 'user',
+                  'achievements_count', 'publications_count']
 
+    # Счётчики берутся из аннотаций queryset-а, если они есть, иначе из кэшированной сводки профиля
     def get_achievements_count(self, obj):
-        return obj.user.achievements.count()
+        if hasattr(obj, 'achievements_count'):
+            return obj.achievements_count
+        return get_profile_summary(obj.user_id)['achievements_count']
 
     def get_publications_count(self, obj):
-        return obj.user.publications.count()
+        if hasattr(obj, 'publications_count'):
+            return obj.publications_count
+        return get_profile_summary(obj.user_id)['publications_count']
 
 
-class PublicationSerializer(serializers.ModelSerializer):
+class PublicationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.username')
+    author_id = serializers.ReadOnlyField()
+    # boost_count и is_boosted аннотируются в queryset-е (см. PublicationViewSet)
+    boost_count = serializers.IntegerField(read_only=True)
+    is_boosted = serializers.BooleanField(read_only=True)
+    # URL WebP-миниатюр по ширине (None, пока скриншот не обработан)
+    thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = Publication
-        fields = '__all__'
\ No newline at end of file
+        fields = ['id', 'author_id', 'author', 'description', 'screenshot_id', 'target_1', 'target_2', 'target_3',
+                  'stop_loss', 'status', 'created_at', 'updated_at', 'views', 'unique_viewers', 'boost_count',
+                  'is_boosted', 'thumbnails']
+
+    def get_thumbnails(self, obj):
+        if obj.screenshot_image is None:
+            return None
+        return {str(width): obj.screenshot_image.thumbnail_url(width) for width in THUMBNAIL_WIDTHS}
+
+
+class NotificationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ['id', 'title', 'message', 'notification_type', 'link', 'is_read', 'created_at']
@@ -427,6 +427,79 @@ const TradeHub = {
         });
     },
 
+    /**
+     * Вход через Telegram WebApp: если страница открыта из бота, а сессии нет,
+     * отправляет initData на сервер одним запросом и перезагружает страницу уже с сессией.
+     */
+    async initTelegramLogin() {
+        const webApp = window.Telegram && window.Telegram.WebApp;
+        if (!webApp || !webApp.initData) return;
+        webApp.ready();
+        if (USER_IS_AUTHENTICATED || !TELEGRAM_LOGIN_API_URL) return;
+
+        try {
+            const response = await fetch(TELEGRAM_LOGIN_API_URL, {
+                method: 'POST',
+                headers: {
+                    'X-CSRFToken': this.getCsrfToken(),
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'Accept': 'application/json'
+                },
+                credentials: 'same-origin',
+                body: new URLSearchParams({ init_data: webApp.initData })
+            });
+            const data = await response.json();
+            if (data.status === 'ok') window.location.reload();
+        } catch (error) {
+            console.error('Telegram login error:', error);
+        }
+    },
+
+    /**
+     * Инициализирует кнопки подписки на авторов.
+     * Все кнопки одного автора на странице обновляются вместе.
+     */
+    initFollowButtons() {
+        document.body.addEventListener('click', async (e) => {
+            const button = e.target.closest('.follow-btn');
+            if (!button || button.classList.contains('processing') || !button.dataset.url) return;
+
+            button.classList.add('processing');
+            try {
+                const response = await fetch(button.dataset.url, {
+                    method: 'POST',
+                    headers: {
+                        'X-CSRFToken': this.getCsrfToken(),
+                        'Accept': 'application/json'
+                    },
+                    credentials: 'same-origin'
+                });
+
+                if (!response.ok) throw new Error('Network response was not ok');
+
+                const data = await response.json();
+                if (data.status !== 'ok') {
+                    this.showNotification(data.message || 'Ошибка', 'error');
+                    return;
+                }
+
+                document.querySelectorAll(`.follow-btn[data-author-id="${button.dataset.authorId}"]`).forEach(btn => {
+                    btn.classList.toggle('following', data.following);
+                    btn.textContent = data.following ? 'Вы подписаны' : 'Подписаться';
+                });
+                const counter = document.querySelector('.followers-count');
+                if (counter && typeof data.followers_count !== 'undefined') {
+                    counter.textContent = data.followers_count;
+                }
+            } catch (error) {
+                console.error('Follow error:', error);
+                this.showNotification('Не удалось выполнить действие.', 'error');
+            } finally {
+                button.classList.remove('processing');
+            }
+        });
+    },
+
     /**
      * Создает анимированные частицы при "бусте".
      * @param {HTMLElement} button - Элемент кнопки, от которой идет анимация.
@@ -472,6 +545,73 @@ const TradeHub = {
         });
     },
 
+    /**
+     * Инициализирует графики на странице статистики.
+     * Данные берутся из API дневных агрегатов (data-url контейнера).
+     */
+    initStatisticsCharts() {
+        const container = document.getElementById('statistics-charts');
+        if (!container) return;
+
+        const load = async (days) => {
+            try {
+                const response = await fetch(`${container.dataset.url}?days=${days}`, {
+                    headers: { 'Accept': 'application/json' },
+                    credentials: 'same-origin'
+                });
+                if (!response.ok) throw new Error('Network response was not ok');
+                const data = await response.json();
+
+                container.querySelectorAll('.chart-card').forEach(card => {
+                    const values = data.series[card.dataset.series] || [];
+                    this.renderBarChart(card.querySelector('.chart-canvas'), data.series.dates, values);
+                });
+            } catch (error) {
+                console.error('Statistics error:', error);
+                this.showNotification('Не удалось загрузить статистику.', 'error');
+            }
+        };
+
+        container.querySelectorAll('.filter-btn[data-days]').forEach(button => {
+            button.addEventListener('click', () => load(button.dataset.days));
+        });
+
+        load(30);
+    },
+
+    /**
+     * Рисует простую столбчатую диаграмму в SVG.
+     * @param {HTMLElement} target - Контейнер для графика.
+     * @param {string[]} dates - Подписи (даты в ISO-формате).
+     * @param {number[]} values - Значения по дням.
+     */
+    renderBarChart(target, dates, values) {
+        if (!target) return;
+        const total = values.reduce((sum, v) => sum + v, 0);
+        if (!total) {
+            target.innerHTML = '<p class="chart-empty">Нет данных за период</p>';
+            return;
+        }
+
+        const width = 600;
+        const height = 160;
+        const max = Math.max(...values);
+        const barWidth = width / values.length;
+
+        const bars = values.map((value, i) => {
+            const barHeight = Math.max((value / max) * (height - 4), value ? 2 : 0);
+            return `<rect class="chart-bar" x="${(i * barWidth).toFixed(2)}" y="${(height - barHeight).toFixed(2)}"
+                          width="${Math.max(barWidth - 1, 1).toFixed(2)}" height="${barHeight.toFixed(2)}">
+                        <title>${dates[i]}: ${value}</title>
+                    </rect>`;
+        }).join('');
+
+        target.innerHTML = `
+            <svg viewBox="0 0 ${width} ${height}" preserveAspectRatio="none">${bars}</svg>
+            <p class="chart-total">Всего за период: ${this.formatNumber(total)}</p>
+        `;
+    },
+
     /**
      * Инициализирует мобильное меню
      */
@@ -746,9 +886,12 @@ const TradeHub = {
 
         // Инициализируем все компоненты
         this.initTheme();
+        this.initTelegramLogin();
         this.initNotifications();
         this.initBoostButtons();
+        this.initFollowButtons();
         this.initFilterButtons();
+        this.initStatisticsCharts();
         this.initMobileMenu();
         this.initSmoothScrolling();
         this.initFormValidation();
@@ -0,0 +1,187 @@
+# app/static_assets.py
+"""
+Статика: имена с хэшем содержимого, предсжатые копии и отдача с вечным кэшем.
+
+manage.py collectstatic с CompressedManifestStaticFilesStorage копирует файлы в STATIC_ROOT,
+добавляет к именам хэш содержимого (styles.css → styles.3f2a1c….css), пишет манифест
+staticfiles.json и кладёт рядом сжатые копии .gz и .br текстовых файлов.
+{% static %} подставляет имена из манифеста.
+
+StaticAssetsRouter отдаёт STATIC_URL из STATIC_ROOT до Django: файлы с хэшем — с
+Cache-Control immutable на год (новое содержимое получит новое имя), остальные — с коротким
+кэшем; кодировка выбирается по Accept-Encoding (br, gzip или без сжатия).
+Без собранного манифеста (разработка) запросы уходят дальше, в Django.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import mimetypes
+import os
+import zlib
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.html', '.xml')
+# Меньшие файлы не сжимаем: выигрыш меньше заголовков
+MIN_COMPRESS_SIZE = 512
+# Сжатая копия сохраняется, только если она заметно меньше оригинала
+MAX_COMPRESSED_RATIO = 0.95
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+UNHASHED_CACHE_CONTROL = 'public, max-age=60'
+# Предпочтение при равных q в Accept-Encoding
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _compress(data):
+    """{'.gz': …, '.br': …} — только копии, которые заметно меньше оригинала"""
+    import brotli
+
+    copies = {
+        '.gz': gzip.compress(data, compresslevel=9, mtime=0),
+        '.br': brotli.compress(data, quality=11),
+    }
+    return {suffix: compressed for suffix, compressed in copies.items()
+            if len(compressed) <= len(data) * MAX_COMPRESSED_RATIO}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage, который после хэширования кладёт рядом .gz и .br"""
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # collectstatic ещё не запускался (разработка, тесты) — исходное имя
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = {*paths, *self.hashed_files.values()}
+        for name in sorted(names):
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS) or not self.exists(name):
+                continue
+            with self.open(name) as source:
+                data = source.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+            for suffix, compressed in _compress(data).items():
+                path = Path(self.path(name + suffix))
+                path.write_bytes(compressed)
+                yield name, name + suffix, True
+
+
+def _negotiate(accept_encoding, available):
+    """Кодировка из available (порядок ENCODINGS) с наибольшим q в Accept-Encoding или None"""
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    best, best_q = None, 0.0
+    for coding, _ in ENCODINGS:
+        q = weights.get(coding, weights.get('*', 0.0))
+        if coding in available and q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class StaticAssetsRouter:
+    """HTTP: STATIC_URL — из STATIC_ROOT с согласованием кодировки, остальное — в следующее приложение"""
+
+    def __init__(self, app):
+        self.app = app
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else f'/{settings.STATIC_URL}'
+        self.root = Path(settings.STATIC_ROOT) if getattr(settings, 'STATIC_ROOT', None) else None
+        self._index = None
+        self._index_lock = asyncio.Lock()
+        self._contents = {}
+
+    def _build_index(self):
+        """{имя: {'identity' | 'br' | 'gzip': путь}} и множество имён с хэшем из манифеста"""
+        manifest_path = self.root / ManifestStaticFilesStorage.manifest_name
+        if not manifest_path.is_file():
+            return None
+        hashed = set(json.loads(manifest_path.read_text(encoding='utf-8')).get('paths', {}).values())
+        files = {}
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = Path(directory) / filename
+                name = path.relative_to(self.root).as_posix()
+                for coding, suffix in ENCODINGS:
+                    if name.endswith(suffix):
+                        files.setdefault(name[:-len(suffix)], {})[coding] = path
+                        break
+                else:
+                    files.setdefault(name, {})['identity'] = path
+        files = {name: variants for name, variants in files.items() if 'identity' in variants}
+        return files, hashed
+
+    async def _get_index(self):
+        if self._index is None:
+            async with self._index_lock:
+                if self._index is None:
+                    index = await asyncio.to_thread(self._build_index) if self.root else None
+                    if index is None:
+                        logger.info('Манифест статики не найден — статику отдаёт Django')
+                    self._index = index or False
+        return self._index
+
+    async def _read(self, path):
+        # набор файлов статики ограничен сборкой — держим их в памяти
+        data = self._contents.get(path)
+        if data is None:
+            data = self._contents[path] = await asyncio.to_thread(path.read_bytes)
+        return data
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(self.prefix):
+            return await self.app(scope, receive, send)
+        index = await self._get_index()
+        if not index:
+            return await self.app(scope, receive, send)
+        files, hashed = index
+        name = scope['path'][len(self.prefix):]
+        variants = files.get(name)
+        if variants is None:
+            return await self._respond(send, 404, [(b'content-type', b'text/plain; charset=utf-8')], b'Not Found')
+        if scope['method'] not in ('GET', 'HEAD'):
+            return await self._respond(send, 405, [(b'allow', b'GET, HEAD')], b'')
+
+        request_headers = dict(scope['headers'])
+        coding = _negotiate(request_headers.get(b'accept-encoding', b'').decode('latin-1'), variants)
+        data = await self._read(variants[coding or 'identity'])
+        content_type, _ = mimetypes.guess_type(name)
+        content_type = content_type or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'image/svg+xml'):
+            content_type += '; charset=utf-8'
+        # одинаковый во всех процессах: hash() у bytes солится на процесс
+        etag = f'"{zlib.crc32(data):08x}-{len(data):x}-{coding or "identity"}"'.encode()
+        headers = [
+            (b'cache-control', (IMMUTABLE_CACHE_CONTROL if name in hashed else UNHASHED_CACHE_CONTROL).encode()),
+            (b'etag', etag),
+            (b'vary', b'Accept-Encoding'),
+        ]
+        if etag in [tag.strip() for tag in request_headers.get(b'if-none-match', b'').split(b',')]:
+            return await self._respond(send, 304, headers, b'')
+        headers += [(b'content-type', content_type.encode()), (b'content-length', str(len(data)).encode())]
+        if coding:
+            headers.append((b'content-encoding', coding.encode()))
+        await self._respond(send, 200, headers, b'' if scope['method'] == 'HEAD' else data)
+
+    @staticmethod
+    async def _respond(send, status, headers, body):
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
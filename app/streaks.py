@@ -0,0 +1,112 @@
+# app/streaks.py
+"""
+Серии ежедневных входов (Profile.login_streak).
+
+Первый за день запрос пользователя во всём кластере записывает день в
+Profile.last_seen_on условным UPDATE (только если там более ранняя дата).
+Кто первый, решает cache.shared.add() ключа дня — он удаётся одному процессу;
+дальнейшие запросы этого процесса проверяют лишь множество в памяти, а остальные
+процессы — один раз ключ в общем кэше. Если ключ вытеснен, UPDATE повторится
+и ничего не изменит. Отметка сразу попадает в БД, поэтому ночная задача видит
+отметки всех процессов, а перезапуск или смена дня их не теряет.
+Ночная задача process_login_streaks() несколькими UPDATE продлевает
+или сбрасывает серии сразу у всех профилей и выдаёт достижение «Активист».
+"""
+import datetime
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .achievements import award_achievement
+from .caching import cache
+from .models import Profile
+
+ACTIVIST_ACHIEVEMENT = 'Активист'
+ACTIVIST_STREAK_DAYS = 50
+# ключ дня в общем кэше переживает сам день — запросы около полуночи его ещё застанут
+SEEN_KEY_TIMEOUT = 2 * 24 * 60 * 60
+
+_lock = threading.Lock()
+_seen_day = None
+_written = set()    # уже записаны сегодня этим процессом
+
+
+def _due_day(user_id):
+    """День, который пора записать пользователю, или None, если процесс уже отметил его"""
+    global _seen_day, _written
+    day = timezone.localdate()
+    with _lock:
+        if day != _seen_day:
+            _seen_day = day
+            _written = set()
+        return None if user_id in _written else day
+
+
+def _remember(user_id, day):
+    with _lock:
+        if day == _seen_day:
+            _written.add(user_id)
+
+
+def _write_seen(user_id, day):
+    key = f'seen:{day.isoformat()}:{user_id}'
+    if not cache.shared.add(key, 1, SEEN_KEY_TIMEOUT):
+        # день уже записал другой процесс
+        return _remember(user_id, day)
+    try:
+        # Только вперёд: повторная или запоздалая запись не затирает более свежую дату
+        Profile.objects.filter(user_id=user_id).exclude(last_seen_on__gte=day).update(
+            previous_seen_on=F('last_seen_on'), last_seen_on=day
+        )
+    except Exception:
+        # запись не удалась — день запишет следующий запрос
+        cache.shared.delete(key)
+        raise
+    _remember(user_id, day)
+
+
+def mark_seen(user_id):
+    """Отмечает, что пользователь был активен сегодня"""
+    day = _due_day(user_id)
+    if day is not None:
+        _write_seen(user_id, day)
+
+
+async def amark_seen(user_id):
+    """mark_seen() для асинхронного кода: в пул потоков — только первая за день запись в БД"""
+    day = _due_day(user_id)
+    if day is not None:
+        await sync_to_async(_write_seen)(user_id, day)
+
+
+def process_login_streaks(day=None):
+    """
+    Обновляет серии входов за день day (по умолчанию — вчера) для всех профилей.
+    Рассчитан на ежедневный запуск после полуночи.
+    Возвращает количество продлённых, начатых и сброшенных серий и выданных достижений.
+    """
+    if day is None:
+        day = timezone.localdate() - datetime.timedelta(days=1)
+    previous_day = day - datetime.timedelta(days=1)
+    seen_on_day = Q(last_seen_on=day) | Q(previous_seen_on=day)
+
+    with transaction.atomic():
+        extended = Profile.objects.filter(seen_on_day, last_login_streak_check=previous_day).update(
+            login_streak=F('login_streak') + 1, last_login_streak_check=day
+        )
+        started = Profile.objects.filter(seen_on_day).exclude(last_login_streak_check__gte=day).update(
+            login_streak=1, last_login_streak_check=day
+        )
+        reset = Profile.objects.filter(login_streak__gt=0).exclude(last_login_streak_check__gte=day).update(
+            login_streak=0
+        )
+
+    candidates = Profile.objects.filter(login_streak__gte=ACTIVIST_STREAK_DAYS).exclude(
+        user__achievements__achievement__name=ACTIVIST_ACHIEVEMENT
+    ).values_list('user_id', flat=True)
+    awarded = award_achievement(ACTIVIST_ACHIEVEMENT, candidates)
+
+    return {'extended': extended, 'started': started, 'reset': reset, 'awarded': awarded}
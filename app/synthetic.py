@@ -0,0 +1,228 @@
+# app/synthetic.py
+"""
+Синтетические данные в объёмах, близких к боевым (manage.py generate_dataset).
+
+Пользователи, профили, подписки, публикации, бусты, уведомления и сообщения чата
+вставляются bulk_create пачками по chunk_size, в обход сигналов; всё, что обычно
+поддерживают сигналы (профили, роль Trader, статистика, счётчики подписок), заполняется
+здесь же отдельными запросами. Распределения с длинным хвостом: немногие авторы
+собирают большую часть подписок и бустов, как на живой площадке.
+Имена пользователей — SYNTHETIC_PREFIX<n>; повторный запуск добавляет новых.
+"""
+import datetime
+import itertools
+import random
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ChatMessage, Notification, Profile, Publication, UserStatistics
+from .profiles import count_subquery
+
+SYNTHETIC_PREFIX = 'synth_'
+CHUNK_SIZE = 1000
+HISTORY_DAYS = 365
+
+TICKERS = ('BTC', 'ETH', 'SOL', 'TON', 'XRP', 'SBER', 'GAZP', 'LKOH', 'YNDX', 'AAPL', 'TSLA', 'NVDA')
+WORDS = ('пробой', 'уровень', 'поддержка', 'сопротивление', 'объём', 'тренд', 'коррекция', 'дивергенция',
+         'отскок', 'консолидация', 'импульс', 'ретест', 'флаг', 'треугольник', 'накопление', 'выход')
+STATUS_WEIGHTS = {
+    Publication.StatusChoices.ACTIVE: 6,
+    Publication.StatusChoices.TARGET_HIT: 2,
+    Publication.StatusChoices.STOP_HIT: 2,
+    Publication.StatusChoices.CANCELED: 1,
+}
+
+Follow = Profile.subscribed_to.through
+Boost = Publication.boosts.through
+
+
+@contextmanager
+def _explicit_dates(model, *field_names):
+    """Отключает auto_now/auto_now_add у полей модели, чтобы bulk_create сохранил заданные даты"""
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class DatasetGenerator:
+    """Генерирует связанные данные; методы вызываются по порядку из generate_dataset()"""
+
+    def __init__(self, seed=None, chunk_size=CHUNK_SIZE):
+        self.random = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.now = timezone.now()
+        self._zipf = {}
+
+    def _bulk_create(self, model, objects):
+        for chunk in _chunks(objects, self.chunk_size):
+            model.objects.bulk_create(chunk)
+        return len(objects)
+
+    def moment(self, after=None):
+        """Случайный момент за последние HISTORY_DAYS дней (не раньше after), чаще недавний"""
+        start = after or self.now - datetime.timedelta(days=HISTORY_DAYS)
+        span = (self.now - start).total_seconds()
+        return start + datetime.timedelta(seconds=span * (1 - self.random.random() ** 3))
+
+    def popular(self, items, k):
+        """k элементов с повторами; первые в items выбираются чаще (закон Ципфа)"""
+        cum_weights = self._zipf.get(len(items))
+        if cum_weights is None:
+            cum_weights = self._zipf[len(items)] = list(itertools.accumulate(
+                1 / (rank + 1) for rank in range(len(items))))
+        return self.random.choices(items, cum_weights=cum_weights, k=k)
+
+    def pick_popular(self, items, k):
+        """До k различных элементов, популярные чаще"""
+        return set(self.popular(items, k))
+
+    def text(self, words):
+        return ' '.join(self.random.choice(WORDS) for _ in range(words))
+
+    def users(self, count):
+        """Пользователи с профилями, статистикой и ролью Trader; возвращает [(user_id, date_joined)]"""
+        first = User.objects.filter(username__startswith=SYNTHETIC_PREFIX).count()
+        password = make_password(None)  # вход по паролю невозможен
+        users = [
+            User(username=f'{SYNTHETIC_PREFIX}{first + index}', password=password, date_joined=self.moment())
+            for index in range(count)
+        ]
+        self._bulk_create(User, users)
+
+        rows = []
+        for chunk in _chunks([user.username for user in users], self.chunk_size):
+            rows.extend(User.objects.filter(username__in=chunk).values_list('pk', 'date_joined'))
+        rows.sort()
+
+        trader, _ = Group.objects.get_or_create(name='Trader')
+        self._bulk_create(Profile, [
+            Profile(user_id=user_id, rating_score=min(int(self.random.paretovariate(1.2) * 10), 100000),
+                    login_streak=self.random.randint(0, 60))
+            for user_id, _ in rows
+        ])
+        self._bulk_create(UserStatistics, [UserStatistics(user_id=user_id) for user_id, _ in rows])
+        self._bulk_create(User.groups.through, [
+            User.groups.through(user_id=user_id, group_id=trader.pk) for user_id, _ in rows
+        ])
+        return rows
+
+    def follows(self, user_ids, per_user):
+        """Подписки: на популярных авторов подписываются чаще; счётчики пересчитываются"""
+        profile_ids = {}
+        for chunk in _chunks(user_ids, self.chunk_size):
+            profile_ids.update(Profile.objects.filter(user_id__in=chunk).values_list('user_id', 'pk'))
+
+        links = []
+        for user_id in user_ids:
+            targets = self.pick_popular(user_ids, per_user) - {user_id}
+            links.extend(Follow(profile_id=profile_ids[user_id], user_id=target) for target in targets)
+        self._bulk_create(Follow, links)
+
+        for chunk in _chunks(user_ids, self.chunk_size):
+            Profile.objects.filter(user_id__in=chunk).update(
+                following_count=count_subquery(Follow, 'profile'),
+                followers_count=count_subquery(Follow, 'user', 'user_id'),
+            )
+        return len(links)
+
+    def publications(self, user_ids, joined, count):
+        """Публикации, чаще у популярных авторов; возвращает [(publication_id, author_id)]"""
+        last_pk = Publication.objects.aggregate(last=Max('pk'))['last'] or 0
+        authors = self.popular(user_ids, count)
+        statuses, weights = zip(*STATUS_WEIGHTS.items())
+        publications = []
+        for author_id in authors:
+            created_at = self.moment(after=joined[author_id])
+            ticker = self.random.choice(TICKERS)
+            price = round(self.random.uniform(1, 1000), 2)
+            publications.append(Publication(
+                author_id=author_id,
+                description=f'{ticker}: {self.text(self.random.randint(8, 40))}',
+                target_1=str(round(price * 1.05, 2)),
+                target_2=str(round(price * 1.1, 2)),
+                stop_loss=str(round(price * 0.95, 2)),
+                status=self.random.choices(statuses, weights)[0],
+                views=min(int(self.random.paretovariate(1.1) * 20), 100000),
+                created_at=created_at,
+                updated_at=created_at,
+            ))
+        with _explicit_dates(Publication, 'created_at', 'updated_at'):
+            self._bulk_create(Publication, publications)
+
+        rows = list(Publication.objects.filter(pk__gt=last_pk).values_list('pk', 'author_id').iterator())
+        for chunk in _chunks(sorted(set(authors)), self.chunk_size):
+            UserStatistics.objects.filter(user_id__in=chunk).update(
+                total_publications=count_subquery(Publication, 'author', 'user_id'))
+        return rows
+
+    def boosts(self, publication_rows, user_ids, per_publication):
+        """Бусты: число на публикацию распределено экспоненциально, бустят популярные пользователи"""
+        links = []
+        for publication_id, author_id in publication_rows:
+            k = min(len(user_ids), int(self.random.expovariate(1 / per_publication))) if per_publication else 0
+            links.extend(Boost(publication_id=publication_id, user_id=user_id)
+                         for user_id in self.pick_popular(user_ids, k) - {author_id})
+        return self._bulk_create(Boost, links)
+
+    def notifications(self, user_rows, per_user):
+        """Уведомления всех типов; старые в основном прочитаны"""
+        types = Notification.NotificationTypes.values
+        unread_after = self.now - datetime.timedelta(days=7)
+        notifications = []
+        for user_id, date_joined in user_rows:
+            for _ in range(self.random.randint(0, 2 * per_user)):
+                created_at = self.moment(after=date_joined)
+                notifications.append(Notification(
+                    user_id=user_id,
+                    title=self.text(3)[:100],
+                    message=self.text(12)[:255],
+                    notification_type=self.random.choice(types),
+                    is_read=created_at < unread_after or self.random.random() < 0.5,
+                    created_at=created_at,
+                ))
+        with _explicit_dates(Notification, 'created_at'):
+            return self._bulk_create(Notification, notifications)
+
+    def chat_messages(self, user_ids, count):
+        messages = []
+        for author_id in self.popular(user_ids, count):
+            timestamp = self.moment()
+            messages.append(ChatMessage(author_id=author_id, content=self.text(self.random.randint(2, 20)),
+                                        timestamp=timestamp, updated_at=timestamp))
+        with _explicit_dates(ChatMessage, 'timestamp', 'updated_at'):
+            return self._bulk_create(ChatMessage, messages)
+
+
+def generate_dataset(users=1000, publications=5000, follows_per_user=20, boosts_per_publication=10,
+                     notifications_per_user=20, chat_messages=5000, seed=None, chunk_size=CHUNK_SIZE):
+    """Генерирует набор данных; возвращает {сущность: число созданных строк}"""
+    generator = DatasetGenerator(seed, chunk_size)
+    user_rows = generator.users(users)
+    # порядок перемешан, чтобы популярность не совпадала с датой регистрации
+    user_ids = [user_id for user_id, _ in user_rows]
+    generator.random.shuffle(user_ids)
+
+    publication_rows = generator.publications(user_ids, dict(user_rows), publications) if user_ids else []
+    return {
+        'users': len(user_rows),
+        'follows': generator.follows(user_ids, follows_per_user) if user_ids else 0,
+        'publications': len(publication_rows),
+        'boosts': generator.boosts(publication_rows, user_ids, boosts_per_publication),
+        'notifications': generator.notifications(user_rows, notifications_per_user),
+        'chat_messages': generator.chat_messages(user_ids, chat_messages) if user_ids else 0,
+    }
@@ -0,0 +1,201 @@
+# app/tasks.py
+"""
+Фоновая очередь задач в БД: побочные эффекты записей выполняются вне запроса.
+
+enqueue() пишет строку Task в текущей транзакции: задача фиксируется вместе с изменением,
+которое её вызвало (сбой процесса после COMMIT её не потеряет), при откате не появится,
+а обработчик увидит её только вместе с зафиксированными данными.
+Обработчик (python manage.py run_tasks, процессов может быть несколько) за проход:
+- захватывает до FETCH_BATCH_SIZE готовых задач арендой — next_attempt_at сдвигается на
+  LEASE_SECONDS вперёд, locked_by — id обработчика; задачи упавшего обработчика
+  вернутся в очередь, когда аренда истечёт;
+- выполняет задачи одного типа пачкой до BATCH_SIZE: обработчик получает список
+  параметров и выполняется в одной транзакции с удалением задач;
+- если пачка упала — выполняет её задачи по одной, чтобы ошибка одной не держала остальные;
+  упавшая задача повторяется с экспоненциальной задержкой, после MAX_ATTEMPTS попыток
+  (или если обработчика нет) переносится в FailedTask.
+
+Обработчики регистрируются декоратором @task('имя') и должны принимать список
+параметров (словарей, переданных в enqueue).
+"""
+import logging
+import time
+import traceback
+import uuid
+from collections import Counter, defaultdict
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import cache, user_tag
+from .models import FailedTask, Notification, Publication, Task, UserStatistics
+from .profiles import invalidate_profile_summary
+from .replicas import use_primary
+
+logger = logging.getLogger(__name__)
+
+FETCH_BATCH_SIZE = 1000     # задач за один проход
+BATCH_SIZE = 1000           # задач в одном вызове обработчика (и в одном IN-списке — лимит MSSQL)
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 5            # секунд; задержка перед n-й повторной попыткой — BACKOFF_BASE * 2**(n-1)
+IDLE_INTERVAL = 1.0
+
+_handlers = {}
+
+
+def task(name):
+    """Регистрирует обработчик пачки задач name"""
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, **payload):
+    """Ставит задачу в очередь в текущей транзакции (вне транзакции — сразу)"""
+    Task.objects.create(name=name, payload=payload)
+
+
+def requeue_failed(failed_tasks):
+    """Возвращает невыполненные задачи в очередь с обнулённым счётчиком попыток"""
+    failed_tasks = list(failed_tasks)
+    with transaction.atomic():
+        Task.objects.bulk_create([Task(name=failed.name, payload=failed.payload) for failed in failed_tasks])
+        FailedTask.objects.filter(pk__in=[failed.pk for failed in failed_tasks]).delete()
+    return len(failed_tasks)
+
+
+class TaskWorker:
+    """Обработчик очереди Task"""
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+
+    def claim(self, limit=FETCH_BATCH_SIZE):
+        """Захватывает готовые задачи; возвращает их в порядке постановки"""
+        now = timezone.now()
+        due_ids = list(Task.objects.filter(next_attempt_at__lte=now).order_by('pk').values_list('pk', flat=True)[:limit])
+        if not due_ids:
+            return []
+        # условие по next_attempt_at повторяется: задачу мог захватить другой обработчик
+        Task.objects.filter(pk__in=due_ids, next_attempt_at__lte=now).update(
+            next_attempt_at=now + timezone.timedelta(seconds=LEASE_SECONDS), locked_by=self.worker_id,
+        )
+        return list(
+            Task.objects.filter(pk__in=due_ids, locked_by=self.worker_id)
+            .order_by('pk').values('pk', 'name', 'payload', 'attempts', 'created_at')
+        )
+
+    def execute(self, name, tasks):
+        """Выполняет задачи одного типа пачкой, при ошибке — по одной"""
+        handler = _handlers.get(name)
+        if handler is None:
+            for claimed in tasks:
+                self._fail(claimed, f'Нет обработчика задачи {name}', dead=True)
+            return
+        try:
+            with transaction.atomic():
+                handler([claimed['payload'] for claimed in tasks])
+                Task.objects.filter(pk__in=[claimed['pk'] for claimed in tasks], locked_by=self.worker_id).delete()
+        except Exception:
+            if len(tasks) > 1:
+                for claimed in tasks:
+                    self.execute(name, [claimed])
+                return
+            logger.exception('Задача %s #%s не выполнена', name, tasks[0]['pk'])
+            self._fail(tasks[0], traceback.format_exc())
+
+    def _fail(self, claimed, error, dead=False):
+        attempts = claimed['attempts'] + 1
+        queued = Task.objects.filter(pk=claimed['pk'], locked_by=self.worker_id)
+        if dead or attempts >= MAX_ATTEMPTS:
+            with transaction.atomic():
+                FailedTask.objects.create(name=claimed['name'], payload=claimed['payload'], attempts=attempts,
+                                          last_error=error, created_at=claimed['created_at'])
+                queued.delete()
+            return
+        delay = timezone.timedelta(seconds=BACKOFF_BASE * 2 ** (attempts - 1))
+        queued.update(attempts=attempts, next_attempt_at=timezone.now() + delay, locked_by='',
+                      last_error=error.strip().splitlines()[-1][:255])
+
+    def run_once(self):
+        """Один проход: захват и выполнение пачки задач; возвращает число задач"""
+        claimed = self.claim()
+        by_name = defaultdict(list)
+        for item in claimed:
+            by_name[item['name']].append(item)
+        for name, tasks in by_name.items():
+            for start in range(0, len(tasks), BATCH_SIZE):
+                self.execute(name, tasks[start:start + BATCH_SIZE])
+        return len(claimed)
+
+    def run(self, until_idle=False):
+        """Обрабатывает очередь; при until_idle=True завершается, когда задач нет"""
+        # очередь читается из основной базы: на реплике задачи появляются с задержкой
+        with use_primary():
+            while True:
+                processed = self.run_once()
+                if processed:
+                    logger.info('Выполнено задач: %s', processed)
+                    continue
+                if until_idle:
+                    return
+                time.sleep(IDLE_INTERVAL)
+
+
+# === Обработчики ===
+
+@task('count_publication')
+def count_publications(payloads):
+    """Статистика авторов: +1 публикация на задачу (параметр user_id)"""
+    counts = Counter(payload['user_id'] for payload in payloads)
+    existing = set(UserStatistics.objects.filter(user_id__in=counts).values_list('user_id', flat=True))
+    UserStatistics.objects.bulk_create(
+        [UserStatistics(user_id=user_id) for user_id in counts if user_id not in existing], ignore_conflicts=True,
+    )
+    by_delta = defaultdict(list)
+    for user_id, delta in counts.items():
+        by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        UserStatistics.objects.filter(user_id__in=user_ids).update(total_publications=F('total_publications') + delta)
+    # update() не отправляет сигналы
+    invalidate_profile_summary(*counts)
+
+
+def _create_notifications(notifications):
+    Notification.objects.bulk_create(notifications)
+    # bulk_create не отправляет сигналы
+    cache.invalidate_tags('notification', *{user_tag(notification.user_id, 'notifications')
+                                            for notification in notifications})
+
+
+@task('create_notification')
+def create_notifications(payloads):
+    """Уведомления с полями модели Notification (user_id, title, message, notification_type, link)"""
+    _create_notifications([Notification(**payload) for payload in payloads])
+
+
+@task('notify_boost')
+def notify_boosts(payloads):
+    """Уведомления авторам о бустах (параметры publication_id, user_id); свои бусты не уведомляются"""
+    authors = dict(Publication.objects.filter(
+        pk__in={payload['publication_id'] for payload in payloads}).values_list('pk', 'author_id'))
+    usernames = dict(User.objects.filter(
+        pk__in={payload['user_id'] for payload in payloads}).values_list('pk', 'username'))
+    _create_notifications([
+        Notification(
+            user_id=authors[payload['publication_id']],
+            title="Ваша публикация получила буст",
+            message=f"@{usernames[payload['user_id']]} поддержал(а) вашу публикацию",
+            notification_type=Notification.NotificationTypes.BOOST,
+            link=f"/publication/{payload['publication_id']}/",
+        )
+        for payload in payloads
+        # публикацию или пользователя могли удалить, пока задача ждала
+        if payload['publication_id'] in authors and payload['user_id'] in usernames
+        and authors[payload['publication_id']] != payload['user_id']
+    ])
+
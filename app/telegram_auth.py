@@ -0,0 +1,104 @@
+# app/telegram_auth.py
+"""
+Вход из Telegram WebApp по initData.
+
+WebApp передаёт странице строку initData, подписанную ботом: подпись проверяется
+HMAC-SHA256 с ключом HMAC_SHA256("WebAppData", токен бота), см. документацию Bot API.
+Пользователь находится одним запросом по уникальному индексу Profile.telegram_id — только
+если привязка подтверждена initData (Profile.telegram_verified). Неподтверждённый telegram_id
+(из старой формы регистрации) входа не даёт: при первом входе владельца Telegram он
+освобождается, а пользователь и профиль создаются в одной транзакции.
+"""
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import parse_qsl
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from .models import Profile
+
+INIT_DATA_MAX_AGE = 24 * 60 * 60
+
+
+class InitDataError(ValueError):
+    """initData не прошла проверку"""
+
+
+def verify_init_data(init_data, bot_token, max_age=INIT_DATA_MAX_AGE):
+    """Проверяет подпись и срок initData; возвращает словарь user из неё"""
+    try:
+        fields = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=True))
+    except ValueError:
+        raise InitDataError('Некорректный формат initData')
+    received_hash = fields.pop('hash', '')
+
+    data_check_string = '\n'.join(f'{key}={value}' for key, value in sorted(fields.items()))
+    secret_key = hmac.new(b'WebAppData', bot_token.encode(), hashlib.sha256).digest()
+    expected_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected_hash, received_hash):
+        raise InitDataError('Неверная подпись initData')
+
+    try:
+        auth_date = int(fields['auth_date'])
+        user = json.loads(fields['user'])
+        user['id'] = int(user['id'])
+    except (KeyError, TypeError, ValueError):
+        raise InitDataError('В initData нет данных пользователя')
+    if time.time() - auth_date > max_age:
+        raise InitDataError('initData устарела')
+    return user
+
+
+def _find_user(telegram_id):
+    return User.objects.select_related('profile').filter(
+        profile__telegram_id=telegram_id, profile__telegram_verified=True).first()
+
+
+def _username_candidates(tg_user):
+    """Имя из Telegram, если оно свободно, затем гарантированно уникальное tg<id>"""
+    username = tg_user.get('username')
+    if username and not User.objects.filter(username__iexact=username).exists():
+        yield username
+    yield f"tg{tg_user['id']}"
+
+
+def _create_user(tg_user, username):
+    with transaction.atomic():
+        # неподтверждённая привязка того же telegram_id у другого профиля — не владельца
+        Profile.objects.filter(telegram_id=tg_user['id'], telegram_verified=False).update(telegram_id=None)
+        user = User.objects.create_user(username)  # без пароля: вход только через Telegram
+        # профиль уже создан сигналом post_save; меняем сам объект user.profile,
+        # иначе сигнал при следующем user.save() перезапишет поля устаревшей копией
+        profile = user.profile
+        profile.telegram_id = tg_user['id']
+        profile.telegram_verified = True
+        profile.first_name = (tg_user.get('first_name') or '')[:100]
+        profile.last_name = (tg_user.get('last_name') or '')[:100]
+        profile.save(update_fields=['telegram_id', 'telegram_verified', 'first_name', 'last_name'])
+    return user
+
+
+def get_or_create_telegram_user(tg_user):
+    """Пользователь с telegram_id из initData (создаётся при первом входе); возвращает (user, created)"""
+    telegram_id = tg_user['id']
+    user = _find_user(telegram_id)
+    created = False
+
+    if user is None:
+        for username in _username_candidates(tg_user):
+            try:
+                user = _create_user(tg_user, username)
+                created = True
+                break
+            except IntegrityError:
+                # имя заняли одновременно с нами или тот же пользователь вошёл параллельно
+                user = _find_user(telegram_id)
+                if user is not None:
+                    break
+        else:
+            raise InitDataError('Не удалось создать пользователя')
+
+    return user, created
@@ -0,0 +1,51 @@
+# app/telegram_bot.py
+"""
+Обработчики бота и сборка telegram.ext.Application.
+
+Общие для long polling (bot.py) и webhook-режима внутри ASGI-приложения (app/webhook.py).
+Модуль не обращается к Django, поэтому bot.py импортирует его без настройки проекта.
+"""
+import logging
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
+from telegram.ext import Application, CommandHandler, ContextTypes
+
+logger = logging.getLogger(__name__)
+
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Отправляет сообщение с кнопкой для запуска Web App.
+    """
+    user = update.effective_user
+    logger.info(f"User {user.username} ({user.id}) started the bot.")
+
+    # Создаем кнопку, которая открывает ваше веб-приложение
+    keyboard = [
+        [InlineKeyboardButton(
+            "🚀 Открыть приложение TradeHub",
+            web_app=WebAppInfo(url=context.bot_data['webapp_url'])
+        )]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+
+    await update.message.reply_text(
+        "👋 Добро пожаловать в TradeHub!\n\nНажмите кнопку ниже, чтобы запустить приложение.",
+        reply_markup=reply_markup
+    )
+
+
+def build_application(token, webapp_url, api_url=None, with_updater=True):
+    """
+    Application с зарегистрированными обработчиками.
+    with_updater=False — без long polling: обновления передаются в process_update() извне.
+    """
+    builder = Application.builder().token(token)
+    if api_url:
+        builder = builder.base_url(f"{api_url.rstrip('/')}/bot")
+    if not with_updater:
+        builder = builder.updater(None)
+    application = builder.build()
+    application.bot_data['webapp_url'] = webapp_url
+    application.add_handler(CommandHandler("start", start))
+    return application
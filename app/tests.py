@@ -1,3 +1,1332 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import hashlib
+import hmac
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlsplit
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, Group, Permission, User
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count
+from django.http import HttpResponse
+from django.template.loader import get_template
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import reach, replicas, streaks, tasks
+from .achievements import award_achievement
+from .analytics import rollup_daily_statistics
+from .follows import get_followed_ids, get_mutual_follow_ids, toggle_follow
+from .fragments import leaderboard_rows, publication_cards
+from .broadcast import BroadcastSender, ChatBatch, claim_due_messages, save_results
+from .caching import cache, object_tag
+from .education import RENDERER_VERSION, render_markdown, rerender_materials
+from .instrumentation import QueryBudgetTestMixin
+from .profiles import PROFILE_PUBLICATIONS_PER_PAGE, get_profile_summary
+from .recommendations import build_recommendations
+from .models import (
+    Achievement, DailyStatistics, EducationalMaterial, FailedTask, MarketOverview, Notification, OutboxMessage, Profile, Publication, PublicationBoost,
+    Recommendation, RollupWatermark, Screenshot, Task, ViewerSketch,
+)
+from .roles import MODERATOR, TRADER, get_roles
+from .screenshots import (
+    SCREENSHOT_MAX_ATTEMPTS, THUMBNAIL_CACHE_CONTROL, THUMBNAIL_WIDTHS, ScreenshotError, ScreenshotRejected,
+    _check_public_address, download, ingest_screenshots, render_thumbnails, store_original, thumbnail_etag,
+    thumbnail_path,
+)
+from .static_assets import IMMUTABLE_CACHE_CONTROL, UNHASHED_CACHE_CONTROL, StaticAssetsRouter, _negotiate
+from .telegram_auth import InitDataError, verify_init_data
+from .videos import refresh_video_metadata
+from .webhook import TelegramWebhook
+
+
+def start_stub_server(test, handler):
+    """Локальный HTTP-сервер с обработчиком handler на время теста; возвращает его адрес"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    test.addCleanup(server.server_close)
+    test.addCleanup(server.shutdown)
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+class CacheIsolationMixin:
+    """Кэш процесса и общий кэш не переживают тест: версии тегов и фрагменты начинаются с нуля"""
+
+    def setUp(self):
+        super().setUp()
+        cache.local.clear()
+        cache.shared.clear()
+
+
+class QueryBudgetTests(CacheIsolationMixin, QueryBudgetTestMixin, TestCase):
+    """Горячие страницы и API укладываются в объявленный бюджет запросов и с пустым, и с прогретым кэшем"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader')
+        authors = [User.objects.create_user(f'author{n}') for n in range(5)]
+        for n in range(30):
+            publication = Publication.objects.create(author=authors[n % 5], description=f'Идея {n}',
+                                                     target_1='1', stop_loss='2')
+            publication.boosts.add(*authors[:n % 4])
+        Notification.objects.bulk_create(
+            Notification(user=cls.user, title=f'Уведомление {n}', message='текст') for n in range(5))
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_pages(self):
+        for url in ('/', '/publications/', '/publications/?filter=trending', '/profile/', '/profile/author1/',
+                    '/leaderboard/', '/notifications/'):
+            for attempt in ('cold', 'warm'):
+                with self.subTest(url=url, cache=attempt):
+                    response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertWithinQueryBudget(response)
+
+    async def test_notification_apis(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        for url in ('/api/notifications/', '/api/notifications/unread-count/'):
+            for attempt in ('cold', 'warm'):
+                with self.subTest(url=url, cache=attempt):
+                    response = await client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertWithinQueryBudget(response)
+
+
+class RestApiTests(CacheIsolationMixin, TestCase):
+    """REST API /api/v1/: курсор по рейтингу, ?fields=, bulk и число запросов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader')
+        cls.authors = [User.objects.create_user(f'author{n}') for n in range(12)]
+        for n, author in enumerate(cls.authors):
+            # повторяющиеся рейтинги: страницы различают их по id
+            Profile.objects.filter(user=author).update(rating_score=n // 4 * 10)
+            for k in range(2):
+                publication = Publication.objects.create(author=author, description=f'Идея {n}.{k}',
+                                                         target_1='1', stop_loss='2')
+                publication.boosts.add(*cls.authors[:k])
+        Notification.objects.bulk_create(
+            Notification(user=cls.user, title=f'Уведомление {n}', message='текст') for n in range(6))
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def walk(self, url, link='next'):
+        pages = []
+        while url:
+            data = self.client.get(url).json()
+            pages.append([row['user_id'] for row in data['results']])
+            url = data[link]
+        return pages
+
+    def test_rating_pages_are_keyset(self):
+        pages = self.walk('/api/v1/profiles/?page_size=5&fields=user_id')
+        visited = [user_id for page in pages for user_id in page]
+        expected = list(Profile.objects.order_by('-rating_score', '-id').values_list('user_id', flat=True))
+        self.assertEqual(visited, expected)
+        self.assertEqual([len(page) for page in pages], [5, 5, 3])
+
+        # рейтинг профиля со второй страницы вырос после чтения первой — остальные не повторяются
+        first = self.client.get('/api/v1/profiles/?page_size=5&fields=user_id').json()
+        Profile.objects.filter(user_id=expected[7]).update(rating_score=1000)
+        rest = self.walk(first['next'])
+        seen = [row['user_id'] for row in first['results']] + [user_id for page in rest for user_id in page]
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(set(seen), set(expected) - {expected[7]})
+
+    def test_rating_previous_link(self):
+        first = self.client.get('/api/v1/profiles/?page_size=5&fields=user_id').json()
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+        self.assertEqual(self.client.get('/api/v1/profiles/?cursor=cD1ub25l').status_code, 404)
+
+    def test_sparse_fieldsets(self):
+        row = self.client.get('/api/v1/publications/?fields=id,author,boost_count').json()['results'][0]
+        self.assertEqual(set(row), {'id', 'author', 'boost_count'})
+        row = self.client.get('/api/v1/profiles/?fields=user_id,unknown').json()['results'][0]
+        self.assertEqual(set(row), {'user_id'})
+        self.assertIn('publications_count', self.client.get('/api/v1/profiles/').json()['results'][0])
+
+    def test_bulk(self):
+        publications = list(Publication.objects.order_by('pk').values_list('pk', flat=True)[:3])
+        ids = [publications[2], 0, publications[0], publications[2]]
+        response = self.client.get('/api/v1/publications/bulk/', {'ids': ','.join(map(str, ids))})
+        self.assertEqual([row['id'] for row in response.json()['results']], [publications[2], publications[0]])
+
+        users = [self.authors[3].pk, self.authors[1].pk]
+        response = self.client.get('/api/v1/profiles/bulk/', {'ids': f'{users[0]},{users[1]}'})
+        self.assertEqual([row['user_id'] for row in response.json()['results']], users)
+
+        self.assertEqual(self.client.get('/api/v1/publications/bulk/?ids=1,x').status_code, 400)
+        too_many = ','.join(str(n) for n in range(1, 102))
+        self.assertEqual(self.client.get('/api/v1/publications/bulk/', {'ids': too_many}).status_code, 400)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        full = {}
+        for url in ('/api/v1/publications/', '/api/v1/profiles/', '/api/v1/notifications/'):
+            counts = []
+            for page_size in (2, 6):
+                with self.subTest(url=url, page_size=page_size), CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, {'page_size': page_size})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.json()['results']), page_size)
+                counts.append(len(queries))
+            self.assertEqual(counts[0], counts[1], url)
+            full[url] = counts[0]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/v1/profiles/', {'page_size': 6, 'fields': 'user_id,publications_count'})
+        # счётчики, которых нет в ?fields=, не считаются и из сводки профиля не добираются
+        self.assertEqual(len(queries), full['/api/v1/profiles/'])
+
+
+class CacheInvalidationTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user('author')
+        self.publication = Publication.objects.create(author=self.author, description='d', target_1='1',
+                                                      stop_loss='2')
+
+    def test_save_and_boost_bump_tags(self):
+        tags = ('publication', object_tag(Publication, self.publication.pk))
+        cache.set('card', 1, tags=tags)
+        before = cache.tag_versions(*tags)
+        self.publication.save()
+        self.assertIsNone(cache.get('card'))
+        after_save = cache.tag_versions(*tags)
+        self.assertTrue(all(after_save[tag] != before[tag] for tag in tags))
+        self.publication.boosts.add(self.author)
+        self.assertTrue(all(cache.tag_versions(*tags)[tag] != after_save[tag] for tag in tags))
+
+    def test_uncached_models_are_fast_deleted(self):
+        self.publication.boosts.add(self.author)
+        Task.objects.bulk_create([Task(name='noop') for _ in range(3)])
+        # без слушателей post_delete — один DELETE без загрузки строк
+        with self.assertNumQueries(1):
+            Task.objects.all().delete()
+        with self.assertNumQueries(1):
+            PublicationBoost.objects.all().delete()
+
+
+class ProfileSummaryTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('author')
+        self.publications = [
+            Publication.objects.create(author=self.user, description=f'Идея {n}', target_1='1', stop_loss='2')
+            for n in range(PROFILE_PUBLICATIONS_PER_PAGE + 2)
+        ]
+        Achievement.objects.create(name='Первый', description='Первая публикация', icon='🥇')
+        award_achievement('Первый', [self.user.pk])
+
+    def test_summary(self):
+        with self.assertNumQueries(3):
+            summary = get_profile_summary(self.user.pk)
+        self.assertEqual(summary['user']['username'], 'author')
+        self.assertEqual(summary['publications_count'], PROFILE_PUBLICATIONS_PER_PAGE + 2)
+        self.assertEqual(summary['achievements_count'], 1)
+        self.assertEqual(summary['achievements'][0]['name'], 'Первый')
+        recent = [publication['id'] for publication in summary['recent_publications']]
+        self.assertEqual(recent, [p.pk for p in reversed(self.publications)][:PROFILE_PUBLICATIONS_PER_PAGE])
+        with self.assertRaises(User.DoesNotExist):
+            get_profile_summary(0)
+
+    def test_cached_until_profile_changes(self):
+        get_profile_summary(self.user.pk)
+        with self.assertNumQueries(0):
+            get_profile_summary(self.user.pk)
+        Publication.objects.create(author=self.user, description='Ещё', target_1='1', stop_loss='2')
+        self.assertEqual(get_profile_summary(self.user.pk)['publications_count'], PROFILE_PUBLICATIONS_PER_PAGE + 3)
+        Profile.objects.get(user=self.user).save()
+        with self.assertNumQueries(3):
+            get_profile_summary(self.user.pk)
+
+
+class FollowGraphTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol = (User.objects.create_user(name) for name in ('alice', 'bob', 'carol'))
+
+    def counters(self, user):
+        return tuple(Profile.objects.filter(user=user).values_list('followers_count', 'following_count').get())
+
+    def test_toggle_keeps_counters(self):
+        profile = self.alice.profile
+        self.assertTrue(toggle_follow(profile, self.bob.pk))
+        self.assertTrue(toggle_follow(profile, self.carol.pk))
+        self.assertEqual(self.counters(self.alice), (0, 2))
+        self.assertEqual(self.counters(self.bob), (1, 0))
+        self.assertEqual(get_profile_summary(self.bob.pk)['profile']['followers_count'], 1)
+
+        self.assertFalse(toggle_follow(profile, self.bob.pk))
+        self.assertEqual(self.counters(self.alice), (0, 1))
+        self.assertEqual(self.counters(self.bob), (0, 0))
+        # сводка профиля сброшена вместе со счётчиком
+        self.assertEqual(get_profile_summary(self.bob.pk)['profile']['followers_count'], 0)
+
+    def test_m2m_changes_are_recounted(self):
+        self.alice.profile.subscribed_to.add(self.bob, self.carol)
+        self.assertEqual(self.counters(self.alice), (0, 2))
+        self.assertEqual(self.counters(self.carol), (1, 0))
+        self.alice.profile.subscribed_to.clear()
+        self.assertEqual(self.counters(self.alice), (0, 0))
+        self.assertEqual(self.counters(self.carol), (0, 0))
+
+    def test_followed_and_mutual(self):
+        toggle_follow(self.alice.profile, self.bob.pk)
+        toggle_follow(self.alice.profile, self.carol.pk)
+        toggle_follow(self.bob.profile, self.alice.pk)
+        with self.assertNumQueries(1):
+            followed = get_followed_ids(self.alice, [self.bob.pk, self.carol.pk, self.alice.pk])
+        self.assertEqual(followed, {self.bob.pk, self.carol.pk})
+        self.assertEqual(get_followed_ids(AnonymousUser(), [self.bob.pk]), set())
+        self.assertEqual(get_mutual_follow_ids(self.alice.pk), [self.bob.pk])
+
+
+class RecommendationTests(CacheIsolationMixin, TestCase):
+    """Похожие читатели бустят одно и то же — новичку предлагается то, что бустили они"""
+
+    def setUp(self):
+        super().setUp()
+        self.first_author, self.second_author = User.objects.create_user('first'), User.objects.create_user('second')
+        self.readers = [User.objects.create_user(f'reader{n}') for n in range(3)]
+
+        def publication(author, status=Publication.StatusChoices.ACTIVE):
+            return Publication.objects.create(author=author, description=f'Идея {author.username}',
+                                              target_1='1', stop_loss='2', status=status)
+
+        self.seen, self.liked = publication(self.first_author), publication(self.second_author)
+        self.closed = publication(self.second_author, Publication.StatusChoices.CANCELED)
+        for reader in self.readers[:2]:
+            for item in (self.seen, self.liked, self.closed):
+                item.boosts.add(reader)
+        self.seen.boosts.add(self.readers[2])
+
+    def test_build_and_api(self):
+        counts = build_recommendations()
+        self.assertEqual(counts[Recommendation.Kinds.AUTHOR], 3)
+
+        newcomer = self.readers[2]
+        self.client.force_login(newcomer)
+        authors = self.client.get('/api/recommendations/').json()['results']
+        # второго автора бустили похожие читатели; сами читатели не авторы и не предлагаются
+        self.assertEqual([row['username'] for row in authors], ['second'])
+        self.assertGreater(authors[0]['score'], 0)
+
+        ideas = self.client.get('/api/recommendations/?kind=publications').json()['results']
+        # уже забустенная и закрытая публикации не предлагаются
+        self.assertEqual([row['id'] for row in ideas], [self.liked.pk])
+        self.assertEqual(ideas[0]['author'], 'second')
+        self.assertEqual(self.client.get('/api/recommendations/?kind=other').status_code, 400)
+
+    def test_followed_author_is_not_recommended(self):
+        toggle_follow(self.readers[2].profile, self.second_author.pk)
+        build_recommendations()
+        recommended = Recommendation.objects.filter(user=self.readers[2], kind=Recommendation.Kinds.AUTHOR)
+        self.assertEqual(list(recommended.values_list('author__username', flat=True)), ['first'])
+
+
+class MarkdownRenderingTests(CacheIsolationMixin, TestCase):
+    def test_render_markdown(self):
+        text = '# Вход в сделку\n\nТекст <script>alert(1)</script> и [ссылка](https://example.com "t").\n\n' \
+               '## Риски\n\n<a href="#" onclick="steal()">клик</a>\n\n' + 'слово ' * 450
+        content_html, toc, reading_time = render_markdown(text)
+        self.assertIn('<h1 id="вход-в-сделку">Вход в сделку</h1>', content_html)
+        self.assertIn('<a href="https://example.com" title="t"', content_html)
+        self.assertNotIn('<script', content_html)
+        self.assertNotIn('onclick', content_html)
+        self.assertEqual([(entry['level'], entry['title']) for entry in toc], [(1, 'Вход в сделку'), (2, 'Риски')])
+        self.assertEqual(reading_time, 3)
+
+    def test_rendered_on_save_and_rerendered_on_version_change(self):
+        material = EducationalMaterial.objects.create(title='Основы', content='# Основы\n\n**важно**')
+        self.assertIn('<strong>важно</strong>', material.content_html)
+        self.assertEqual(material.renderer_version, RENDERER_VERSION)
+        self.assertEqual(rerender_materials(), 0)
+
+        EducationalMaterial.objects.filter(pk=material.pk).update(content_html='', renderer_version=0)
+        self.assertEqual(rerender_materials(), 1)
+        material.refresh_from_db()
+        self.assertIn('<strong>важно</strong>', material.content_html)
+
+
+class EducationCatalogueTests(CacheIsolationMixin, TestCase):
+    url = '/api/education/'
+
+    def setUp(self):
+        super().setUp()
+        types = EducationalMaterial.MaterialTypes
+        self.materials = [
+            EducationalMaterial.objects.create(title=f'Материал {n}', content='текст', is_featured=n in (3, 20),
+                                               material_type=types.VIDEO if n % 5 == 0 else types.ARTICLE)
+            for n in range(30)
+        ]
+
+    def facets(self, data):
+        return {facet['value']: facet['count'] for facet in data['facets']}
+
+    def test_pages_and_featured(self):
+        data = self.client.get(self.url).json()
+        featured = [item['id'] for item in data['featured']]
+        self.assertEqual(featured, [self.materials[20].pk, self.materials[3].pk])
+        seen = [item['id'] for item in data['results']]
+        while data['next_cursor']:
+            data = self.client.get(self.url, {'after': data['next_cursor']}).json()
+            # закреплённые — только над первой страницей
+            self.assertEqual(data['featured'], [])
+            seen += [item['id'] for item in data['results']]
+        newest_first = [material.pk for material in reversed(self.materials)]
+        self.assertEqual(seen, [pk for pk in newest_first if pk not in featured])
+
+    def test_category_and_facets(self):
+        data = self.client.get(self.url, {'category': 'VIDEO'}).json()
+        items = data['featured'] + data['results']
+        self.assertEqual({item['material_type'] for item in items}, {'VIDEO'})
+        self.assertEqual(len(items), 6)
+        self.assertEqual(self.facets(data), {'ARTICLE': 24, 'VIDEO': 6, 'GUIDE': 0, 'TUTORIAL': 0})
+        self.assertEqual(data['total_count'], 30)
+
+        # счётчики меняются сигналами при смене типа и удалении
+        material = EducationalMaterial.objects.get(pk=self.materials[1].pk)
+        material.material_type = EducationalMaterial.MaterialTypes.GUIDE
+        material.save()
+        self.materials[0].delete()
+        data = self.client.get(self.url).json()
+        self.assertEqual(self.facets(data), {'ARTICLE': 23, 'VIDEO': 5, 'GUIDE': 1, 'TUTORIAL': 0})
+        self.assertEqual(data['total_count'], 29)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'category': 'PODCAST'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'after': 'not-a-cursor'}).status_code, 400)
+
+
+class FragmentCacheTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user('author')
+        self.reader = User.objects.create_user('reader')
+        Publication.objects.create(author=self.author, description='Лонг по уровню', target_1='1', stop_loss='2')
+
+    def cards(self, user, followed=()):
+        publications = Publication.objects.select_related('author').annotate(boost_total=Count('boosts'))
+        with mock.patch('app.fragments.get_template', wraps=get_template) as loader:
+            html = publication_cards(publications, user, followed)
+        return html, loader.call_count
+
+    def test_publication_card_cached_until_it_changes(self):
+        (card,), rendered = self.cards(self.reader)
+        self.assertEqual(rendered, 1)
+        self.assertIn('Лонг по уровню', card)
+        self.assertIn('Подписаться', card)
+        self.assertEqual(self.cards(self.reader), ([card], 0))
+
+        # состояние подписки и число бустов входят в ключ
+        (following,), rendered = self.cards(self.reader, {self.author.pk})
+        self.assertEqual(rendered, 1)
+        self.assertIn('Вы подписаны', following)
+        Publication.objects.get().boosts.add(self.reader)
+        (boosted,), rendered = self.cards(self.reader)
+        self.assertEqual(rendered, 1)
+        self.assertIn('<span class="boost-count">1</span>', boosted)
+        # у автора кнопки подписки нет
+        self.assertNotIn('follow-btn', self.cards(self.author)[0][0])
+
+    def test_leaderboard_row_follows_rating(self):
+        Profile.objects.filter(user=self.author).update(rating_score=42)
+        (row,) = leaderboard_rows(Profile.objects.select_related('user').filter(user=self.author))
+        self.assertIn('42 ✨', row)
+        Profile.objects.filter(user=self.author).update(rating_score=43)
+        (row,) = leaderboard_rows(Profile.objects.select_related('user').filter(user=self.author))
+        self.assertIn('43 ✨', row)
+        self.assertContains(self.client.get('/leaderboard/'), '43 ✨')
+
+
+class AsyncApiTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('reader')
+        self.author = User.objects.create_user('author')
+        self.publication = Publication.objects.create(author=self.author, description='d', target_1='1',
+                                                      stop_loss='2')
+        self.client = AsyncClient()
+
+    async def test_anonymous_is_redirected_to_login(self):
+        response = await self.client.get('/api/notifications/unread-count/')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login/', response['Location'])
+
+    async def test_toggle_boost(self):
+        await self.client.aforce_login(self.user)
+        url = f'/api/publication/{self.publication.pk}/toggle_boost/'
+        self.assertEqual((await self.client.get(url)).status_code, 400)
+        response = await self.client.post(url)
+        self.assertEqual(response.json(), {'status': 'ok', 'boost_count': 1, 'boosted': True})
+        response = await self.client.post(url)
+        self.assertEqual(response.json(), {'status': 'ok', 'boost_count': 0, 'boosted': False})
+        self.assertEqual((await self.client.post('/api/publication/0/toggle_boost/')).status_code, 404)
+
+    async def test_notifications(self):
+        await self.client.aforce_login(self.user)
+        own = await Notification.objects.acreate(user=self.user, title='Своё', message='текст')
+        other = await Notification.objects.acreate(user=self.author, title='Чужое', message='текст')
+        response = await self.client.get('/api/notifications/')
+        self.assertEqual([item['title'] for item in response.json()['notifications']], ['Своё'])
+        self.assertEqual((await self.client.post(f'/api/notifications/mark-read/{other.pk}/')).status_code, 404)
+        response = await self.client.post(f'/api/notifications/mark-read/{own.pk}/')
+        self.assertEqual(response.json(), {'status': 'ok'})
+        response = await self.client.get('/api/notifications/unread-count/')
+        self.assertEqual(response.json(), {'unread_count': 0})
+
+    async def test_toggle_follow(self):
+        await self.client.aforce_login(self.user)
+        self.assertEqual((await self.client.post('/api/follow/reader/')).status_code, 400)
+        self.assertEqual((await self.client.post('/api/follow/nobody/')).status_code, 404)
+        response = await self.client.post('/api/follow/author/')
+        self.assertEqual(response.json(), {'status': 'ok', 'following': True, 'followers_count': 1})
+
+
+class ConditionalGetTests(CacheIsolationMixin, TestCase):
+    url = '/api/notifications/'
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('reader')
+        self.client.force_login(self.user)
+
+    def test_not_modified_until_write(self):
+        response = self.client.get(self.url)
+        etag = response.headers['ETag']
+        self.assertIn('private', response.headers['Cache-Control'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        # представление не выполнялось
+        self.assertFalse([query for query in queries if 'app_notification' in query['sql']])
+
+        Notification.objects.create(user=self.user, title='Новое', message='текст')
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.json()['unread_count'], 1)
+
+    def test_not_modified_since(self):
+        last_modified = self.client.get(self.url).headers['Last-Modified']
+        response = self.client.get(self.url, headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaPinningTests(CacheIsolationMixin, TestCase):
+    def test_cookie_set_after_write(self):
+        user = User.objects.create_user('user')
+        User.objects.create_user('author')
+        self.client.force_login(user)
+        # GET тоже пишет (сессия, отметка посещения), но cookie не ставит
+        self.assertNotIn(replicas.PIN_COOKIE, self.client.get('/publications/').cookies)
+        response = self.client.post('/api/follow/author/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cookies[replicas.PIN_COOKIE]['max-age'], 5)
+
+    def test_cookie_pins_reads(self):
+        def view(request):
+            pinned.append(replicas._current_state().pinned)
+            return HttpResponse()
+
+        pinned = []
+        middleware = replicas.ReplicaPinningMiddleware(view)
+        factory = RequestFactory()
+        middleware(factory.get('/'))
+        factory.cookies[replicas.PIN_COOKIE] = str(time.time() + 5)
+        middleware(factory.get('/'))
+        factory.cookies[replicas.PIN_COOKIE] = str(time.time() - 1)
+        middleware(factory.get('/'))
+        self.assertEqual(pinned, [False, True, False])
+
+
+class BroadcastSenderTests(TransactionTestCase):
+    """Отправщик рассылок против заглушки Bot API"""
+
+    def test_send_against_stub(self):
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            flooded = False
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                received.append(body)
+                if body['chat_id'] == 1002 and not Handler.flooded:
+                    Handler.flooded = True
+                    return self.reply(429, {'ok': False, 'parameters': {'retry_after': 0}})
+                if body['chat_id'] == 1003:
+                    return self.reply(403, {'ok': False, 'description': 'bot was blocked'})
+                self.reply(200, {'ok': True})
+
+            def reply(self, status, data):
+                content = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        api_url = start_stub_server(self, Handler)
+
+        author = User.objects.create_user('author')
+        for telegram_id in (1001, 1002, 1003):
+            user = User.objects.create_user(f'user{telegram_id}')
+            Profile.objects.filter(user=user).update(telegram_id=telegram_id)
+            Profile.objects.get(user=user).subscribed_to.add(author)
+        for description in ('Первая идея', 'Вторая идея'):
+            Publication.objects.create(author=author, description=description, target_1='1', stop_loss='2')
+
+        sender = BroadcastSender('TOKEN', api_url, rate=100)
+        with self.assertLogs('app.broadcast', 'WARNING'):
+            asyncio.run(sender.run(until_idle=True))
+
+        # два сообщения одному чату — один запрос; после 429 сообщение повторено
+        first_chat = [body['text'] for body in received if body['chat_id'] == 1001]
+        self.assertEqual(len(first_chat), 1)
+        self.assertIn('Первая идея', first_chat[0])
+        self.assertIn('Вторая идея', first_chat[0])
+        self.assertEqual([body['chat_id'] for body in received].count(1002), 2)
+        statuses = dict(OutboxMessage.objects.values_list('chat_id', 'status').distinct())
+        self.assertEqual(statuses, {1001: OutboxMessage.Statuses.SENT, 1002: OutboxMessage.Statuses.SENT,
+                                    1003: OutboxMessage.Statuses.FAILED})
+
+
+class OutboxClaimTests(TestCase):
+    def setUp(self):
+        OutboxMessage.objects.bulk_create(
+            OutboxMessage(chat_id=chat_id, text=f'сообщение {chat_id}') for chat_id in range(1, 6)
+        )
+
+    def test_senders_claim_disjoint_messages(self):
+        first = claim_due_messages('first', limit=3)
+        second = claim_due_messages('second')
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({m['pk'] for m in first} & {m['pk'] for m in second})
+        self.assertEqual(claim_due_messages('third'), [])
+
+    def test_expired_lease_is_reclaimed(self):
+        stale = claim_due_messages('crashed')
+        later = timezone.now() + datetime.timedelta(minutes=10)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            reclaimed = claim_due_messages('alive')
+        self.assertEqual([m['pk'] for m in reclaimed], [m['pk'] for m in stale])
+
+        # итог прежнего отправщика не перезаписывает сообщения, аренда которых перешла к другому
+        batch = ChatBatch(stale[0]['chat_id'], stale[0])
+        batch.finish(ChatBatch.SENT)
+        save_results([batch], 'crashed')
+        self.assertFalse(OutboxMessage.objects.filter(status=OutboxMessage.Statuses.SENT).exists())
+        save_results([batch], 'alive')
+        message = OutboxMessage.objects.get(pk=stale[0]['pk'])
+        self.assertEqual((message.status, message.locked_by), (OutboxMessage.Statuses.SENT, ''))
+
+
+class TaskWorkerTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        patcher = mock.patch.dict(tasks._handlers, {'flaky': self.flaky})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def flaky(self, payloads):
+        self.calls.append([payload['n'] for payload in payloads])
+        if any(payload.get('fail') for payload in payloads):
+            raise ValueError('boom')
+
+    def test_failed_batch_runs_tasks_one_by_one(self):
+        Task.objects.bulk_create([Task(name='flaky', payload={'n': 1}),
+                                  Task(name='flaky', payload={'n': 2, 'fail': True}),
+                                  Task(name='flaky', payload={'n': 3})])
+        with self.assertLogs('app.tasks', 'ERROR'):
+            self.assertEqual(tasks.TaskWorker().run_once(), 3)
+        self.assertEqual(self.calls, [[1, 2, 3], [1], [2], [3]])
+        failed = Task.objects.get()
+        self.assertEqual((failed.payload['n'], failed.attempts, failed.locked_by), (2, 1, ''))
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+        self.assertEqual(failed.last_error, 'ValueError: boom')
+
+    def test_dead_letter_after_max_attempts(self):
+        Task.objects.create(name='flaky', payload={'n': 1, 'fail': True})
+        worker = tasks.TaskWorker()
+        with self.assertLogs('app.tasks', 'ERROR'):
+            for _ in range(tasks.MAX_ATTEMPTS):
+                # задержка перед повтором уже прошла
+                Task.objects.update(next_attempt_at=timezone.now())
+                self.assertEqual(worker.run_once(), 1)
+        self.assertFalse(Task.objects.exists())
+        dead = FailedTask.objects.get()
+        self.assertEqual((dead.name, dead.attempts), ('flaky', tasks.MAX_ATTEMPTS))
+        self.assertIn('ValueError: boom', dead.last_error)
+
+    def test_enqueue_commits_with_the_change(self):
+        author = User.objects.create_user('author')
+        with self.assertRaises(ValueError), transaction.atomic():
+            Publication.objects.create(author=author, description='d', target_1='1', stop_loss='2')
+            raise ValueError
+        self.assertFalse(Task.objects.exists())
+        with transaction.atomic():
+            Publication.objects.create(author=author, description='d', target_1='1', stop_loss='2')
+            # строка задачи — в той же транзакции, а не в on_commit
+            self.assertEqual(list(Task.objects.values_list('name', flat=True)), ['count_publication'])
+
+    def test_unknown_task_is_dead_lettered(self):
+        Task.objects.create(name='missing')
+        tasks.TaskWorker().run_once()
+        self.assertEqual(FailedTask.objects.get().attempts, 1)
+
+
+class RoleResolutionTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for name, codename in ((TRADER, 'can_publish'), (MODERATOR, 'can_moderate')):
+            Group.objects.get(name=name).permissions.add(Permission.objects.get(codename=codename))
+        self.user = User.objects.create_user('trader')
+
+    def test_roles_and_permissions(self):
+        roles = get_roles(User.objects.get(pk=self.user.pk))
+        self.assertTrue(roles.is_trader)
+        self.assertFalse(roles.is_moderator)
+        self.assertTrue(roles.has_perm('app.can_publish'))
+        self.assertFalse(roles.has_perm('app.can_moderate'))
+        self.assertFalse(get_roles(AnonymousUser()).has_perm('app.can_publish'))
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertFalse(get_roles(User.objects.get(pk=self.user.pk)).has_perm('app.can_publish'))
+
+    def test_resolved_once_and_cached(self):
+        user = User.objects.get(pk=self.user.pk)
+        get_roles(user)
+        # тот же запрос — роли запомнены на объекте, в том числе для user.has_perm()
+        with self.assertNumQueries(0):
+            self.assertIs(get_roles(user), get_roles(user))
+            self.assertTrue(user.has_perm('app.can_publish'))
+        # следующий запрос — из кэша
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(get_roles(user).is_trader)
+
+    def test_group_change_invalidates(self):
+        self.assertFalse(get_roles(User.objects.get(pk=self.user.pk)).is_moderator)
+        self.user.groups.add(Group.objects.get(name=MODERATOR))
+        roles = get_roles(User.objects.get(pk=self.user.pk))
+        self.assertTrue(roles.is_moderator)
+        self.assertTrue(roles.has_perm('app.can_moderate'))
+
+
+class DefaultRoleTests(CacheIsolationMixin, TestCase):
+    def test_trader_assigned_on_registration(self):
+        first = User.objects.create_user('first')
+        self.assertEqual(list(first.groups.values_list('name', flat=True)), [TRADER])
+        # группа ищется один раз, а не на каждую регистрацию и не в очереди задач
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            second = User.objects.create_user('second')
+        self.assertFalse([query for query in queries if 'FROM "auth_group"' in query['sql']])
+        self.assertFalse(Task.objects.exists())
+        self.assertTrue(second.groups.filter(name=TRADER).exists())
+
+
+BOT_TOKEN = '123:TEST'
+
+
+def sign_init_data(fields, bot_token=BOT_TOKEN):
+    """initData, подписанная так же, как её подписывает Telegram"""
+    data_check_string = '\n'.join(f'{key}={value}' for key, value in sorted(fields.items()))
+    secret_key = hmac.new(b'WebAppData', bot_token.encode(), hashlib.sha256).digest()
+    return urlencode({**fields, 'hash': hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()})
+
+
+def init_data_fields(telegram_id=42, username='trader', auth_date=None):
+    return {'auth_date': str(int(auth_date or time.time())),
+            'user': json.dumps({'id': telegram_id, 'username': username, 'first_name': 'Иван'})}
+
+
+class VerifyInitDataTests(TestCase):
+    def test_valid(self):
+        self.assertEqual(verify_init_data(sign_init_data(init_data_fields()), BOT_TOKEN)['id'], 42)
+
+    def test_bad_hash(self):
+        with self.assertRaisesMessage(InitDataError, 'подпись'):
+            verify_init_data(sign_init_data(init_data_fields(), bot_token='456:OTHER'), BOT_TOKEN)
+
+    def test_expired(self):
+        init_data = sign_init_data(init_data_fields(auth_date=time.time() - 2 * 24 * 60 * 60))
+        with self.assertRaisesMessage(InitDataError, 'устарела'):
+            verify_init_data(init_data, BOT_TOKEN)
+
+    def test_tampered_field(self):
+        init_data = sign_init_data(init_data_fields(telegram_id=42)).replace('42', '43')
+        with self.assertRaisesMessage(InitDataError, 'подпись'):
+            verify_init_data(init_data, BOT_TOKEN)
+
+
+@override_settings(TELEGRAM_BOT_TOKEN=BOT_TOKEN)
+class TelegramLoginApiTests(CacheIsolationMixin, TestCase):
+    url = '/api/auth/telegram/'
+
+    def login(self, init_data):
+        return self.client.post(self.url, {'init_data': init_data})
+
+    def test_first_login_creates_user_and_next_finds_it(self):
+        response = self.login(sign_init_data(init_data_fields()))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['username'], response.json()['created']), ('trader', True))
+        self.assertEqual(self.client.session['_auth_user_id'], str(response.json()['user_id']))
+        self.client.logout()
+        again = self.login(sign_init_data(init_data_fields()))
+        self.assertEqual((again.json()['user_id'], again.json()['created']), (response.json()['user_id'], False))
+
+    def test_invalid_init_data(self):
+        response = self.login(sign_init_data(init_data_fields(), bot_token='456:OTHER'))
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_unverified_telegram_id_does_not_log_in(self):
+        # telegram_id, указанный при регистрации без проверки (старая форма)
+        attacker = User.objects.create_user('attacker', password='x')
+        Profile.objects.filter(user=attacker).update(telegram_id=42)
+        response = self.login(sign_init_data(init_data_fields()))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['user_id'], attacker.pk)
+        self.assertIsNone(Profile.objects.get(user=attacker).telegram_id)
+        self.assertTrue(Profile.objects.get(telegram_id=42).telegram_verified)
+
+    def test_registration_form_has_no_telegram_id(self):
+        self.client.post('/register/', {'username': 'web', 'password1': 'Sl0wly-typed!', 'password2': 'Sl0wly-typed!',
+                                        'telegram_id': 42})
+        self.assertIsNone(Profile.objects.get(user__username='web').telegram_id)
+
+
+class HyperLogLogTests(TestCase):
+    def test_estimate(self):
+        sketch = reach.HyperLogLog()
+        for n in range(20000):
+            sketch.add(f'u:{n}')
+        self.assertAlmostEqual(sketch.count(), 20000, delta=20000 * 0.05)
+        self.assertEqual(reach.HyperLogLog().count(), 0)
+
+    def test_merge_is_union(self):
+        first, second = reach.HyperLogLog(), reach.HyperLogLog()
+        for n in range(3000):
+            (first if n % 2 else second).add(f'u:{n}')
+            # общие зрители не удваиваются
+            first.add(f'common:{n % 500}')
+            second.add(f'common:{n % 500}')
+        self.assertTrue(first.merge(second))
+        self.assertFalse(first.merge(second))
+        self.assertAlmostEqual(first.count(), 3500, delta=3500 * 0.05)
+
+
+class ViewerFlushTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        reach._pending.clear()
+        patcher = mock.patch('app.reach._ensure_flusher')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        author = User.objects.create_user('author')
+        self.publication = Publication.objects.create(author=author, description='d', target_1='1',
+                                                      stop_loss='2')
+
+    def view(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        reach.record_view(request, self.publication)
+
+    def test_views_are_written_by_flush_not_by_request(self):
+        readers = [User.objects.create_user(f'reader{n}') for n in range(3)]
+        with self.assertNumQueries(0):
+            for user in readers + readers:
+                self.view(user)
+        self.assertEqual(reach.flush_viewers(), 4)
+        self.publication.refresh_from_db()
+        self.assertEqual(self.publication.unique_viewers, 3)
+        self.assertEqual(ViewerSketch.objects.count(), 4)
+        self.assertEqual(reach.count_site_viewers(days=7), 3)
+        self.assertEqual(reach.flush_viewers(), 0)
+
+    def test_failed_write_keeps_registers(self):
+        self.view(User.objects.create_user('reader'))
+        with mock.patch('app.reach._write_batch', side_effect=DatabaseError('connection lost')), \
+                self.assertLogs('app.reach', 'ERROR'):
+            self.assertEqual(reach.flush_viewers(), 0)
+        self.assertFalse(ViewerSketch.objects.exists())
+        self.assertEqual(reach.flush_viewers(), 4)
+        self.publication.refresh_from_db()
+        self.assertEqual(self.publication.unique_viewers, 1)
+
+
+@override_settings(TELEGRAM_WEBHOOK_SECRET='webhook-secret')
+class TelegramWebhookTests(SimpleTestCase):
+    """ASGI-приложение webhook-а без Bot API: Application подменён ботом без сети"""
+
+    def setUp(self):
+        from telegram import Bot
+
+        self.webhook = TelegramWebhook()
+
+        async def ensure_started():
+            if self.webhook.application is None:
+                self.webhook.application = mock.Mock(bot=Bot(BOT_TOKEN))
+                self.webhook.queue = asyncio.Queue(maxsize=1)
+
+        self.webhook._ensure_started = ensure_started
+
+    def post(self, body, secret=b'webhook-secret', method='POST'):
+        headers = [(b'content-type', b'application/json')]
+        if secret is not None:
+            headers.append((b'x-telegram-bot-api-secret-token', secret))
+        scope = {'type': 'http', 'method': method, 'path': '/telegram/webhook/', 'headers': headers}
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.webhook(scope, receive, send))
+        return sent[0]['status']
+
+    def test_secret_token(self):
+        body = json.dumps({'update_id': 1}).encode()
+        self.assertEqual(self.post(body, secret=None), 403)
+        self.assertEqual(self.post(body, secret=b'wrong'), 403)
+        self.assertEqual(self.post(body, method='GET'), 405)
+        self.assertIsNone(self.webhook.queue)
+        self.assertEqual(self.post(body), 200)
+        self.assertEqual(self.webhook.queue.get_nowait().update_id, 1)
+
+    def test_malformed_bodies(self):
+        for body in (b'{not json', b'[1, 2]', b'"update"'):
+            with self.subTest(body=body), self.assertLogs('app.webhook', 'WARNING'):
+                self.assertEqual(self.post(body), 400)
+        # JSON-объект, который не разбирается в Update, подтверждается, чтобы Telegram его не повторял
+        for data in ({}, {'update_id': 2, 'message': 'text'}, {'update_id': 3, 'message': {'text': 'no date'}}):
+            with self.subTest(data=data), self.assertLogs('app.webhook', 'WARNING'):
+                self.assertEqual(self.post(json.dumps(data).encode()), 200)
+        self.assertTrue(self.webhook.queue.empty())
+
+    def test_full_queue(self):
+        self.assertEqual(self.post(b'{"update_id": 4}'), 200)
+        with self.assertLogs('app.webhook', 'WARNING'):
+            self.assertEqual(self.post(b'{"update_id": 5}'), 503)
+
+
+class NegotiateEncodingTests(SimpleTestCase):
+    def test_q_values(self):
+        both = {'identity', 'br', 'gzip'}
+        cases = [
+            ('gzip, deflate, br', both, 'br'),
+            ('br;q=0.5, gzip', both, 'gzip'),
+            ('gzip;q=0.8, br;q=0.9', both, 'br'),
+            ('br;q=0, gzip;q=0', both, None),
+            ('*;q=0.1', both, 'br'),
+            ('*, br;q=0', both, 'gzip'),
+            ('gzip;q=oops', both, None),
+            ('', both, None),
+            ('br, gzip', {'identity', 'gzip'}, 'gzip'),
+        ]
+        for accept_encoding, available, expected in cases:
+            with self.subTest(accept_encoding=accept_encoding, available=available):
+                self.assertEqual(_negotiate(accept_encoding, available), expected)
+
+
+class StaticAssetsRouterTests(SimpleTestCase):
+    hashed_name = 'app/site.0123456789ab.css'
+    css = b'body { color: black; }\n' * 40
+
+    def setUp(self):
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root)
+        (root / 'app').mkdir()
+        (root / self.hashed_name).write_bytes(self.css)
+        (root / (self.hashed_name + '.gz')).write_bytes(b'gzip copy')
+        (root / (self.hashed_name + '.br')).write_bytes(b'brotli copy')
+        (root / 'robots.txt').write_bytes(b'User-agent: *\n')
+        (root / 'staticfiles.json').write_text(json.dumps({'paths': {'app/site.css': self.hashed_name}}))
+        with override_settings(STATIC_ROOT=str(root), STATIC_URL='/static/'):
+            self.router = StaticAssetsRouter(self.downstream)
+
+    async def downstream(self, scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 299, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'django'})
+
+    def request(self, path, method='GET', **headers):
+        scope = {'type': 'http', 'method': method, 'path': path,
+                 'headers': [(name.replace('_', '-').encode(), value.encode()) for name, value in headers.items()]}
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.router(scope, None, send))
+        return sent[0]['status'], dict(sent[0]['headers']), sent[1]['body']
+
+    def test_hashed_asset(self):
+        status, headers, body = self.request('/static/' + self.hashed_name, accept_encoding='gzip, br')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b'brotli copy')
+        self.assertEqual(headers[b'content-encoding'], b'br')
+        self.assertEqual(headers[b'cache-control'], IMMUTABLE_CACHE_CONTROL.encode())
+        self.assertEqual(headers[b'vary'], b'Accept-Encoding')
+        self.assertEqual(headers[b'content-type'], b'text/css; charset=utf-8')
+
+        status, headers, body = self.request('/static/' + self.hashed_name)
+        self.assertEqual(body, self.css)
+        self.assertNotIn(b'content-encoding', headers)
+
+    def test_not_modified(self):
+        _, headers, _ = self.request('/static/' + self.hashed_name, accept_encoding='gzip')
+        etag = headers[b'etag'].decode()
+        status, headers, body = self.request('/static/' + self.hashed_name, accept_encoding='gzip',
+                                             if_none_match=f'"stale", {etag}')
+        self.assertEqual((status, body), (304, b''))
+        self.assertEqual(headers[b'cache-control'], IMMUTABLE_CACHE_CONTROL.encode())
+        # метка другой кодировки не совпадает
+        status, _, _ = self.request('/static/' + self.hashed_name, accept_encoding='br', if_none_match=etag)
+        self.assertEqual(status, 200)
+
+    def test_head(self):
+        status, headers, body = self.request('/static/' + self.hashed_name, method='HEAD')
+        self.assertEqual((status, body), (200, b''))
+        self.assertEqual(headers[b'content-length'], str(len(self.css)).encode())
+        self.assertEqual(self.request('/static/' + self.hashed_name, method='POST')[0], 405)
+
+    def test_unhashed_missing_and_other_paths(self):
+        status, headers, _ = self.request('/static/robots.txt')
+        self.assertEqual((status, headers[b'cache-control']), (200, UNHASHED_CACHE_CONTROL.encode()))
+        self.assertEqual(self.request('/static/app/missing.css')[0], 404)
+        self.assertEqual(self.request('/publications/'), (299, {}, b'django'))
+
+
+class RollupTests(CacheIsolationMixin, TestCase):
+    def test_rows_counted_on_their_own_day(self):
+        author = User.objects.create_user('author')
+        publication = Publication.objects.create(author=author, description='d', target_1='1', stop_loss='2')
+        publication.boosts.add(author)
+        days_ago = timezone.now() - datetime.timedelta(days=5)
+        PublicationBoost.objects.update(created_at=days_ago)
+        rollup_daily_statistics()
+        self.assertEqual(DailyStatistics.objects.get(date=timezone.localdate(days_ago)).new_boosts, 1)
+        self.assertEqual(DailyStatistics.objects.get(date=timezone.localdate()).new_boosts, 0)
+
+    def test_late_commit_below_last_run_is_counted(self):
+        author = User.objects.create_user('author')
+        rollup_daily_statistics()
+        # транзакция, начатая вчера, зафиксирована после запуска агрегации
+        yesterday = timezone.now() - datetime.timedelta(days=1)
+        publication = Publication.objects.create(author=author, description='d', target_1='1', stop_loss='2')
+        Publication.objects.filter(pk=publication.pk).update(created_at=yesterday)
+        rollup_daily_statistics()
+        rollup_daily_statistics()
+        self.assertEqual(DailyStatistics.objects.get(date=timezone.localdate(yesterday)).new_publications, 1)
+        self.assertEqual(DailyStatistics.objects.get(date=timezone.localdate()).new_users, 1)
+
+    def test_undated_boosts_are_kept(self):
+        today = timezone.localdate()
+        yesterday = today - datetime.timedelta(days=1)
+        # состояние после миграции 0018: 7 и 3 буста без даты, учтённые прежним расчётом
+        DailyStatistics.objects.create(date=yesterday, new_boosts=7)
+        DailyStatistics.objects.create(date=today, new_boosts=3)
+        RollupWatermark.objects.create(source='boosts', last_day=today, legacy_day=today, legacy_count=3)
+        author = User.objects.create_user('author')
+        publication = Publication.objects.create(author=author, description='d', target_1='1', stop_loss='2')
+        publication.boosts.add(author)
+
+        for _ in range(2):
+            rollup_daily_statistics(['boosts'])
+            self.assertEqual(DailyStatistics.objects.get(date=yesterday).new_boosts, 7)
+            self.assertEqual(DailyStatistics.objects.get(date=today).new_boosts, 4)
+
+
+class LoginStreakTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        streaks._seen_day = None
+        self.user = User.objects.create_user('user')
+        self.client.force_login(self.user)
+
+    def test_first_request_of_day_is_written(self):
+        self.client.get('/menu/')
+        self.assertEqual(Profile.objects.get(user=self.user).last_seen_on, timezone.localdate())
+        # повторные запросы за день не пишут в БД
+        with self.assertNumQueries(2):
+            self.client.get('/menu/')
+
+    def test_other_processes_skip_the_write(self):
+        self.client.get('/menu/')
+        # другой процесс: множества в памяти нет, но ключ дня уже в общем кэше
+        streaks._seen_day = None
+        with self.assertNumQueries(2):
+            self.client.get('/menu/')
+        self.assertEqual(cache.shared.get(f'seen:{timezone.localdate().isoformat()}:{self.user.pk}'), 1)
+
+    def test_failed_write_is_retried(self):
+        with mock.patch.object(streaks.Profile.objects, 'filter', side_effect=DatabaseError), \
+                self.assertRaises(DatabaseError):
+            streaks.mark_seen(self.user.pk)
+        streaks.mark_seen(self.user.pk)
+        self.assertEqual(Profile.objects.get(user=self.user).last_seen_on, timezone.localdate())
+
+    def test_nightly_job_sees_marks_of_other_processes(self):
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        # отметка, записанная другим процессом
+        Profile.objects.filter(user=self.user).update(last_seen_on=yesterday)
+        self.assertEqual(streaks.process_login_streaks(yesterday)['started'], 1)
+        self.assertEqual(Profile.objects.get(user=self.user).login_streak, 1)
+
+
+class ScreenshotDownloadTests(TestCase):
+    def test_host_not_in_allowlist(self):
+        with self.assertRaisesMessage(ScreenshotError, 'не разрешена'):
+            download('http://169.254.169.254/latest/meta-data/', ['example.com'])
+        with self.assertRaisesMessage(ScreenshotError, 'Некорректная ссылка'):
+            download('file:///etc/passwd', ['example.com'])
+
+    def test_internal_addresses(self):
+        for address in ('127.0.0.1', '10.1.2.3', '192.168.0.27', '169.254.169.254', '::1', '::ffff:127.0.0.1'):
+            with self.subTest(address=address), self.assertRaises(ScreenshotError):
+                _check_public_address(address)
+        _check_public_address('93.184.216.34')
+
+    def test_allowed_host_resolving_to_loopback(self):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server_url = start_stub_server(self, Handler)
+        with self.assertRaisesMessage(ScreenshotError, 'не публичный'):
+            download(server_url.replace('127.0.0.1', 'localhost') + '/image.png', ['localhost'])
+
+
+def png_bytes(width, height):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ScreenshotRootMixin:
+    """SCREENSHOT_ROOT — временный каталог теста"""
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings_override = override_settings(SCREENSHOT_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class ScreenshotIngestTests(ScreenshotRootMixin, CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        author = User.objects.create_user('author')
+        self.publication = Publication.objects.create(author=author, description='d', target_1='1', stop_loss='0',
+                                                      screenshot_id='https://img.example/1.png')
+
+    def ingest(self, error):
+        with mock.patch('app.screenshots.download', side_effect=error) as download_mock:
+            result = ingest_screenshots(processes=1)
+        self.publication.refresh_from_db()
+        return result, download_mock.call_count
+
+    def test_network_error_is_retried_with_backoff(self):
+        import requests
+
+        self.assertEqual(self.ingest(requests.ConnectionError('reset')), ((0, 1), 1))
+        self.assertFalse(self.publication.screenshot_failed)
+        self.assertEqual(self.publication.screenshot_attempts, 1)
+        first_retry = self.publication.screenshot_retry_at
+        self.assertGreater(first_retry, timezone.now())
+        # до screenshot_retry_at источник не запрашивается
+        self.assertEqual(self.ingest(requests.ConnectionError('reset')), ((0, 0), 0))
+
+        with mock.patch('django.utils.timezone.now', return_value=first_retry):
+            self.ingest(ScreenshotError('HTTP 503'))
+        self.assertEqual(self.publication.screenshot_attempts, 2)
+        self.assertGreater(self.publication.screenshot_retry_at - first_retry, first_retry - timezone.now())
+
+    def test_gives_up_after_max_attempts(self):
+        Publication.objects.filter(pk=self.publication.pk).update(screenshot_attempts=SCREENSHOT_MAX_ATTEMPTS - 1)
+        self.ingest(ScreenshotError('HTTP 503'))
+        self.assertTrue(self.publication.screenshot_failed)
+        self.assertIsNone(self.publication.screenshot_retry_at)
+
+    def test_rejected_source_fails_at_once(self):
+        self.ingest(ScreenshotRejected('Изображение слишком большое'))
+        self.assertTrue(self.publication.screenshot_failed)
+        # новый источник загружается заново, с нуля попыток
+        publication = Publication.objects.get(pk=self.publication.pk)
+        publication.screenshot_id = 'https://img.example/2.png'
+        publication.save()
+        publication.refresh_from_db()
+        self.assertFalse(publication.screenshot_failed)
+        self.assertEqual(publication.screenshot_attempts, 0)
+
+
+class ThumbnailTests(ScreenshotRootMixin, TestCase):
+    def test_render_thumbnails(self):
+        sha256 = store_original(png_bytes(800, 400))
+        self.assertEqual(render_thumbnails(sha256)[:2], (800, 400))
+        from PIL import Image
+
+        for width in THUMBNAIL_WIDTHS:
+            with self.subTest(width=width), Image.open(thumbnail_path(sha256, width)) as thumbnail:
+                self.assertEqual(thumbnail.format, 'WEBP')
+                # меньшие изображения не увеличиваются
+                self.assertEqual(thumbnail.size, (width, width // 2) if width < 800 else (800, 400))
+
+    def test_not_an_image(self):
+        sha256 = store_original(b'<html>not an image</html>')
+        self.assertIsNone(render_thumbnails(sha256))
+        self.assertFalse(thumbnail_path(sha256, THUMBNAIL_WIDTHS[0]).exists())
+
+    def test_view_caching(self):
+        sha256 = store_original(png_bytes(400, 300))
+        render_thumbnails(sha256)
+        url = reverse('screenshot_thumbnail', args=[sha256, 320])
+        etag = thumbnail_etag(sha256, 320)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response['Cache-Control'], THUMBNAIL_CACHE_CONTROL)
+        response.close()
+
+        response = self.client.get(url, headers={'If-None-Match': f'"other", {etag}'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Cache-Control'], THUMBNAIL_CACHE_CONTROL)
+        # метка, лишь содержащая нужную подстроку, не совпадает
+        response = self.client.get(url, headers={'If-None-Match': f'"x{etag}x"'})
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+        self.assertEqual(self.client.get(reverse('screenshot_thumbnail', args=[sha256, 100])).status_code, 404)
+
+
+class VideoMetadataTests(CacheIsolationMixin, TestCase):
+    def test_unsupported_provider_checked_once(self):
+        MarketOverview.objects.create(title='t', content='c', video_url='https://video.example/1')
+        self.assertEqual(refresh_video_metadata(), (0, 1))
+        later = timezone.now() + datetime.timedelta(days=30)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertEqual(refresh_video_metadata(), (0, 0))
+
+    def serve_oembed(self):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                video_url = parse_qs(urlsplit(self.path).query)['url'][0]
+                if video_url.endswith('/slow'):
+                    # клиент не дождётся ответа
+                    time.sleep(1)
+                    return
+                if video_url.endswith('/missing'):
+                    return self.reply(404, b'{}')
+                if video_url.endswith('/garbage'):
+                    return self.reply(200, b'<html>')
+                self.reply(200, json.dumps({
+                    'title': 'Разбор рынка', 'duration': '125', 'provider_name': 'Stub',
+                    # превью с внутреннего адреса не загружается (app/screenshots.py)
+                    'thumbnail_url': 'http://127.0.0.1/thumbnail.jpg',
+                }).encode())
+
+            def reply(self, status, content):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        endpoint = start_stub_server(self, Handler) + '/oembed'
+        overrides = override_settings(VIDEO_OEMBED_PROVIDERS=[(r'https://video\.test/', endpoint)])
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_metadata_from_stub_provider(self):
+        self.serve_oembed()
+        thumbnail = Screenshot.objects.create(sha256='0' * 64, width=1, height=1, size=1)
+        overview = MarketOverview.objects.create(title='t', content='c', video_url='https://video.test/ok')
+        MarketOverview.objects.filter(pk=overview.pk).update(video_thumbnail=thumbnail)
+        with self.assertLogs('app.videos', 'WARNING'):
+            self.assertEqual(refresh_video_metadata(), (1, 0))
+        overview.refresh_from_db()
+        self.assertEqual((overview.video_title, overview.video_duration, overview.video_provider),
+                         ('Разбор рынка', 125, 'Stub'))
+        # превью, которое не удалось загрузить, не затирает прежнее
+        self.assertEqual(overview.video_thumbnail_id, thumbnail.pk)
+
+    @mock.patch('app.videos.OEMBED_TIMEOUT', 0.2)
+    def test_provider_errors_are_retried_later(self):
+        self.serve_oembed()
+        for path in ('missing', 'garbage', 'slow'):
+            MarketOverview.objects.create(title=path, content='c', video_url=f'https://video.test/{path}')
+        with self.assertLogs('app.videos', 'WARNING') as logs:
+            self.assertEqual(refresh_video_metadata(), (0, 3))
+        self.assertIn('HTTP 404', '\n'.join(logs.output))
+        self.assertIn('некорректный ответ', '\n'.join(logs.output))
+        for overview in MarketOverview.objects.all():
+            self.assertIsNone(overview.video_fetched_at)
+            self.assertGreater(overview.video_refresh_at, timezone.now())
+
+
+class StatisticsDailyApiTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        moderator = User.objects.create_user('moderator', password='x')
+        moderator.groups.add(Group.objects.get_or_create(name=MODERATOR)[0])
+        self.client.force_login(moderator)
+
+    def get(self, query):
+        return self.client.get('/api/statistics/daily/' + query)
+
+    def test_valid_range(self):
+        response = self.get('?days=7')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['series']['dates']), 7)
+
+    def test_days_clamped(self):
+        response = self.get('?days=10000000000')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['series']['dates']), 366)
+
+    def test_invalid_parameters_are_400(self):
+        for query in ('?days=abc', '?start=2024-02-31', '?end=2024-13-01', '?end=0001-01-02&days=30',
+                      '?start=2024-03-01&end=2024-02-01'):
+            with self.subTest(query=query):
+                response = self.get(query)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['status'], 'error')
@@ -1,6 +1,7 @@
-from django.urls import path
+from django.urls import path, re_path, include
 from django.contrib.auth import views as auth_views
-from . import views
+from . import async_views, views
+from .api import router as api_router
 
 urlpatterns = [
     # === Основные страницы ===
@@ -24,6 +25,9 @@ urlpatterns = [
     path('publication/<int:pk>/', views.PublicationDetailView.as_view(), name='publication_detail'),
     path('publication/<int:pk>/update/', views.update_publication_view, name='update_publication'),
     path('publication/<int:pk>/delete/', views.delete_publication_view, name='delete_publication'),
+    # миниатюры скриншотов (app/screenshots.py)
+    re_path(r'^media/screenshots/(?P<sha256>[0-9a-f]{64})/(?P<width>[0-9]+)\.webp$',
+            views.screenshot_thumbnail_view, name='screenshot_thumbnail'),
 
     # === Обучающие материалы ===
     path('education/', views.education_view, name='education'),
@@ -42,20 +46,38 @@ urlpatterns = [
 
     # === Статистика ===
     path('statistics/', views.statistics_view, name='statistics'),
+    path('statistics/performance/', views.performance_report_view, name='performance_report'),
 
     # === API endpoints ===
+    # частые JSON-API — асинхронные (app/async_views.py)
 
     # Публикации API
-    path('api/publication/<int:pk>/toggle_boost/', views.toggle_boost_view, name='toggle_boost'),
+    path('api/publication/<int:pk>/toggle_boost/', async_views.toggle_boost_view, name='toggle_boost'),
+
+    # Каталог обучающих материалов API
+    path('api/education/', views.education_catalogue_api, name='education_catalogue_api'),
+
+    # Вход из Telegram WebApp
+    path('api/auth/telegram/', views.telegram_login_api, name='telegram_login_api'),
 
     # Подписки API
-    path('api/follow/<str:username>/', views.toggle_follow_view, name='toggle_follow'),
+    path('api/follows/mutual/', views.mutual_follows_api, name='mutual_follows_api'),
+    path('api/follow/<str:username>/', async_views.toggle_follow_view, name='toggle_follow'),
 
     # Уведомления API
-    path('api/notifications/', views.get_notifications_api, name='get_notifications_api'),
-    path('api/notifications/unread-count/', views.api_unread_notifications_count, name='api_unread_notifications_count'),
-    path('api/notifications/mark-read/<int:pk>/', views.mark_notification_as_read_api, name='mark_notification_read_api'),
+    path('api/notifications/', async_views.get_notifications_api, name='get_notifications_api'),
+    path('api/notifications/unread-count/', async_views.api_unread_notifications_count, name='api_unread_notifications_count'),
+    path('api/notifications/mark-read/<int:pk>/', async_views.mark_notification_as_read_api, name='mark_notification_read_api'),
+
+    # Рекомендации API
+    path('api/recommendations/', views.recommendations_api, name='recommendations_api'),
+
+    # Статистика API
+    path('api/statistics/daily/', views.statistics_daily_api, name='statistics_daily_api'),
+
+    # REST API (DRF) для Telegram WebApp
+    path('api/v1/', include(api_router.urls)),
 
     # Альтернативные URL для совместимости
-    path('api/toggle-boost/<int:pk>/', views.toggle_boost_view, name='toggle_boost_api'),
+    path('api/toggle-boost/<int:pk>/', async_views.toggle_boost_view, name='toggle_boost_api'),
 ]
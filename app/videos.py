@@ -0,0 +1,150 @@
+# app/videos.py
+"""
+Метаданные видео обзоров рынка (MarketOverview.video_url).
+
+Страницы обзоров не обращаются к видеохостингу: задача refresh_video_metadata()
+(manage.py fetch_video_metadata) запрашивает oEmbed провайдера один раз, сохраняет
+название, длительность и провайдера в колонки обзора, а превью кладёт в хранилище
+скриншотов (app/screenshots.py) — оно отдаётся с нашего сервера как WebP-миниатюра.
+Метаданные перезапрашиваются через VIDEO_METADATA_TTL, после ошибки —
+через VIDEO_RETRY_INTERVAL. oEmbed-адреса провайдеров — settings.VIDEO_OEMBED_PROVIDERS;
+ссылка неподдерживаемого провайдера помечается проверенной (video_fetched_at без
+video_refresh_at) и больше не запрашивается, пока её не сменят.
+"""
+import datetime
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .caching import cache, object_tag
+from .models import MarketOverview
+from .screenshots import ScreenshotError, download, store_image
+
+logger = logging.getLogger(__name__)
+
+VIDEO_METADATA_TTL = datetime.timedelta(days=7)
+VIDEO_RETRY_INTERVAL = datetime.timedelta(hours=6)
+OEMBED_TIMEOUT = 10
+FETCH_WORKERS = 4
+FETCH_BATCH_SIZE = 50
+
+
+class VideoMetadataError(Exception):
+    """Метаданные видео не удалось получить"""
+
+
+def find_endpoint(video_url):
+    """oEmbed-адрес провайдера для ссылки или None, если провайдер не поддерживается"""
+    for pattern, endpoint in settings.VIDEO_OEMBED_PROVIDERS:
+        if re.match(pattern, video_url):
+            return endpoint
+    return None
+
+
+def fetch_oembed(video_url):
+    """{'title', 'duration', 'provider', 'thumbnail_url'} из ответа oEmbed провайдера"""
+    import requests
+
+    endpoint = find_endpoint(video_url)
+    if endpoint is None:
+        raise VideoMetadataError('Провайдер видео не поддерживается')
+    response = requests.get(endpoint, params={'url': video_url, 'format': 'json'}, timeout=OEMBED_TIMEOUT)
+    if response.status_code != 200:
+        raise VideoMetadataError(f'oEmbed: HTTP {response.status_code}')
+    try:
+        data = response.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        raise VideoMetadataError('oEmbed: некорректный ответ')
+    try:
+        # duration отдают не все провайдеры (например, YouTube — нет)
+        duration = int(data['duration']) if data.get('duration') else None
+    except (TypeError, ValueError):
+        duration = None
+    return {
+        'title': str(data.get('title') or '')[:300],
+        'duration': duration,
+        'provider': str(data.get('provider_name') or '')[:100],
+        'thumbnail_url': data.get('thumbnail_url') or '',
+    }
+
+
+def _fetch(video_url):
+    """
+    (метаданные, содержимое превью или None) или None, если метаданные получить не удалось.
+    Выполняется в пуле потоков, поэтому только сеть — без обращений к БД.
+    """
+    import requests
+
+    try:
+        metadata = fetch_oembed(video_url)
+    except (requests.RequestException, VideoMetadataError) as error:
+        logger.warning('Метаданные видео %s не получены: %s', video_url, error)
+        return None
+
+    thumbnail_url = metadata.pop('thumbnail_url')
+    if not thumbnail_url.startswith(('http://', 'https://')):
+        return metadata, None
+    try:
+        return metadata, download(thumbnail_url, settings.VIDEO_THUMBNAIL_HOSTS)
+    except (requests.RequestException, ScreenshotError) as error:
+        # без превью карточка всё равно показывает название и длительность
+        logger.warning('Превью видео %s не загружено: %s', video_url, error)
+        return metadata, None
+
+
+def refresh_video_metadata(limit=FETCH_BATCH_SIZE):
+    """
+    Запрашивает метаданные видео, у которых их ещё нет или истёк срок, пачками по limit.
+    Возвращает (обновлено, не удалось).
+    """
+    updated = failed = 0
+    with ThreadPoolExecutor(FETCH_WORKERS) as threads:
+        while True:
+            now = timezone.now()
+            due = list(
+                MarketOverview.objects.exclude(Q(video_url__isnull=True) | Q(video_url=''))
+                .filter(Q(video_fetched_at__isnull=True, video_refresh_at__isnull=True) | Q(video_refresh_at__lte=now))
+                .order_by('pk').values_list('pk', 'video_url')[:limit]
+            )
+            if not due:
+                return updated, failed
+
+            supported = []
+            for pk, video_url in due:
+                if find_endpoint(video_url) is None:
+                    MarketOverview.objects.filter(pk=pk, video_url=video_url).update(
+                        video_fetched_at=now, video_refresh_at=None)
+                    failed += 1
+                else:
+                    supported.append((pk, video_url))
+
+            for (pk, video_url), result in zip(supported, threads.map(_fetch, [url for _, url in supported])):
+                # условие по video_url: ссылку могли сменить, пока шёл запрос
+                overview = MarketOverview.objects.filter(pk=pk, video_url=video_url)
+                if result is None:
+                    overview.update(video_refresh_at=now + VIDEO_RETRY_INTERVAL)
+                    failed += 1
+                    continue
+                metadata, thumbnail = result
+                fields = {}
+                # превью, которое не удалось загрузить, не затирает прежнее
+                screenshot = store_image(thumbnail) if thumbnail else None
+                if screenshot is not None:
+                    fields['video_thumbnail'] = screenshot
+                overview.update(
+                    video_title=metadata['title'],
+                    video_duration=metadata['duration'],
+                    video_provider=metadata['provider'],
+                    video_fetched_at=now,
+                    video_refresh_at=now + VIDEO_METADATA_TTL,
+                    **fields,
+                )
+                # update() не отправляет сигналы — сбрасываем теги обзора явно
+                cache.invalidate_tags('marketoverview', object_tag(MarketOverview, pk))
+                updated += 1
@@ -1,41 +1,62 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.views.generic import ListView, DetailView, TemplateView
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponseForbidden, FileResponse, Http404, HttpResponseNotModified
+from django.db import transaction
 from django.db.models import F, Count
 from django.utils import timezone
-
+from django.urls import reverse
+from django.utils.dateparse import parse_date
+from django.utils.decorators import method_decorator
+
+from .analytics import get_daily_series, MAX_RANGE_DAYS
+from .conditional import conditional
+from .education import get_catalogue_page, get_facet_counts
+from .follows import toggle_follow, get_followed_ids, get_mutual_follow_ids
+from .fragments import home_publication_cards, leaderboard_rows, publication_cards
 from .forms import CustomUserCreationForm, PublicationForm, ProfileSettingsForm
+from .instrumentation import query_budget, report as performance_report
 from .models import (
     Publication, Profile, ChatMessage, Achievement, UserAchievement,
-    EducationalMaterial, MarketOverview, Notification
+    EducationalMaterial, MarketOverview, Notification, Recommendation
 )
+from .profiles import get_profile_summary, get_user_publications_page, PROFILE_PUBLICATIONS_PER_PAGE
+from .reach import count_site_viewers, record_view
+from .roles import get_roles
+from .screenshots import THUMBNAIL_WIDTHS, THUMBNAIL_CACHE_CONTROL, thumbnail_etag, thumbnail_path
+from .tasks import enqueue
+from .telegram_auth import InitDataError, get_or_create_telegram_user, verify_init_data
 
 
 # === Хелперы для проверки ролей ===
+# Роли загружаются один раз за запрос и кэшируются (см. app/roles.py)
 def is_trader(user):
-    return user.groups.filter(name='Trader').exists()
+    return get_roles(user).is_trader
 
 
 def is_moderator(user):
-    return user.groups.filter(name='Moderator').exists()
+    return get_roles(user).is_moderator
 
 
 def is_admin(user):
-    return user.is_staff or user.groups.filter(name='Admin').exists()
+    return get_roles(user).is_admin
 
 
 # === Основные представления ===
 
+@query_budget(6)
 def home_view(request):
-    publications = Publication.objects.filter(status='ACTIVE').select_related('author')[:3]
+    publications = Publication.objects.filter(status='ACTIVE').select_related('author', 'screenshot_image')[:3]
     total_users = User.objects.count()
     total_publications = Publication.objects.count()
     context = {
         'publications': publications,
+        # карточки — из кэша фрагментов (app/fragments.py)
+        'publication_cards': home_publication_cards(publications),
         'total_users': total_users,
         'total_publications': total_publications,
     }
@@ -51,21 +72,39 @@ def register_view(request):
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
             user = form.save()
-            telegram_id = form.cleaned_data.get('telegram_id')
-            if telegram_id:
-                # профиль уже создаётся сигналом post_save
-                user.profile.telegram_id = telegram_id
-                user.profile.save()
             login(request, user)
-            messages.success(request, f'Добро пожаловать в TradeHub, @{user.username}!', tags='welcome')
+            messages.success(request, f'Добро пожаловать в TradeHub, @{user.username}!', extra_tags='welcome')
             return redirect('home')
     else:
         form = CustomUserCreationForm()
     return render(request, 'app/register.html', {'form': form})
 
 
+def telegram_login_api(request):
+    """Вход из Telegram WebApp: проверка initData, при первом входе — создание пользователя"""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
+    if not settings.TELEGRAM_BOT_TOKEN:
+        return JsonResponse({'status': 'error', 'message': 'Telegram login is not configured'}, status=503)
+
+    try:
+        telegram_user = verify_init_data(request.POST.get('init_data', ''), settings.TELEGRAM_BOT_TOKEN)
+        user, created = get_or_create_telegram_user(telegram_user)
+    except InitDataError as error:
+        return JsonResponse({'status': 'error', 'message': str(error)}, status=403)
+    if not user.is_active:
+        return JsonResponse({'status': 'error', 'message': 'Forbidden'}, status=403)
+
+    if request.user.pk != user.pk:
+        login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+    return JsonResponse({'status': 'ok', 'user_id': user.pk, 'username': user.username, 'created': created})
+
+
 # === Публикации ===
 
+# просмотры и окно «за неделю» меняются без сброса тегов — валидаторы обновляются раз в минуту
+@method_decorator(conditional('publication', window=60), name='get')
+@query_budget(8)
 class PublicationListView(ListView):
     model = Publication
     template_name = 'app/publications.html'
@@ -74,33 +113,67 @@ class PublicationListView(ListView):
 
     def get_queryset(self):
         filter_type = self.request.GET.get('filter', 'recent')
-        queryset = Publication.objects.filter(status='ACTIVE').select_related('author')
+        # число бустов — аннотацией, а не запросом на каждую карточку
+        queryset = Publication.objects.filter(status='ACTIVE').select_related(
+            'author', 'screenshot_image').annotate(boost_total=Count('boosts'))
 
         if filter_type == 'trending':
             last_week = timezone.now() - timezone.timedelta(days=7)
-            queryset = queryset.filter(created_at__gte=last_week).annotate(boost_count=Count('boosts')).order_by(
-                '-boost_count', '-created_at')
+            queryset = queryset.filter(created_at__gte=last_week).order_by('-boost_total', '-created_at')
         else:
             queryset = queryset.order_by('-created_at')
 
         return queryset
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # один запрос на всю страницу вместо проверки подписки для каждой карточки
+        context['followed_author_ids'] = get_followed_ids(
+            self.request.user, [pub.author_id for pub in context['publications']]
+        )
+        # карточки — из кэша фрагментов одним запросом на страницу (app/fragments.py)
+        context['publication_cards'] = publication_cards(
+            context['publications'], self.request.user, context['followed_author_ids']
+        )
+        return context
 
+
+@query_budget(10)
 class PublicationDetailView(DetailView):
     model = Publication
     template_name = 'app/publication_detail.html'
     context_object_name = 'publication'
+    queryset = Publication.objects.select_related('author', 'screenshot_image')
 
     def get_object(self, queryset=None):
         obj = super().get_object(queryset)
         Publication.objects.filter(pk=obj.pk).update(views=F('views') + 1)
+        record_view(self.request, obj)
         return obj
 
 
+def screenshot_thumbnail_view(request, sha256, width):
+    """WebP-миниатюра скриншота; адрес содержит хэш содержимого, поэтому кэшируется навсегда"""
+    width = int(width)
+    if width not in THUMBNAIL_WIDTHS:
+        raise Http404
+    etag = thumbnail_etag(sha256, width)
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        try:
+            response = FileResponse(open(thumbnail_path(sha256, width), 'rb'), content_type='image/webp')
+        except FileNotFoundError:
+            raise Http404
+    response['ETag'] = etag
+    response['Cache-Control'] = THUMBNAIL_CACHE_CONTROL
+    return response
+
+
 @login_required
 @user_passes_test(is_trader, login_url='home')
 def create_publication_view(request):
-    if not request.user.has_perm('app.can_publish'):
+    if not get_roles(request.user).has_perm('app.can_publish'):
         messages.error(request, 'У вас нет прав для создания публикации.')
         return redirect('publications')
 
@@ -109,15 +182,18 @@ def create_publication_view(request):
         if form.is_valid():
             publication = form.save(commit=False)
             publication.author = request.user
-            publication.save()
-            # Создаём уведомление автору (опционально, можно убрать)
-            Notification.objects.create(
-                user=request.user,
-                title="Публикация создана",
-                message="Ваша публикация успешно создана.",
-                notification_type=Notification.NotificationTypes.PUBLICATION,
-                link=f"/publication/{publication.pk}/"
-            )
+            # публикация и её задачи (счётчик автора из сигнала, уведомление) фиксируются вместе
+            with transaction.atomic():
+                publication.save()
+                # Уведомление автору создаётся в фоновой очереди (app/tasks.py)
+                enqueue(
+                    'create_notification',
+                    user_id=request.user.pk,
+                    title="Публикация создана",
+                    message="Ваша публикация успешно создана.",
+                    notification_type=Notification.NotificationTypes.PUBLICATION,
+                    link=f"/publication/{publication.pk}/"
+                )
             messages.success(request, 'Ваша торговая идея успешно опубликована!')
             return redirect('publication_detail', pk=publication.pk)
     else:
@@ -186,20 +262,37 @@ def toggle_boost_view(request, pk):
 # === Профиль ===
 
 @login_required
+@query_budget(8)
 def profile_view(request, username=None):
-    if username:
-        user = get_object_or_404(User, username=username)
+    if username and username != request.user.username:
+        user_id = get_object_or_404(User.objects.values_list('pk', flat=True), username=username)
+    else:
+        user_id = request.user.pk
+
+    summary = get_profile_summary(user_id)
+    is_following = user_id != request.user.pk and bool(get_followed_ids(request.user, [user_id]))
+
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    if page == 1:
+        user_publications = summary['recent_publications']
     else:
-        user = request.user
+        user_publications = get_user_publications_page(user_id, page)
 
-    profile = user.profile
-    user_publications = Publication.objects.filter(author=user)
-    user_achievements = UserAchievement.objects.filter(user=user).select_related('achievement')
     context = {
-        'user_profile': user,
-        'profile': profile,
+        'user_profile': summary['user'],
+        'profile': summary['profile'],
+        'statistics': summary['statistics'],
+        'publications_count': summary['publications_count'],
+        'achievements_count': summary['achievements_count'],
         'user_publications': user_publications,
-        'user_achievements': user_achievements,
+        'user_achievements': summary['achievements'],
+        'is_following': is_following,
+        'page_number': page,
+        'has_previous': page > 1,
+        'has_next': page * PROFILE_PUBLICATIONS_PER_PAGE < summary['publications_count'],
     }
     return render(request, 'app/profile.html', context)
 
@@ -237,32 +330,88 @@ class AchievementsListView(ListView):
 
 # === Обучающие материалы ===
 
-def education_view(request):
-    materials = EducationalMaterial.objects.filter().order_by('-created_at')
-    categories = EducationalMaterial.objects.values_list('material_type', flat=True).distinct()
+def _catalogue_params(request):
+    """Тип (?category=) и курсор (?after=) каталога; неизвестный тип — ValueError"""
+    category = request.GET.get('category') or None
+    if category and category not in EducationalMaterial.MaterialTypes.values:
+        raise ValueError('Invalid category')
+    return category, request.GET.get('after') or None
+
 
-    category_filter = request.GET.get('category')
-    if category_filter:
-        materials = materials.filter(material_type=category_filter)
+@conditional('educationalmaterial')
+def education_view(request):
+    try:
+        category, cursor = _catalogue_params(request)
+        page = get_catalogue_page(category, cursor)
+    except ValueError:
+        return redirect('education')
+    facets, total = get_facet_counts()
 
     context = {
-        'materials': materials,
-        'categories': categories,
-        'current_category': category_filter,
+        'featured': page['featured'],
+        'materials': page['materials'],
+        'next_cursor': page['next_cursor'],
+        'facets': facets,
+        'total_count': total,
+        'current_category': category,
     }
     return render(request, 'app/educational_list.html', context)
 
 
+def education_catalogue_api(request):
+    """
+    Каталог обучающих материалов: ?category=ARTICLE, ?after=<next_cursor>.
+    Тексты материалов не загружаются; закреплённые возвращаются на первой странице.
+    """
+    try:
+        category, cursor = _catalogue_params(request)
+        page = get_catalogue_page(category, cursor)
+    except ValueError as error:
+        return JsonResponse({'status': 'error', 'message': str(error)}, status=400)
+    facets, total = get_facet_counts()
+
+    def serialize(material):
+        return {
+            'id': material.pk,
+            'title': material.title,
+            'material_type': material.material_type,
+            'is_featured': material.is_featured,
+            'reading_time': material.reading_time,
+            'author': material.author.username if material.author else None,
+            'created_at': material.created_at.isoformat(),
+            'url': reverse('education_detail', args=[material.pk]),
+        }
+
+    return JsonResponse({
+        'status': 'ok',
+        'featured': [serialize(material) for material in page['featured']],
+        'results': [serialize(material) for material in page['materials']],
+        'next_cursor': page['next_cursor'],
+        'facets': facets,
+        'total_count': total,
+    })
+
+
 class EducationalMaterialDetailView(DetailView):
     model = EducationalMaterial
     template_name = 'app/educational_detail.html'
     context_object_name = 'material'
+    # HTML отрисован при сохранении (app/education.py); исходный Markdown нужен, только если его ещё нет
+    queryset = EducationalMaterial.objects.defer('content')
+
+    def get_object(self, queryset=None):
+        obj = super().get_object(queryset)
+        record_view(self.request, obj)
+        return obj
 
 
 # === Обзоры рынка ===
 
+@conditional('marketoverview')
 def market_overview_view(request):
-    overviews = MarketOverview.objects.filter(is_featured=True).order_by('-created_at')[:10]
+    # метаданные видео уже в колонках обзора (app/videos.py): к видеохостингу не обращаемся
+    overviews = MarketOverview.objects.filter(is_featured=True).select_related('video_thumbnail').order_by(
+        '-created_at')[:10]
     context = {
         'overviews': overviews,
     }
@@ -273,10 +422,18 @@ class MarketOverviewDetailView(DetailView):
     model = MarketOverview
     template_name = 'app/market_overview_detail.html'
     context_object_name = 'overview'
+    queryset = MarketOverview.objects.select_related('video_thumbnail')
+
+    def get_object(self, queryset=None):
+        obj = super().get_object(queryset)
+        record_view(self.request, obj)
+        return obj
 
 
 # === Лидерборд ===
 
+@method_decorator(conditional('profile'), name='get')
+@query_budget(5)
 class LeaderboardView(ListView):
     """
     Показывает страницы профилей, отсортированные по рейтингу (rating_score).
@@ -291,6 +448,12 @@ class LeaderboardView(ListView):
         # выбираем профили с присоединёнными пользователями, сортируем по рейтингу
         return Profile.objects.select_related('user').order_by('-rating_score')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # строки без номера места — из кэша фрагментов (app/fragments.py)
+        context['leaderboard_rows'] = leaderboard_rows(context['profiles'])
+        return context
+
 
 # === Чат ===
 
@@ -312,6 +475,7 @@ class ChatView(TemplateView):
 # === Уведомления ===
 
 @login_required
+@query_budget(4)
 def notifications_view(request):
     """Страница со всеми уведомлениями"""
     notifications = request.user.notifications.all()
@@ -319,6 +483,8 @@ def notifications_view(request):
 
 
 @login_required
+@conditional(user_sections=('notifications',))
+@query_budget(4)
 def get_notifications_api(request):
     """API для получения непрочитанных уведомлений"""
     notifications_qs = request.user.notifications.filter(is_read=False)
@@ -337,6 +503,7 @@ def get_notifications_api(request):
 
 
 @login_required
+@query_budget(3)
 def api_unread_notifications_count(request):
     """API для количества непрочитанных уведомлений"""
     count = request.user.notifications.filter(is_read=False).count()
@@ -367,25 +534,107 @@ def statistics_view(request):
         'active_publications': Publication.objects.filter(status='ACTIVE').count(),
         'total_achievements': Achievement.objects.count(),
         'total_educational_materials': EducationalMaterial.objects.count(),
+        # оценки HyperLogLog (app/reach.py)
+        'unique_viewers_week': count_site_viewers(7),
+        'unique_viewers_month': count_site_viewers(30),
     }
+    top_publications = (
+        Publication.objects.select_related('author').filter(unique_viewers__gt=0)
+        .only('pk', 'description', 'views', 'unique_viewers', 'author__username')
+        .order_by('-unique_viewers')[:10]
+    )
 
-    context = {'stats': stats}
+    context = {'stats': stats, 'top_publications': top_publications}
     return render(request, 'app/statistics.html', context)
 
 
+@login_required
+def statistics_daily_api(request):
+    """
+    API дневных рядов статистики из предрассчитанных агрегатов.
+    Параметры: ?days=N (по умолчанию 30) или ?start=YYYY-MM-DD&end=YYYY-MM-DD.
+    """
+    if not (is_moderator(request.user) or is_admin(request.user)):
+        return JsonResponse({'status': 'error', 'message': 'Forbidden'}, status=403)
+
+    try:
+        end = parse_date(request.GET.get('end', '')) or timezone.localdate()
+        start = parse_date(request.GET.get('start', ''))
+    except ValueError:
+        # формат верный, но такой даты нет (2024-02-31)
+        return JsonResponse({'status': 'error', 'message': 'Invalid date'}, status=400)
+    if start is None:
+        try:
+            days = int(request.GET.get('days', 30))
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Invalid days'}, status=400)
+        days = min(max(days, 1), MAX_RANGE_DAYS)
+        try:
+            start = end - timezone.timedelta(days=days - 1)
+        except OverflowError:
+            return JsonResponse({'status': 'error', 'message': 'Invalid date range'}, status=400)
+
+    if start > end or (end - start).days >= MAX_RANGE_DAYS:
+        return JsonResponse({'status': 'error', 'message': 'Invalid date range'}, status=400)
+
+    return JsonResponse({'status': 'ok', 'series': get_daily_series(start, end)})
+
+
+@login_required
+def performance_report_view(request):
+    """Скользящий отчёт о запросах к БД и задержках по представлениям (app/instrumentation.py)"""
+    if not (is_moderator(request.user) or is_admin(request.user)):
+        messages.error(request, 'У вас нет прав для просмотра отчёта.')
+        return redirect('home')
+    if request.method == 'POST':
+        performance_report.clear()
+        return redirect('performance_report')
+    return render(request, 'app/performance_report.html', {'rows': performance_report.rows()})
+
+
 # === API функции для AJAX (другие) ===
 
 @login_required
 def toggle_follow_view(request, username):
     if request.method == 'POST':
-        target_user = get_object_or_404(User, username=username)
-        # логика подписки
-        profile = request.user.profile
-        if target_user in profile.subscribed_to.all():
-            profile.subscribed_to.remove(target_user)
-            following = False
-        else:
-            profile.subscribed_to.add(target_user)
-            following = True
-        return JsonResponse({'status': 'ok', 'following': following})
+        target_user_id = get_object_or_404(User.objects.values_list('pk', flat=True), username=username)
+        if target_user_id == request.user.pk:
+            return JsonResponse({'status': 'error', 'message': 'Cannot follow yourself'}, status=400)
+        # подписка/отписка по уникальному индексу, без загрузки списка подписок
+        following = toggle_follow(request.user.profile, target_user_id)
+        followers_count = Profile.objects.values_list('followers_count', flat=True).get(user_id=target_user_id)
+        return JsonResponse({'status': 'ok', 'following': following, 'followers_count': followers_count})
     return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
+
+
+@login_required
+def recommendations_api(request):
+    """
+    API рекомендаций текущего пользователя: ?kind=authors (по умолчанию) или ?kind=publications.
+    Читает предрассчитанные строки одним индексированным запросом.
+    """
+    kind = request.GET.get('kind', 'authors')
+    if kind == 'authors':
+        rows = Recommendation.objects.filter(
+            user=request.user, kind=Recommendation.Kinds.AUTHOR
+        ).values_list('author_id', 'author__username', 'score')
+        data = [{'id': pk, 'username': username, 'score': round(score, 4)} for pk, username, score in rows]
+    elif kind == 'publications':
+        rows = Recommendation.objects.filter(
+            user=request.user, kind=Recommendation.Kinds.PUBLICATION
+        ).values_list('publication_id', 'publication__description', 'publication__author__username', 'score')
+        data = [
+            {'id': pk, 'description': description[:200], 'author': author, 'score': round(score, 4)}
+            for pk, description, author, score in rows
+        ]
+    else:
+        return JsonResponse({'status': 'error', 'message': 'Invalid kind'}, status=400)
+    return JsonResponse({'status': 'ok', 'kind': kind, 'results': data})
+
+
+@login_required
+def mutual_follows_api(request):
+    """API взаимных подписок текущего пользователя"""
+    user_ids = get_mutual_follow_ids(request.user.pk)
+    usernames = dict(User.objects.filter(pk__in=user_ids).values_list('pk', 'username'))
+    return JsonResponse({'users': [usernames[pk] for pk in user_ids if pk in usernames]})
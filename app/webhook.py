@@ -0,0 +1,166 @@
+# app/webhook.py
+"""
+Webhook бота внутри ASGI-приложения проекта: один процесс обслуживает и WebApp, и бота.
+
+Bot API присылает обновления POST-запросом на TELEGRAM_WEBHOOK_PATH с заголовком
+X-Telegram-Bot-Api-Secret-Token. Запрос проверяется, обновление кладётся в ограниченную
+очередь (TELEGRAM_UPDATE_QUEUE_SIZE), и сразу возвращается 200. TELEGRAM_UPDATE_WORKERS
+задач разбирают очередь и параллельно вызывают обработчики общего Application.
+Если очередь заполнена, отвечаем 503 — Telegram повторит доставку позже.
+Тело, которое не является JSON-объектом, получает 400; обновление, которое не разобрал
+python-telegram-bot, записывается в лог и подтверждается 200, чтобы его не присылали снова.
+
+Application создаётся при первом обновлении (Daphne не поддерживает ASGI lifespan);
+серверы с lifespan останавливают его при завершении (см. lifespan()).
+"""
+import asyncio
+import hmac
+import json
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_SIZE = 1024 * 1024
+SECRET_HEADER = b'x-telegram-bot-api-secret-token'
+
+
+async def _respond(send, status, body=b''):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _read_body(receive):
+    """Тело запроса или None, если оно больше MAX_BODY_SIZE"""
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_SIZE:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+class TelegramWebhook:
+    """ASGI-приложение, принимающее обновления Bot API"""
+
+    def __init__(self):
+        self.application = None
+        self.queue = None
+        self._workers = []
+        self._lock = asyncio.Lock()
+
+    async def _ensure_started(self):
+        if self.application is not None:
+            return
+        async with self._lock:
+            if self.application is not None:
+                return
+            # python-telegram-bot загружается с первым обновлением, а не при старте воркера
+            from .telegram_bot import build_application
+
+            application = build_application(
+                settings.TELEGRAM_BOT_TOKEN, settings.SITE_URL,
+                api_url=settings.TELEGRAM_API_URL, with_updater=False,
+            )
+            await application.initialize()
+            self.queue = asyncio.Queue(maxsize=settings.TELEGRAM_UPDATE_QUEUE_SIZE)
+            self._workers = [asyncio.create_task(self._worker(application))
+                             for _ in range(settings.TELEGRAM_UPDATE_WORKERS)]
+            self.application = application
+
+    async def _worker(self, application):
+        while True:
+            update = await self.queue.get()
+            try:
+                await application.process_update(update)
+            except Exception:
+                logger.exception('Ошибка обработки обновления %s', update.update_id)
+            finally:
+                self.queue.task_done()
+
+    async def shutdown(self):
+        """Дожидается разбора очереди и останавливает Application"""
+        if self.application is None:
+            return
+        await self.queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await self.application.shutdown()
+        self.application = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['method'] != 'POST':
+            return await _respond(send, 405)
+        secret = dict(scope['headers']).get(SECRET_HEADER, b'')
+        if not hmac.compare_digest(secret, settings.TELEGRAM_WEBHOOK_SECRET.encode()):
+            return await _respond(send, 403)
+
+        body = await _read_body(receive)
+        if body is None:
+            return await _respond(send, 413)
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            logger.warning('Webhook бота: тело запроса — не JSON-объект')
+            return await _respond(send, 400)
+
+        await self._ensure_started()
+        from telegram import Update
+
+        try:
+            update = Update.de_json(data, self.application.bot)
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            update, reason = None, f'{type(error).__name__}: {error}'
+        else:
+            reason = 'пустое обновление'
+        if update is None:
+            # секрет совпал — это Telegram, и повторная доставка того же обновления не поможет
+            logger.warning('Webhook бота: обновление %s не разобрано (%s)', data.get('update_id'), reason)
+            return await _respond(send, 200, b'ignored')
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            logger.warning('Очередь обновлений бота заполнена, Telegram повторит доставку')
+            return await _respond(send, 503)
+        await _respond(send, 200, b'ok')
+
+
+telegram_webhook = TelegramWebhook()
+
+
+def webhook_enabled():
+    return bool(settings.TELEGRAM_BOT_TOKEN and settings.TELEGRAM_WEBHOOK_SECRET)
+
+
+class WebhookRouter:
+    """HTTP: запросы на TELEGRAM_WEBHOOK_PATH — в webhook бота, остальные — в Django"""
+
+    def __init__(self, django_app):
+        self.django_app = django_app
+
+    async def __call__(self, scope, receive, send):
+        if scope['path'] == settings.TELEGRAM_WEBHOOK_PATH and webhook_enabled():
+            return await telegram_webhook(scope, receive, send)
+        return await self.django_app(scope, receive, send)
+
+
+async def lifespan(scope, receive, send):
+    """ASGI lifespan (uvicorn, hypercorn): при остановке сервера останавливаем Application бота"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await telegram_webhook.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -1,51 +1,78 @@
 # bot.py
+import asyncio
 import logging
 import os
+import sys
 from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
-from telegram.ext import Application, CommandHandler, ContextTypes
+from telegram import Bot
 
-# Загружаем переменные окружения (BOT_TOKEN, BACKEND_URL)
+from app.telegram_bot import build_application
+
+# Загружаем переменные окружения (BOT_TOKEN, BACKEND_URL, TELEGRAM_WEBHOOK_SECRET)
 load_dotenv()
 
 # --- Настройки ---
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 # URL вашего Django-приложения. Должен быть HTTPS.
 BACKEND_URL = os.getenv("BACKEND_URL")
+# Секрет webhook-а: Telegram передаёт его в заголовке X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET")
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """
-    Отправляет сообщение с кнопкой для запуска Web App.
-    """
-    user = update.effective_user
-    logger.info(f"User {user.username} ({user.id}) started the bot.")
-
-    # Создаем кнопку, которая открывает ваше веб-приложение
-    keyboard = [
-        [InlineKeyboardButton(
-            "🚀 Открыть приложение TradeHub",
-            web_app=WebAppInfo(url=BACKEND_URL)
-        )]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    await update.message.reply_text(
-        "👋 Добро пожаловать в TradeHub!\n\nНажмите кнопку ниже, чтобы запустить приложение.",
-        reply_markup=reply_markup
-    )
-
 def main():
     """Основная функция запуска бота."""
     if not BOT_TOKEN or not BACKEND_URL:
         logger.error("BOT_TOKEN и BACKEND_URL должны быть установлены в .env файле!")
         return
 
-    application = Application.builder().token(BOT_TOKEN).build()
-    application.add_handler(CommandHandler("start", start))
+    application = build_application(BOT_TOKEN, BACKEND_URL)
     logger.info("Bot is running...")
     application.run_polling()
 
+def set_webhook():
+    """
+    Переключает бота на webhook: обновления принимает ASGI-приложение проекта
+    (app/webhook.py), отдельный процесс с run_polling() больше не нужен.
+    """
+    if not BOT_TOKEN or not BACKEND_URL or not WEBHOOK_SECRET:
+        logger.error("BOT_TOKEN, BACKEND_URL и TELEGRAM_WEBHOOK_SECRET должны быть установлены в .env файле!")
+        return
+
+    # путь webhook-а — тот же, что слушает ASGI-приложение (settings.TELEGRAM_WEBHOOK_PATH)
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'telegram_trader_project.settings')
+    django.setup()
+    from django.conf import settings
+
+    async def register():
+        async with Bot(BOT_TOKEN) as bot:
+            await bot.set_webhook(BACKEND_URL.rstrip('/') + settings.TELEGRAM_WEBHOOK_PATH,
+                                  secret_token=WEBHOOK_SECRET)
+
+    asyncio.run(register())
+    logger.info("Webhook is set.")
+
+def run_broadcast(until_idle=False):
+    """Отправщик рассылок из очереди OutboxMessage (см. app/broadcast.py)."""
+    if not BOT_TOKEN:
+        logger.error("BOT_TOKEN должен быть установлен в .env файле!")
+        return
+
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'telegram_trader_project.settings')
+    django.setup()
+    from app.broadcast import BroadcastSender
+
+    logger.info("Broadcast sender is running...")
+    asyncio.run(BroadcastSender(BOT_TOKEN).run(until_idle=until_idle))
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    # python bot.py broadcast [--until-idle] — отправщик рассылок,
+    # python bot.py set-webhook — перевод бота на webhook, без аргументов — long polling
+    if sys.argv[1:2] == ['broadcast']:
+        run_broadcast(until_idle='--until-idle' in sys.argv[2:])
+    elif sys.argv[1:2] == ['set-webhook']:
+        set_webhook()
+    else:
+        main()
\ No newline at end of file
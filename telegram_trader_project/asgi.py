@@ -1,17 +1,25 @@
 # telegram_trader_project/asgi.py
 import os
 from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'telegram_trader_project.settings')
+# Django инициализируется до импорта модулей приложения (consumers, webhook используют модели и настройки)
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import app.routing
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'telegram_trader_project.settings')
+from app.static_assets import StaticAssetsRouter
+from app.webhook import WebhookRouter, lifespan
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    # STATIC_URL — собранная статика (app/static_assets.py),
+    # POST на TELEGRAM_WEBHOOK_PATH — обновления бота (app/webhook.py), остальное — Django
+    "http": StaticAssetsRouter(WebhookRouter(django_asgi_app)),
     "websocket": AuthMiddlewareStack(
         URLRouter(
             app.routing.websocket_urlpatterns
         )
     ),
+    "lifespan": lifespan,
 })
\ No newline at end of file
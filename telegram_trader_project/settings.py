@@ -1,6 +1,7 @@
 # telegram_trader_project/settings.py
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -18,7 +19,6 @@ ALLOWED_HOSTS = []
 
 # Application definition
 INSTALLED_APPS = [
-    'daphne', # Должен быть первым
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -28,13 +28,23 @@ INSTALLED_APPS = [
     'rest_framework',
     'app',
 ]
+# daphne подменяет runserver на ASGI-сервер и должен стоять первым. Его импорт тянет twisted
+# (~0.4 с), поэтому приложение подключается только для runserver: процессу Daphne оно не нужно,
+# а командам и тестам незачем платить за него при каждом запуске
+if sys.argv[1:2] == ['runserver']:
+    INSTALLED_APPS.insert(0, 'daphne')
 
 MIDDLEWARE = [
+    # первым, чтобы в замер попали и запросы других middleware (сессии, пользователь)
+    'app.instrumentation.QueryInstrumentationMiddleware',
+    # до всех, кто читает из БД: решает, читать ли запросу с реплики (app/replicas.py)
+    'app.replicas.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.middleware.LoginStreakMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -53,6 +63,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'app.context_processors.roles',
             ],
         },
     },
@@ -77,6 +88,28 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения (app/replicas.py): по алиасу replica<N> на хост из DB_REPLICA_HOSTS.
+# В тестах реплики — зеркала основной базы
+DATABASE_ROUTERS = ['app.replicas.ReplicaRouter']
+for _index, _host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{_index}'] = {**DATABASES['default'], 'HOST': _host.strip(), 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Сколько секунд после изменения (POST и т.п.) клиент читает из основной базы, пока реплики догоняют
+REPLICA_PIN_SECONDS = 5
+
+# Django REST framework (API для Telegram WebApp, см. app/api.py)
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+    ],
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -102,10 +135,72 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+# manage.py collectstatic: имена с хэшем содержимого, манифест и копии .gz/.br (app/static_assets.py);
+# под ASGI STATIC_URL отдаётся из STATIC_ROOT с Cache-Control immutable
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'app.static_assets.CompressedManifestStaticFilesStorage'},
+}
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # URL-ы для редиректа после входа и выхода
 LOGIN_REDIRECT_URL = 'home'
-LOGOUT_REDIRECT_URL = 'home'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'home'
+
+# Telegram-бот: webhook в ASGI-приложении (app/webhook.py) и рассылки (app/broadcast.py)
+SITE_URL = os.getenv('BACKEND_URL', '')
+TELEGRAM_BOT_TOKEN = os.getenv('BOT_TOKEN', '')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+# Webhook включается, когда заданы токен и секрет (регистрация — python bot.py set-webhook)
+TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET', '')
+TELEGRAM_WEBHOOK_PATH = '/telegram/webhook/'
+TELEGRAM_UPDATE_WORKERS = 8
+TELEGRAM_UPDATE_QUEUE_SIZE = 1000
+# Лимит Bot API — около 30 сообщений в секунду на бота (платные рассылки позволяют больше)
+TELEGRAM_BROADCAST_RATE = int(os.getenv('TELEGRAM_BROADCAST_RATE', '30'))
+
+# Скриншоты публикаций: оригиналы и WebP-миниатюры (app/screenshots.py, manage.py process_screenshots)
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+SCREENSHOT_ROOT = os.path.join(MEDIA_ROOT, 'screenshots')
+# Хосты (с поддоменами), с которых скриншоты загружаются по ссылке; file_id Telegram загружаются всегда
+SCREENSHOT_URL_HOSTS = [
+    host.strip().lower() for host in os.getenv('SCREENSHOT_URL_HOSTS', '').split(',') if host.strip()
+]
+
+# oEmbed провайдеров видео обзоров рынка: (регулярное выражение ссылки, адрес oEmbed).
+# Метаданные запрашивает manage.py fetch_video_metadata (app/videos.py)
+VIDEO_OEMBED_PROVIDERS = [
+    (r'https?://(www\.|m\.)?(youtube\.com|youtu\.be)/', 'https://www.youtube.com/oembed'),
+    (r'https?://(www\.|player\.)?vimeo\.com/', 'https://vimeo.com/api/oembed.json'),
+]
+# Хосты превью видео из ответов oEmbed (с поддоменами)
+VIDEO_THUMBNAIL_HOSTS = ['ytimg.com', 'vimeocdn.com']
+
+# Учёт запросов к БД и задержек по представлениям (app/instrumentation.py):
+# сколько последних замеров на ключ хранит отчёт и падать ли при превышении бюджета (включается в тестах)
+INSTRUMENTATION_WINDOW = 500
+QUERY_BUDGET_STRICT = False
+
+# Кэш (app/caching.py): общий бэкенд и LRU процесса перед ним; сбросы расходятся по процессам
+# через channel layer. Без REDIS_URL всё хранится в памяти одного процесса (разработка)
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL},
+    }
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels_redis.core.RedisChannelLayer', 'CONFIG': {'hosts': [REDIS_URL]}},
+    }
+else:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    }
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+    }
+CACHE_LOCAL_MAX_ENTRIES = 5000
+# Сколько секунд запись живёт в LRU процесса (предел расхождения, если сброс не дошёл)
+CACHE_LOCAL_TIMEOUT = 60
@@ -0,0 +1,25 @@
+# telegram_trader_project/settings_benchmark.py
+"""
+Настройки для нагрузочных замеров на локальной SQLite:
+
+    python manage.py migrate --settings=telegram_trader_project.settings_benchmark
+    python manage.py generate_dataset --seed 1 --settings=telegram_trader_project.settings_benchmark
+    python manage.py run_benchmarks --output bench.json --settings=telegram_trader_project.settings_benchmark
+"""
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'benchmark.sqlite3',  # noqa: F405
+    }
+}
+
+CHANNEL_LAYERS = {
+    'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+}
+
+DATABASE_REPLICAS = []